@@ -0,0 +1,33 @@
+"""signal next_check_at
+
+Revision ID: 2d7a9c4e6b18
+Revises: 9b3e5d7f2a41
+Create Date: 2025-09-22 15:27:44.906152
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d7a9c4e6b18'
+down_revision: Union[str, Sequence[str], None] = '9b3e5d7f2a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows stay NULL (due now); the checker schedules them as it gets to them
+    with op.batch_alter_table('signals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('next_check_at', sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index(batch_op.f('ix_signals_next_check_at'), ['next_check_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('signals', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_signals_next_check_at'))
+        batch_op.drop_column('next_check_at')
@@ -0,0 +1,43 @@
+"""llm cache
+
+Revision ID: 3f1b2c7d9a10
+Revises: c6a129950e58
+Create Date: 2025-09-02 10:14:22.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1b2c7d9a10'
+down_revision: Union[str, Sequence[str], None] = 'c6a129950e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('llm_cache',
+    sa.Column('fingerprint', sa.String(length=32), nullable=False),
+    sa.Column('simhash', sa.BigInteger(), nullable=False),
+    sa.Column('anchor_key', sa.String(length=32), nullable=False),
+    sa.Column('is_signal', sa.Boolean(), nullable=False),
+    sa.Column('fields', sa.JSON(), nullable=True),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('fingerprint')
+    )
+    with op.batch_alter_table('llm_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_llm_cache_last_used_at'), ['last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('llm_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_llm_cache_last_used_at'))
+
+    op.drop_table('llm_cache')
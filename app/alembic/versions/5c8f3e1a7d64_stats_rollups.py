@@ -0,0 +1,101 @@
+"""stats rollups
+
+Revision ID: 5c8f3e1a7d64
+Revises: e41a7c2d5b93
+Create Date: 2025-09-12 14:02:37.640215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8f3e1a7d64'
+down_revision: Union[str, Sequence[str], None] = 'e41a7c2d5b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_AGG = """
+    COUNT(id),
+    SUM(CASE WHEN side = 'long' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN side = 'short' THEN 1 ELSE 0 END),
+    COALESCE(SUM(leverage), 0),
+    SUM(CASE WHEN leverage IS NOT NULL THEN 1 ELSE 0 END),
+    MIN(message_date),
+    MAX(message_date)"""
+_COLS = "total, long_count, short_count, leverage_sum, leverage_count, first_date, last_date"
+
+
+def _week() -> str:
+    # Monday of the week, as in app.service.rollups.week_start_sql
+    if op.get_bind().dialect.name == "postgresql":
+        return "CAST(date_trunc('week', message_date AT TIME ZONE 'UTC') AS DATE)"
+    return "date(message_date, 'weekday 0', '-6 days')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('channel_stats',
+    sa.Column('channel_id', sa.BigInteger(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('long_count', sa.Integer(), nullable=False),
+    sa.Column('short_count', sa.Integer(), nullable=False),
+    sa.Column('leverage_sum', sa.Float(), nullable=False),
+    sa.Column('leverage_count', sa.Integer(), nullable=False),
+    sa.Column('first_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('deleted', sa.Integer(), nullable=False),
+    sa.Column('edited', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('channel_id')
+    )
+    op.create_table('symbol_stats',
+    sa.Column('symbol', sa.String(length=50), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('long_count', sa.Integer(), nullable=False),
+    sa.Column('short_count', sa.Integer(), nullable=False),
+    sa.Column('leverage_sum', sa.Float(), nullable=False),
+    sa.Column('leverage_count', sa.Integer(), nullable=False),
+    sa.Column('first_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_date', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+    op.create_table('channel_week_stats',
+    sa.Column('channel_id', sa.BigInteger(), nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('channel_id', 'week_start')
+    )
+    op.create_table('symbol_week_stats',
+    sa.Column('symbol', sa.String(length=50), nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('symbol', 'week_start')
+    )
+
+    # Seed from existing signals (same result as `python -m app.service.rollups rebuild`)
+    week = _week()
+    op.execute(
+        f"INSERT INTO channel_stats (channel_id, {_COLS}, deleted, edited) "
+        f"SELECT channel_id, {_AGG}, SUM(CASE WHEN deleted THEN 1 ELSE 0 END), SUM(CASE WHEN edited THEN 1 ELSE 0 END) "
+        f"FROM signals GROUP BY channel_id"
+    )
+    op.execute(f"INSERT INTO symbol_stats (symbol, {_COLS}) SELECT symbol, {_AGG} FROM signals GROUP BY symbol")
+    op.execute(
+        f"INSERT INTO channel_week_stats (channel_id, week_start, total) "
+        f"SELECT channel_id, {week} AS wk, COUNT(id) FROM signals GROUP BY channel_id, wk"
+    )
+    op.execute(
+        f"INSERT INTO symbol_week_stats (symbol, week_start, total) "
+        f"SELECT symbol, {week} AS wk, COUNT(id) FROM signals GROUP BY symbol, wk"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('symbol_week_stats')
+    op.drop_table('channel_week_stats')
+    op.drop_table('symbol_stats')
+    op.drop_table('channel_stats')
@@ -0,0 +1,45 @@
+"""signal next_check_at backfill and partial index
+
+Revision ID: 6e0b3f8c1a95
+Revises: 2d7a9c4e6b18
+Create Date: 2025-09-24 11:06:51.372904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e0b3f8c1a95'
+down_revision: Union[str, Sequence[str], None] = '2d7a9c4e6b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Never checked -> due since posting, otherwise due since the last check. The checker's
+    # budget and scores decide the order; its next visit sets the real interval of each signal
+    op.execute("UPDATE signals SET next_check_at = COALESCE(last_checked_time, message_date) WHERE next_check_at IS NULL")
+    with op.batch_alter_table('signals', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_signals_next_check_at'))
+        batch_op.alter_column('next_check_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+    # Outside the batch: SQLite table rebuilds do not carry partial index predicates over
+    op.create_index(
+        'ix_signals_next_check_at_live',
+        'signals',
+        ['next_check_at'],
+        unique=False,
+        sqlite_where=sa.text('deleted = 0'),
+        postgresql_where=sa.text('deleted = false'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_signals_next_check_at_live', table_name='signals')
+    with op.batch_alter_table('signals', schema=None) as batch_op:
+        batch_op.alter_column('next_check_at', existing_type=sa.DateTime(timezone=True), nullable=True)
+        batch_op.create_index(batch_op.f('ix_signals_next_check_at'), ['next_check_at'], unique=False)
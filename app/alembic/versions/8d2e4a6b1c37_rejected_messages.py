@@ -0,0 +1,43 @@
+"""rejected messages
+
+Revision ID: 8d2e4a6b1c37
+Revises: 3f1b2c7d9a10
+Create Date: 2025-09-05 16:41:09.532114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e4a6b1c37'
+down_revision: Union[str, Sequence[str], None] = '3f1b2c7d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rejected_messages',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('channel_id', sa.BigInteger(), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('message_date', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('source', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('channel_id', 'message_id', name='uq_rejected_channel_message')
+    )
+    with op.batch_alter_table('rejected_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rejected_messages_created_at'), ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('rejected_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_rejected_messages_created_at'))
+
+    op.drop_table('rejected_messages')
@@ -0,0 +1,39 @@
+"""postgres jsonb
+
+Revision ID: 9b3e5d7f2a41
+Revises: 5c8f3e1a7d64
+Create Date: 2025-09-19 10:41:08.213377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3e5d7f2a41'
+down_revision: Union[str, Sequence[str], None] = '5c8f3e1a7d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# JSON columns become JSONB on PostgreSQL; SQLite has a single JSON representation (no-op)
+_COLUMNS = (('signals', 'stop_loss'), ('signals', 'take_profits'), ('llm_cache', 'fields'))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column in _COLUMNS:
+        op.alter_column(table, column, type_=postgresql.JSONB(), postgresql_using=f'{column}::jsonb')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, column in _COLUMNS:
+        op.alter_column(table, column, type_=sa.JSON(), postgresql_using=f'{column}::json')
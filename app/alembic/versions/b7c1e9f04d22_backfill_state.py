@@ -0,0 +1,36 @@
+"""backfill state
+
+Revision ID: b7c1e9f04d22
+Revises: 8d2e4a6b1c37
+Create Date: 2025-09-08 11:27:45.904311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1e9f04d22'
+down_revision: Union[str, Sequence[str], None] = '8d2e4a6b1c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('backfill_state',
+    sa.Column('channel_id', sa.BigInteger(), nullable=False),
+    sa.Column('next_message_id', sa.Integer(), nullable=False),
+    sa.Column('target_message_id', sa.Integer(), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('channel_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('backfill_state')
@@ -0,0 +1,31 @@
+"""signal keyset indexes
+
+Revision ID: e41a7c2d5b93
+Revises: b7c1e9f04d22
+Create Date: 2025-09-10 09:14:02.518730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a7c2d5b93'
+down_revision: Union[str, Sequence[str], None] = 'b7c1e9f04d22'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('signals', schema=None) as batch_op:
+        batch_op.create_index('ix_signals_channel_date_id', ['channel_id', 'message_date', 'id'], unique=False)
+        batch_op.create_index('ix_signals_symbol_date_id', ['symbol', 'message_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('signals', schema=None) as batch_op:
+        batch_op.drop_index('ix_signals_symbol_date_id')
+        batch_op.drop_index('ix_signals_channel_date_id')
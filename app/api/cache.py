@@ -0,0 +1,123 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.events import GENERATION, Generation
+from app.metrics import REGISTRY
+
+_REQUESTS = REGISTRY.counter("sc_api_cache_total", "Cached API responses by result", labels=("result",))
+
+
+class _Entry:
+    __slots__ = ("body", "etag", "headers", "generation", "expires_at")
+
+    def __init__(self, body: bytes, headers: dict, generation: int, expires_at: float) -> None:
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        self.headers = headers
+        self.generation = generation
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    Serialized JSON bodies of read routes keyed by path + query string.
+
+    An entry is served while the data generation it was built under is current and it is younger
+    than `ttl_seconds` (the TTL bounds staleness from writes made by other processes). Concurrent
+    misses for one key share a single build. Responses carry an ETag; a matching If-None-Match
+    gets 304 with no body and, when the entry is fresh, without touching the database.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 1024, generation: Generation = GENERATION) -> None:
+        self.ttl = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.generation = generation
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def respond(
+        self,
+        request: Request,
+        adapter: TypeAdapter,
+        build: Callable[[], Awaitable[Any]],
+        headers: Optional[dict] = None,
+    ) -> Response:
+        """
+        Serve `build()` (validated/serialized by `adapter`) through the cache. `headers` may be
+        filled by `build` and are cached with the body.
+        """
+        if self.ttl <= 0:
+            entry = await self._build(adapter, build, headers)
+            return self._response(request, entry)
+
+        key = request.url.path + "?" + str(request.query_params)
+        entry = self._entries.get(key)
+        if entry is not None and entry.generation == self.generation.value and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            _REQUESTS.inc("hit")
+            return self._response(request, entry)
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            _REQUESTS.inc("coalesced")
+            try:
+                return self._response(request, await asyncio.shield(fut))
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise
+                # The request doing the build went away; build again for this one
+                return await self.respond(request, adapter, build, headers)
+
+        _REQUESTS.inc("miss")
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            entry = await self._build(adapter, build, headers)
+            fut.set_result(entry)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved: only waiters re-raise it
+            raise
+        finally:
+            del self._inflight[key]
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return self._response(request, entry)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "generation": self.generation.value,
+            **{labels[0]: int(v) for labels, v in _REQUESTS.items()},
+        }
+
+    async def _build(self, adapter: TypeAdapter, build: Callable[[], Awaitable[Any]], headers: Optional[dict]) -> _Entry:
+        # Snapshot first: a write committed while building leaves this entry already stale
+        generation = self.generation.value
+        body = adapter.dump_json(adapter.validate_python(await build()))
+        return _Entry(body, dict(headers or {}), generation, time.monotonic() + self.ttl)
+
+    @staticmethod
+    def _response(request: Request, entry: _Entry) -> Response:
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+        inm = request.headers.get("if-none-match")
+        if inm and entry.etag in {t.strip().removeprefix("W/") for t in inm.split(",")}:
+            _REQUESTS.inc("not_modified")
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
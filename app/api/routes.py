@@ -1,113 +1,271 @@
 from __future__ import annotations
-from typing import Sequence, Any, Optional
-from fastapi import APIRouter, Depends, Query, HTTPException
+import asyncio
+import json
+from typing import AsyncIterator, Sequence, Any, Optional
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
-from app.db import get_session
+from app.api.cache import ResponseCache
+from app.config import settings
+from app.db import get_session, get_write_session
+from app.events import BROKER, EVENT_TYPES, GENERATION, Event, Subscription
+from app.metrics import render_prometheus
 from app.models import Signal, Channel, SignalEdition
 from app.api.schemas import ChannelItem, SymbolItem, SignalItem, ChannelStats, SymbolStats, EditionItem
+from app.service import rollups
 from app.service.query import (
     list_channels_with_counts,
     list_symbols_with_counts,
     get_signals_by_channel,
     get_signals_by_symbol,
+    decode_cursor,
+    next_cursor,
     stats_by_channel,
     stats_by_symbol,
 )
 
 router = APIRouter(prefix="/api", tags=["signals"])
 
+response_cache = ResponseCache(ttl_seconds=settings.api_cache_ttl_seconds, max_entries=settings.api_cache_max_entries)
+
+_CHANNELS = TypeAdapter(list[ChannelItem])
+_SYMBOLS = TypeAdapter(list[SymbolItem])
+_SIGNALS = TypeAdapter(list[SignalItem])
+_CHANNEL_STATS = TypeAdapter(list[ChannelStats])
+_SYMBOL_STATS = TypeAdapter(list[SymbolStats])
+_EDITIONS = TypeAdapter(list[EditionItem])
+
 
 @router.get("/health")
 async def health() -> dict:
     return {"status": "ok"}
 
 
+@router.get("/pipeline")
+async def pipeline(request: Request) -> dict:
+    """
+    Ingest stats reported by each collector over NOTIFY_DIR (queue depth, backpressure, per-stage
+    latency, cache hit rates, LLM limiter), plus this API process's response cache and stream.
+    """
+    notify = getattr(request.app.state, "notify", None)
+    return {
+        "collectors": notify.stats() if notify else None,
+        "api_cache": response_cache.stats(),
+        "stream": BROKER.stats(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of the in-process metrics registry."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/stream")
+async def stream(
+    request: Request,
+    channel: Optional[list[int]] = Query(None, description="Only these channel ids (repeatable)"),
+    symbol: Optional[list[str]] = Query(None, description="Only these symbols (repeatable)"),
+    types: Optional[list[str]] = Query(None, alias="type", description="signal | edition | deletion (repeatable)"),
+    since: Optional[str] = Query(None, description="Resume after this event id (same as Last-Event-ID)"),
+):
+    """
+    Server-sent events for committed signals, editions and deletions. Reconnect with
+    Last-Event-ID (EventSource does it automatically) to resume; an `evicted` event means the
+    client fell behind, a `gap` event that some events are gone and listings should be refetched.
+    Needs NOTIFY_DIR: the collector's commits reach the API only through it.
+    """
+    if not settings.notify_dir:
+        raise HTTPException(status_code=503, detail="Live stream needs NOTIFY_DIR")
+    if types and not set(types) <= set(EVENT_TYPES):
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(EVENT_TYPES)}")
+    if since is None:
+        since = request.headers.get("last-event-id") or None
+    if BROKER.stats()["subscribers"] >= settings.stream_max_subscribers:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers")
+
+    sub, backlog, gap = BROKER.subscribe(channel, symbol, types, since)
+    return StreamingResponse(
+        _sse(sub, backlog, gap),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/channels", response_model=list[ChannelItem])
-async def channels(session: AsyncSession = Depends(get_session)):
-    return await list_channels_with_counts(session)
+async def channels(request: Request, session: AsyncSession = Depends(get_session)):
+    return await response_cache.respond(request, _CHANNELS, lambda: list_channels_with_counts(session))
 
 
 @router.get("/symbols", response_model=list[SymbolItem])
-async def symbols(session: AsyncSession = Depends(get_session)):
-    return await list_symbols_with_counts(session)
+async def symbols(request: Request, session: AsyncSession = Depends(get_session)):
+    return await response_cache.respond(request, _SYMBOLS, lambda: list_symbols_with_counts(session))
 
 
 @router.get("/channels/{channel_id}/signals", response_model=list[SignalItem])
 async def signals_by_channel(
     channel_id: int,
+    request: Request,
     limit: int = Query(100, ge=1, le=500),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque X-Next-Cursor value from the previous page"),
+    offset: int = Query(0, ge=0, description="Deprecated; use cursor"),
     session: AsyncSession = Depends(get_session),
 ):
-    rows: Sequence[Signal] = await get_signals_by_channel(session, channel_id, limit=limit, offset=offset)
-    return [_to_signal_item(s) for s in rows]
+    key = _cursor(cursor)
+    headers: dict = {}
+
+    async def build() -> list[SignalItem]:
+        rows: Sequence[Signal] = await get_signals_by_channel(
+            session, channel_id, limit=limit, offset=offset, cursor=key
+        )
+        _next_cursor_header(headers, list(rows), limit)
+        return [_to_signal_item(s) for s in rows]
+
+    return await response_cache.respond(request, _SIGNALS, build, headers)
 
 
 @router.get("/symbols/{symbol}/signals", response_model=list[SignalItem])
 async def symbols_signals(
     symbol: str,
+    request: Request,
     limit: int = Query(100, ge=1, le=500),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque X-Next-Cursor value from the previous page"),
+    offset: int = Query(0, ge=0, description="Deprecated; use cursor"),
     session: AsyncSession = Depends(get_session),
 ):
-    rows: Sequence[Any] = await get_signals_by_symbol(session, symbol, limit=limit, offset=offset)
+    key = _cursor(cursor)
+    headers: dict = {}
 
-    out: list[SignalItem] = []
-    for row in rows:
-        s: Optional[Signal] = None
-        ch: Optional[Channel] = None
+    async def build() -> list[SignalItem]:
+        rows: Sequence[Any] = await get_signals_by_symbol(
+            session, symbol, limit=limit, offset=offset, cursor=key
+        )
+        _next_cursor_header(headers, [row[0] for row in rows], limit)
 
-        if hasattr(row, "__iter__") and not isinstance(row, Signal):
-            try:
-                s = row[0]  # type: ignore[index]
-                ch = row[1]  # type: ignore[index]
-            except Exception:
-                pass
+        out: list[SignalItem] = []
+        for row in rows:
+            s: Optional[Signal] = None
+            ch: Optional[Channel] = None
+
+            if hasattr(row, "__iter__") and not isinstance(row, Signal):
+                try:
+                    s = row[0]  # type: ignore[index]
+                    ch = row[1]  # type: ignore[index]
+                except Exception:
+                    pass
+
+            if s is None:
+                s = row  # type: ignore[assignment]
 
-        if s is None:
-            s = row  # type: ignore[assignment]
+            if ch is None:
+                ch = await session.get(Channel, s.channel_id)
 
-        if ch is None:
-            ch = await session.get(Channel, s.channel_id)
+            out.append(_to_signal_item(s, ch))
+        return out
 
-        out.append(_to_signal_item(s, ch))
-    return out
+    return await response_cache.respond(request, _SIGNALS, build, headers)
 
 
 @router.get("/stats/channels", response_model=list[ChannelStats])
-async def channels_stats(session: AsyncSession = Depends(get_session)):
-    return await stats_by_channel(session)
+async def channels_stats(request: Request, session: AsyncSession = Depends(get_session)):
+    return await response_cache.respond(request, _CHANNEL_STATS, lambda: stats_by_channel(session))
 
 
 @router.get("/stats/symbols", response_model=list[SymbolStats])
-async def symbols_stats(session: AsyncSession = Depends(get_session)):
-    return await stats_by_symbol(session)
+async def symbols_stats(request: Request, session: AsyncSession = Depends(get_session)):
+    return await response_cache.respond(request, _SYMBOL_STATS, lambda: stats_by_symbol(session))
 
 
 @router.get("/signals/{signal_id}/editions", response_model=list[EditionItem])
-async def signal_editions(signal_id: int, session: AsyncSession = Depends(get_session)):
-    q = (
-        select(SignalEdition)
-        .where(SignalEdition.signal_id == signal_id)
-        .order_by(SignalEdition.edited_at.asc())
-    )
-    rows = (await session.execute(q)).scalars().all()
-    return [EditionItem(text=r.text, edited_at=r.edited_at) for r in rows]
+async def signal_editions(signal_id: int, request: Request, session: AsyncSession = Depends(get_session)):
+    async def build() -> list[EditionItem]:
+        q = (
+            select(SignalEdition)
+            .where(SignalEdition.signal_id == signal_id)
+            .order_by(SignalEdition.edited_at.asc())
+        )
+        rows = (await session.execute(q)).scalars().all()
+        return [EditionItem(text=r.text, edited_at=r.edited_at) for r in rows]
+
+    return await response_cache.respond(request, _EDITIONS, build)
 
 
 @router.delete("/signals/{signal_id}")
-async def delete_signal(signal_id: int, session: AsyncSession = Depends(get_session)):
+async def delete_signal(signal_id: int, request: Request, session: AsyncSession = Depends(get_write_session)):
+    # Committed here rather than through the collector; other API workers learn of it via NOTIFY_DIR
     s = await session.get(Signal, signal_id)
     if not s:
         raise HTTPException(status_code=404, detail="Signal not found")
     await session.delete(s)
+    await session.flush()
+    await rollups.apply_removed(session, [s])
     await session.commit()
+    data = {
+        "signal_id": s.id,
+        "channel_id": s.channel_id,
+        "message_id": s.message_id,
+        "symbol": s.symbol,
+        "removed": True,
+    }
+    GENERATION.bump()
+    BROKER.publish("deletion", s.channel_id, s.symbol, data)
+    outbox = getattr(request.app.state, "outbox", None)
+    if outbox:
+        outbox.send_bump()
+        outbox.send_event("deletion", s.channel_id, s.symbol, data)
     return {"ok": True}
 
 
 # --- helpers ---
 
+async def _sse(sub: Subscription, backlog: list[Event], gap: bool) -> AsyncIterator[bytes]:
+    try:
+        yield b"retry: 3000\n\n"
+        if gap:
+            # The id moves the client's Last-Event-ID onto this worker's numbering
+            last = BROKER.last_id
+            yield f"id: {last}\nevent: gap\ndata: ".encode() + json.dumps({"last_id": last}).encode() + b"\n\n"
+        if backlog:
+            yield b"".join(ev.frame for ev in backlog)
+        while True:
+            try:
+                ev = await asyncio.wait_for(sub.queue.get(), settings.stream_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            # Send whatever else is already buffered in the same write
+            frames = []
+            while ev is not None:
+                frames.append(ev.frame)
+                if sub.queue.empty():
+                    break
+                ev = sub.queue.get_nowait()
+            if frames:
+                yield b"".join(frames)
+            if ev is None:
+                yield b"event: evicted\ndata: {}\n\n"
+                return
+    finally:
+        BROKER.unsubscribe(sub)
+
+
+def _cursor(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return decode_cursor(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _next_cursor_header(headers: dict, rows: list[Signal], limit: int) -> None:
+    nxt = next_cursor(rows, limit)
+    if nxt:
+        headers["X-Next-Cursor"] = nxt
+
+
 def _to_signal_item(s: Signal, ch: Channel | None = None) -> SignalItem:
     return SignalItem(
         id=s.id,
@@ -1,16 +1,17 @@
 from __future__ import annotations
 
 import logging
+import os
+import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.llm import LLMClient
+from app.config import settings
 from app.log import setup_logging
-from app.processor import Processor
-from app.telegram_client import TelegramListener
+from app.metrics import REGISTRY
+from app.notify import NotifyClient, NotifyServer
 from app.api.routes import router
-from app.checker import MessageChecker
 
 setup_logging()
 log = logging.getLogger("sc.api")
@@ -26,37 +27,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(router)
 
-_llm: LLMClient | None = None
-_processor: Processor | None = None
-_listener: TelegramListener | None = None
-_checker: MessageChecker | None = None
+_HTTP = REGISTRY.histogram("sc_http_request_seconds", "API request latency", labels=("method", "route", "status"))
+
+
+@app.middleware("http")
+async def _observe_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Route template (e.g. /api/channels/{channel_id}/signals) keeps label cardinality bounded
+    route = request.scope.get("route")
+    _HTTP.observe(
+        time.perf_counter() - started,
+        request.method,
+        getattr(route, "path", "unmatched"),
+        response.status_code,
+    )
+    return response
+
+# Ingest runs in `python -m app.collector` (or `python -m app.shard_supervisor`). The API only
+# reads, except for DELETE /api/signals/{id}, which commits directly (a second writer next to the
+# collector). Safe to run with several uvicorn workers; NOTIFY_DIR lets each follow the collectors'
+# commits and announce its own deletions to the other workers.
+_notify: NotifyClient | None = None
+_outbox: NotifyServer | None = None
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    global _llm, _processor, _listener, _checker
-    _llm = LLMClient()
-    _processor = Processor(llm=_llm)
-    _listener = TelegramListener(processor=_processor)
-    await _listener.start()
-
-    # Start periodic deletion/edition checker (every 30 minutes)
-    _checker = MessageChecker(client=_listener.client, interval_seconds=1800)
-    await _checker.start()
+    global _notify, _outbox
+    if settings.notify_dir:
+        source = f"api-{os.getpid()}"
+        _outbox = NotifyServer(settings.notify_dir, source, relay=False)
+        await _outbox.start()
+        _notify = NotifyClient(settings.notify_dir, skip=(source,))
+        await _notify.start()
+    app.state.notify = _notify
+    app.state.outbox = _outbox
 
     log.info("Server start")
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
-    global _listener, _checker
-    if _checker:
-        await _checker.stop()
-    if _listener:
-        await _listener.stop()
+    if _notify:
+        await _notify.stop()
+    if _outbox:
+        await _outbox.stop()
 
     log.info("Server stop")
@@ -0,0 +1,274 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Iterable, Optional, TypeVar
+
+from pyrogram import Client
+from pyrogram.errors import FloodWait, RPCError
+from sqlalchemy import select
+
+from app.db import ReadSessionLocal
+from app.models import BackfillState, Channel
+from app.processor import MessageEnvelope, Processor
+from app.shard import LOCAL, Shard
+from app.telegram_client import envelope_from_message
+from app.writer import SignalWriter
+
+log = logging.getLogger("sc.backfill")
+
+T = TypeVar("T")
+
+
+class Backfiller:
+    """
+    Catch up on channel history missed while offline.
+
+    Only channels of `shard` are planned. `plan()` snapshots each channel's gap start
+    (`last_message_id + 1`) into `backfill_state`; it must run before the live listener starts
+    advancing `last_message_id`. `run()` then walks every gap forward in chunks of `chunk_size` ids
+    (one get_messages RPC each) up to the newest message, with at most `concurrency` channels in
+    flight. Each chunk goes through the normal Processor, is flushed by the writer and only then
+    checkpointed, so a crash resumes at the last chunk. A chunk with messages that failed to
+    process is not checkpointed: its channel stops there and is retried from it on the next run.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        processor: Processor,
+        writer: SignalWriter,
+        concurrency: int = 8,
+        workers: int = 16,
+        chunk_size: int = 200,
+        max_messages: int = 5000,
+        max_flood_retries: int = 5,
+        shard: Shard = LOCAL,
+    ) -> None:
+        self.client = client
+        self.shard = shard
+        self.processor = processor
+        self.writer = writer
+        self.chunk_size = max(1, min(200, chunk_size))  # Telegram caps get_messages at 200 ids
+        self.max_messages = max(0, max_messages)
+        self.max_flood_retries = max(0, max_flood_retries)
+        self._channel_sem = asyncio.Semaphore(max(1, concurrency))
+        self._worker_sem = asyncio.Semaphore(max(1, workers))
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+        self._planned: Optional[set[int]] = None
+        self.rpcs = 0
+        self.fetched = 0
+        self.processed = 0
+        self.failed = 0
+        self.channels_done = 0
+
+    async def plan(self, channel_ids: Optional[Iterable[int]] = None, restart: bool = False) -> int:
+        """
+        Record the gap start for every monitored channel. Unfinished checkpoints are kept (resume)
+        unless `restart`. Returns the number of channels to backfill.
+        """
+        now = datetime.now(timezone.utc)
+        async with ReadSessionLocal() as session:
+            q = select(Channel.id, Channel.last_message_id).where(
+                Channel.is_monitored.is_(True), Channel.last_message_id.is_not(None)
+            )
+            if channel_ids is not None:
+                q = q.where(Channel.id.in_(list(channel_ids)))
+            owned = self.shard.where(Channel.id)
+            if owned is not None:
+                q = q.where(owned)
+            channels = (await session.execute(q)).all()
+            unfinished = set(
+                (
+                    await session.execute(select(BackfillState.channel_id).where(BackfillState.completed_at.is_(None)))
+                ).scalars().all()
+            )
+        fresh = [c for c in channels if restart or c.id not in unfinished]
+        await self.writer.plan_backfill([
+            {
+                "channel_id": c.id,
+                "next_message_id": c.last_message_id + 1,
+                "target_message_id": None,
+                "started_at": now,
+                "updated_at": now,
+                "completed_at": None,
+            }
+            for c in fresh
+        ])
+        self._planned = {c.id for c in channels}
+        resumed = len(channels) - len(fresh)
+        log.info("backfill planned: %s channels (%s resumed from checkpoints)", len(channels), resumed)
+        return len(channels)
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self.run(), name="backfill")
+
+    async def stop(self) -> None:
+        # Chunks in progress are not checkpointed and are redone on the next run
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "channels_done": self.channels_done,
+            "rpcs": self.rpcs,
+            "fetched": self.fetched,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+    async def run(self) -> dict:
+        async with ReadSessionLocal() as session:
+            q = select(BackfillState).where(BackfillState.completed_at.is_(None))
+            if self._planned is not None:
+                q = q.where(BackfillState.channel_id.in_(self._planned))
+            states = (await session.execute(q)).scalars().all()
+        if not states:
+            return self.stats()
+
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(self._channel(s.channel_id, s.next_message_id) for s in states), return_exceptions=True
+        )
+        for s, res in zip(states, results):
+            if isinstance(res, Exception):
+                log.error("backfill: channel %s stopped at checkpoint: %r", s.channel_id, res)
+        log.info(
+            "backfill done: channels=%s/%s rpcs=%s fetched=%s processed=%s in %.1fs",
+            self.channels_done, len(states), self.rpcs, self.fetched, self.processed, time.monotonic() - started,
+        )
+        return self.stats()
+
+    async def _channel(self, channel_id: int, next_id: int) -> None:
+        async with self._channel_sem:
+            top = await self._rpc(channel_id, lambda: self._newest_id(channel_id))
+            if top is None or top < next_id:
+                await self._checkpoint(channel_id, next_id, top, done=True)
+                self.channels_done += 1
+                return
+            if self.max_messages and top - next_id + 1 > self.max_messages:
+                log.warning(
+                    "backfill: ch=%s gap of %s messages, only the newest %s are fetched",
+                    channel_id, top - next_id + 1, self.max_messages,
+                )
+                next_id = top - self.max_messages + 1
+            await self._checkpoint(channel_id, next_id, top)
+
+            while next_id <= top and not self._stop.is_set():
+                ids = list(range(next_id, min(top, next_id + self.chunk_size - 1) + 1))
+                msgs = await self._rpc(channel_id, lambda: self.client.get_messages(chat_id=channel_id, message_ids=ids))
+                msgs = msgs if isinstance(msgs, list) else [msgs]
+                envs = [e for e in (envelope_from_message(m) for m in msgs) if e is not None]
+                self.fetched += len(envs)
+                ok = await asyncio.gather(*(self._process(e) for e in envs))
+                # Persist before checkpointing so a crash never skips unsaved messages
+                await self.writer.flush()
+                failed = ok.count(False)
+                if failed:
+                    raise RuntimeError(f"{failed} of {len(envs)} messages in ids {ids[0]}..{ids[-1]} failed to process")
+                next_id = ids[-1] + 1
+                await self._checkpoint(channel_id, next_id, top, done=next_id > top)
+
+            if next_id > top:
+                self.channels_done += 1
+                log.info("backfill: ch=%s caught up to msg %s", channel_id, top)
+
+    async def _process(self, env: MessageEnvelope) -> bool:
+        async with self._worker_sem:
+            try:
+                await self.processor.process(env)
+                self.processed += 1
+                return True
+            except Exception:
+                self.failed += 1
+                log.exception("backfill: processing failed for channel=%s msg=%s", env.channel_id, env.message_id)
+                return False
+
+    async def _newest_id(self, channel_id: int) -> Optional[int]:
+        async for m in self.client.get_chat_history(channel_id, limit=1):
+            return m.id
+        return None
+
+    async def _rpc(self, channel_id: int, call: Callable[[], Awaitable[T]]) -> T:
+        """Run one RPC, sleeping through FloodWait a bounded number of times."""
+        for attempt in range(self.max_flood_retries + 1):
+            try:
+                self.rpcs += 1
+                return await call()
+            except FloodWait as e:
+                wait = int(getattr(e, "value", 0) or 0) + 1
+                if attempt >= self.max_flood_retries:
+                    raise
+                log.warning("backfill: FloodWait %ss on ch=%s, sleeping", wait, channel_id)
+                await asyncio.sleep(wait)
+        raise RuntimeError("unreachable")
+
+    async def _checkpoint(self, channel_id: int, next_id: int, target: Optional[int], done: bool = False) -> None:
+        await self.writer.checkpoint_backfill(channel_id, next_id, target, done)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from app.channel_cache import ChannelCache
+    from app.config import settings
+    from app.llm import LLMClient
+    from app.pipeline import build_processor
+
+    writer = SignalWriter(flush_interval_ms=settings.writer_flush_ms, max_batch=settings.writer_max_batch)
+    await writer.start()
+    channels = ChannelCache(writer=writer, flush_interval_seconds=settings.channel_flush_seconds)
+    await channels.load()
+    processor = await build_processor(LLMClient(), writer, channels)
+    client = Client(
+        name=settings.session_name,
+        api_id=settings.api_id,
+        api_hash=settings.api_hash,
+        workdir=settings.session_dir,
+    )
+    try:
+        async with client:
+            backfill = Backfiller(
+                client,
+                processor,
+                writer,
+                concurrency=args.concurrency or settings.backfill_concurrency,
+                workers=settings.backfill_workers,
+                chunk_size=settings.backfill_chunk_size,
+                max_messages=args.max_messages if args.max_messages is not None else settings.backfill_max_messages,
+            )
+            await backfill.plan(args.channel or None, restart=args.restart)
+            print(await backfill.run())
+    except RPCError as e:
+        raise SystemExit(f"telegram error: {e}")
+    finally:
+        await channels.stop()
+        await writer.stop()
+
+
+def main() -> None:
+    from app.log import setup_logging
+
+    ap = argparse.ArgumentParser(
+        prog="python -m app.backfill",
+        description="Fetch messages posted since each channel's last_message_id and run them through the pipeline.",
+    )
+    ap.add_argument("--channel", type=int, action="append", help="channel id (repeatable); default: all monitored")
+    ap.add_argument("--max-messages", type=int, default=None, help="per-channel cap, newest first (0 = no cap)")
+    ap.add_argument("--concurrency", type=int, default=None, help="channels fetched in parallel")
+    ap.add_argument("--restart", action="store_true", help="ignore unfinished checkpoints and start from last_message_id")
+    setup_logging()
+    asyncio.run(_main(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
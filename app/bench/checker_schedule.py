@@ -0,0 +1,170 @@
+from __future__ import annotations
+import argparse
+import json
+import math
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from app.check_schedule import Candidate, CheckPolicy, change_rates, fill, plan
+
+# Detection latency vs get_messages RPCs of the reconciliation sweep, in simulated time (no DB, no
+# Telegram). Channels post at random rates; a share of each channel's signals (skewed: most channels
+# never edit, a few edit constantly) is edited or deleted once, a lognormal delay after posting,
+# without the live handlers noticing. Compared:
+#   legacy    every due signal (12h/168h rule, no ORDER BY, LIMIT 2000), one RPC per 100 ids per channel
+#   priority  app.check_schedule with --budget RPCs per cycle (default: legacy's mean RPCs per cycle)
+#   python -m app.bench.checker_schedule --days 14 --channels 150
+
+_CHUNK = 100
+_LEGACY_LIMIT = 2000
+
+
+class _Sim:
+    __slots__ = ("id", "channel_id", "posted", "change_at", "deleted", "detected", "last_checked", "next_check")
+
+    def __init__(self, sid: int, channel_id: int, posted: datetime, change_at: datetime | None) -> None:
+        self.id = sid
+        self.channel_id = channel_id
+        self.posted = posted
+        self.change_at = change_at
+        self.deleted = False
+        self.detected = False
+        self.last_checked: datetime | None = None
+        self.next_check = posted  # as written by SignalWriter
+
+
+def _corpus(args: argparse.Namespace, start: datetime) -> list[_Sim]:
+    rnd = random.Random(args.seed)
+    end = start + timedelta(days=args.days)
+    out: list[_Sim] = []
+    for ch in range(1, args.channels + 1):
+        per_day = rnd.uniform(1, 2 * args.signals_per_day)
+        p_change = min(0.9, rnd.paretovariate(1.5) * 0.02) if rnd.random() < 0.5 else 0.0
+        t = start
+        while True:
+            t += timedelta(days=rnd.expovariate(per_day))
+            if t >= end:
+                break
+            change_at = None
+            if rnd.random() < p_change:
+                # Median delay 3h, long tail
+                change_at = t + timedelta(hours=math.exp(rnd.gauss(math.log(3), 1.5)))
+            out.append(_Sim(len(out) + 1, ch, t, change_at))
+    out.sort(key=lambda s: s.posted)
+    for i, s in enumerate(out, 1):
+        s.id = i
+    return out
+
+
+def _legacy_due(now: datetime, sigs: list[_Sim], policy: CheckPolicy) -> list[_Sim]:
+    due = []
+    for s in sigs:
+        if s.deleted or s.posted > now:
+            continue
+        if s.last_checked is None or now - s.last_checked >= policy.base_interval(now - s.posted):
+            due.append(s)
+            if len(due) >= _LEGACY_LIMIT:
+                break
+    return due
+
+
+def _priority_due(now: datetime, sigs: list[_Sim], budget: int) -> list[_Sim]:
+    due = [s for s in sigs if not s.deleted and s.posted <= now and s.next_check <= now]
+    due.sort(key=lambda s: s.next_check)
+    return due[: 2 * budget * _CHUNK]
+
+
+def _rpcs(batch: list[_Sim]) -> int:
+    return sum(math.ceil(n / _CHUNK) for n in Counter(s.channel_id for s in batch).values())
+
+
+def _run(mode: str, args: argparse.Namespace, budget: int) -> dict:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    sigs = _corpus(args, start)
+    policy = CheckPolicy(7, 12, 168, args.half_life_hours)
+    counts: dict[int, list[int]] = {}
+    for s in sigs:
+        counts.setdefault(s.channel_id, [0, 0])
+    latencies: list[float] = []
+    rpcs = cycles = 0
+    step = timedelta(seconds=args.interval_seconds)
+    now = start
+    while now < start + timedelta(days=args.days):
+        now += step
+        cycles += 1
+        if mode == "legacy":
+            batch = _legacy_due(now, sigs, policy)
+            rpcs += _rpcs(batch)
+            weight = None
+        else:
+            for c in counts.values():
+                c[0] = 0
+            for s in sigs:
+                if s.posted <= now:
+                    counts[s.channel_id][0] += 1
+            rates = change_rates((ch, n, d) for ch, (n, d) in counts.items())
+            pool = _priority_due(now, sigs, budget)
+            by_id = {s.id: s for s in pool}
+            cands = [Candidate(s.id, s.channel_id, 0, s.posted, s.last_checked, s.next_check, "") for s in pool]
+            chunks = plan(now, cands, rates, policy, _CHUNK, budget)
+            horizon = now + policy.recent_recheck
+            room = {ch for ch, part in chunks if len(part) < _CHUNK}
+            upcoming = sorted(
+                (s for s in sigs if s.channel_id in room and not s.deleted and s.posted <= now
+                 and now < s.next_check <= horizon),
+                key=lambda s: s.next_check,
+            )
+            by_id.update((s.id, s) for s in upcoming)
+            fill(chunks, [Candidate(s.id, s.channel_id, 0, s.posted, s.last_checked, s.next_check, "") for s in upcoming], _CHUNK)
+            batch = [by_id[c.id] for _, part in chunks for c in part]
+            rpcs += len(chunks)
+            weight = rates.weight
+        for s in batch:
+            if s.change_at is not None and not s.detected and s.change_at <= now:
+                s.detected = True
+                latencies.append((now - s.change_at).total_seconds() / 3600)
+                counts[s.channel_id][1] += 1
+                s.deleted = random.Random(s.id).random() < 0.5  # half of the changes are deletions
+            s.last_checked = now
+            if weight is not None:
+                s.next_check = policy.next_check(now, s.posted, weight(s.channel_id))
+
+    changed = [s for s in sigs if s.change_at is not None and s.change_at <= now]
+    latencies.sort()
+
+    def pct(q: float) -> float | None:
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 2) if latencies else None
+
+    return {
+        "mode": mode,
+        "rpcs": rpcs,
+        "rpcs_per_cycle": round(rpcs / cycles, 2),
+        "changes": len(changed),
+        "detected": len(latencies),
+        "latency_hours": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "p50": pct(0.5),
+            "p90": pct(0.9),
+        },
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.bench.checker_schedule", description="Simulate checker scheduling.")
+    ap.add_argument("--days", type=float, default=14)
+    ap.add_argument("--channels", type=int, default=150)
+    ap.add_argument("--signals-per-day", type=float, default=6, help="mean signals per channel per day")
+    ap.add_argument("--interval-seconds", type=int, default=1800, help="checker cycle interval")
+    ap.add_argument("--half-life-hours", type=float, default=24)
+    ap.add_argument("--budget", type=int, default=0, help="RPCs per priority cycle (default: legacy mean)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    legacy = _run("legacy", args, 0)
+    budget = args.budget or max(1, math.floor(legacy["rpcs_per_cycle"]))
+    print(json.dumps([legacy, {**_run("priority", args, budget), "budget": budget}], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import argparse
+import random
+import re
+import time
+
+from app.regex_gate import (
+    ENTRY_PATTERN,
+    LEVERAGE_PATTERN,
+    PRICE_PATTERN,
+    SIDE_PATTERN,
+    SL_PATTERN,
+    SYMBOL_PATTERN,
+    TP_PATTERN,
+    looks_like_signal,
+    looks_like_signal_batch,
+)
+
+# Micro-benchmark: single-pass gate vs. the original seven-regex implementation.
+#   python -m app.bench.regex_gate [--n 50000] [--repeat 5] [--fuzz 20000]
+
+_REF_RES = [
+    re.compile(p, re.I | re.U)
+    for p in (SYMBOL_PATTERN, SIDE_PATTERN, TP_PATTERN, SL_PATTERN, ENTRY_PATTERN, LEVERAGE_PATTERN)
+]
+_REF_PRICE_RE = re.compile(PRICE_PATTERN)
+
+
+def reference_looks_like_signal(text: str) -> bool:
+    """The gate as it was before the combined scanner; kept here as the semantic reference."""
+    if not text:
+        return False
+    hits = sum(1 for r in _REF_RES if r.search(text))
+    if len(_REF_PRICE_RE.findall(text)) >= 3:
+        hits += 1
+    return hits >= 2
+
+
+SAMPLES = [
+    "BTC/USDT LONG x10\nEntry: 64200-64500\nTP: 65000, 65800, 67000\nSL: 63400",
+    "#ETH SHORT\nВход: 3500\nЦели:\n1) 3400\n2) 3300\nСтоп лосс 3600\nПлечо 20",
+    "Good morning everyone! Markets are quiet today, stay tuned for updates.",
+    "Друзья, сегодня стрим в 19:00 по мск, разберём рынок и ответим на вопросы.",
+    "SOLUSDT buy zone 140-142, targets 150 / 160, stop 135, lev 5",
+    "Закрыли сделку по ETH в плюс 35%, поздравляю всех кто зашёл!",
+    "New listing on Binance: XYZ. Deposits open at 10:00 UTC.",
+    "покупаем DOGE, тейк профит 0.18 0.2, стоплосс 0.14",
+    "",
+    "😀🚀🚀 to the moon",
+    "Weekly recap: 12 trades, 9 wins, 3 losses. Thanks for staying with us.",
+]
+
+_ALPHABET = (
+    list("abcdefxyzABCXYZ/:.,-_()\n \t0123456789%#$")
+    + ["long", "short", "buy", "sell", "tp", "t/p", "sl", "s/l", "take profit", "stop loss", "entry point",
+       "enter", "targets", "lev", "leverage", "10x", "x 25", "плечо", "кредитное плечо", "лонг", "шорт",
+       "покупка", "продаем", "цели", "цель", "вход", "заходим", "стоп", "стоплосс", "тейк профит",
+       "USDT", "PERP", "СТОП", "Лонг", "ВХОД", "Цели", "ТЕЙК", "Entry", "X10", "LEV", "12345.678", "3.5", "ſ", "K", "ı", "é"]
+)
+
+
+def _random_text(rnd: random.Random) -> str:
+    return "".join(rnd.choice(_ALPHABET) for _ in range(rnd.randint(0, 40)))
+
+
+def fuzz(n: int, seed: int = 0) -> int:
+    """Compare both implementations on random token soup; raise on the first disagreement."""
+    rnd = random.Random(seed)
+    for text in SAMPLES:
+        if looks_like_signal(text) != reference_looks_like_signal(text):
+            raise AssertionError(f"mismatch on sample {text!r}")
+    for _ in range(n):
+        text = _random_text(rnd)
+        if looks_like_signal(text) != reference_looks_like_signal(text):
+            raise AssertionError(f"mismatch on {text!r}")
+    return n + len(SAMPLES)
+
+
+def _best(fn, texts: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(texts)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--n", type=int, default=50_000, help="texts per run")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--fuzz", type=int, default=20_000, help="random texts checked for equivalence")
+    args = ap.parse_args()
+
+    checked = fuzz(args.fuzz)
+    print(f"equivalence: {checked} texts OK")
+
+    rnd = random.Random(1)
+    texts = [rnd.choice(SAMPLES) for _ in range(args.n)]
+    runs = {
+        "reference": lambda ts: [reference_looks_like_signal(t) for t in ts],
+        "single-pass": lambda ts: [looks_like_signal(t) for t in ts],
+        "batch": looks_like_signal_batch,
+    }
+    base = None
+    for name, fn in runs.items():
+        sec = _best(fn, texts, args.repeat)
+        base = base or sec
+        print(f"{name:12s} {sec * 1e6 / len(texts):7.2f} µs/text  {len(texts) / sec:10.0f} texts/s  x{base / sec:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+# Offline replay of a MessageEnvelope corpus through the real pipeline (IngestQueue -> Processor ->
+# SignalWriter -> SQLite) with a fake LLM and a fake Telegram client. No network, no credentials.
+#   python -m app.bench.replay --generate 5000 --corpus /tmp/corpus.jsonl      # synthetic corpus
+#   python -m app.bench.replay --export-db signals.db --corpus /tmp/corpus.jsonl  # from a real DB
+#   python -m app.bench.replay --corpus /tmp/corpus.jsonl --llm-latency-ms 300 --checker
+# App modules are imported lazily: the DB URL and dummy credentials must be set before app.config loads.
+
+_TEMPLATES_SIGNAL = [
+    "{sym}/USDT {SIDE} x{lev}\nEntry: {p}\nTP: {tp1}, {tp2}, {tp3}\nSL: {sl}",
+    "#{sym} {SIDE}\nВход: {p}\nЦели:\n1) {tp1}\n2) {tp2}\nСтоп лосс {sl}\nПлечо {lev}",
+    "{sym}USDT {side} zone {p}, targets {tp1} / {tp2}, stop {sl}, lev {lev}",
+    "Looking at {sym} here, I think a {side} from around {p} makes sense, first target {tp1}",
+]
+_TEMPLATES_CHATTER = [
+    "Good morning everyone! Markets are quiet today, stay tuned for updates.",
+    "Друзья, сегодня стрим в {h}:00 по мск, разберём рынок и ответим на вопросы.",
+    "Закрыли сделку по {sym} в плюс {pct}%, поздравляю всех кто зашёл!",
+    "New listing on Binance: {sym}. Deposits open at {h}:00 UTC.",
+    "Weekly recap: {n} trades, {w} wins. Thanks for staying with us.",
+    "{sym} is pumping, who is in? 🚀🚀",
+]
+_SYMS = ["BTC", "ETH", "SOL", "DOGE", "XRP", "ADA", "LINK", "AVAX", "TON", "ARB"]
+
+
+def generate_corpus(path: str, n: int, channels: int = 50, signal_share: float = 0.25,
+                    repost_share: float = 0.1, seed: int = 0) -> int:
+    """Synthetic corpus: templated signals/chatter across channels, with cross-channel reposts."""
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    next_id = {c: 1 for c in range(channels)}
+    recent: list[str] = []
+    with open(path, "w", encoding="utf-8") as fh:
+        for i in range(n):
+            ch = rnd.randrange(channels)
+            if recent and rnd.random() < repost_share:
+                text = rnd.choice(recent) + rnd.choice(["", "\n\n@channel", " 🔥", "\nhttps://t.me/x"])
+            elif rnd.random() < signal_share:
+                p = rnd.uniform(0.1, 70000)
+                side = rnd.choice(["long", "short"])
+                up = 1 if side == "long" else -1
+                text = rnd.choice(_TEMPLATES_SIGNAL).format(
+                    sym=rnd.choice(_SYMS), side=side, SIDE=side.upper(), lev=rnd.choice([5, 10, 20, 25]),
+                    p=f"{p:.4g}", tp1=f"{p * (1 + up * 0.02):.4g}", tp2=f"{p * (1 + up * 0.04):.4g}",
+                    tp3=f"{p * (1 + up * 0.06):.4g}", sl=f"{p * (1 - up * 0.03):.4g}",
+                )
+                recent = (recent + [text])[-200:]
+            else:
+                text = rnd.choice(_TEMPLATES_CHATTER).format(
+                    sym=rnd.choice(_SYMS), h=rnd.randint(8, 22), pct=rnd.randint(5, 90),
+                    n=rnd.randint(5, 30), w=rnd.randint(1, 5),
+                )
+            env = {
+                "channel_id": -1001000000000 - ch,
+                "channel_title": f"Channel {ch}",
+                "channel_username": f"channel_{ch}",
+                "message_id": next_id[ch],
+                "message_date": (start + timedelta(seconds=i * 7)).isoformat(),
+                "text": text,
+            }
+            next_id[ch] += 1
+            fh.write(json.dumps(env, ensure_ascii=False) + "\n")
+    return n
+
+
+async def export_db(db_url: str, path: str) -> int:
+    """Corpus from a real DB: stored signals plus logged rejections, in message order."""
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.models import Channel, RejectedMessage, Signal
+
+    engine = create_async_engine(db_url)
+    async with engine.connect() as conn:
+        titles = {r.id: (r.title, r.username) for r in (await conn.execute(select(Channel.id, Channel.title, Channel.username)))}
+        rows = list(await conn.execute(select(Signal.channel_id, Signal.message_id, Signal.message_date, Signal.original_text)))
+        rows += list(await conn.execute(
+            select(RejectedMessage.channel_id, RejectedMessage.message_id, RejectedMessage.message_date, RejectedMessage.text)
+        ))
+    await engine.dispose()
+    rows.sort(key=lambda r: (r[2], r[1]))
+    with open(path, "w", encoding="utf-8") as fh:
+        for ch, mid, date, text in rows:
+            title, username = titles.get(ch, (None, None))
+            fh.write(json.dumps({
+                "channel_id": ch, "channel_title": title, "channel_username": username,
+                "message_id": mid, "message_date": date.isoformat(), "text": text,
+            }, ensure_ascii=False) + "\n")
+    return len(rows)
+
+
+class LLMSim:
+    """Shared latency/error model and call accounting for the fake LLM runnables."""
+
+    def __init__(self, latency_ms: float, jitter: float, error_rate: float, rate_limit_rate: float, seed: int) -> None:
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rnd = random.Random(seed)
+        self.calls: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.tokens = 0
+
+    async def call(self, kind: str, prompt_chars: int) -> None:
+        import httpx
+        import openai
+
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        self.tokens += prompt_chars // 3
+        if self.latency:
+            await asyncio.sleep(max(0.0, self.rnd.lognormvariate(0, self.jitter) * self.latency if self.jitter else self.latency))
+        req = httpx.Request("POST", "https://fake.invalid/v1/chat/completions")
+        r = self.rnd.random()
+        if r < self.rate_limit_rate:
+            self.errors["429"] = self.errors.get("429", 0) + 1
+            resp = httpx.Response(429, headers={"retry-after-ms": "200"}, request=req)
+            raise openai.RateLimitError("rate limited (simulated)", response=resp, body=None)
+        if r < self.rate_limit_rate + self.error_rate:
+            self.errors["timeout"] = self.errors.get("timeout", 0) + 1
+            raise openai.APITimeoutError(request=req)
+
+
+_QUOTED_RE = re.compile(r"`(.*)`", re.S)
+_NUMBERED_RE = re.compile(r"\[(\d+)\] `(.*?)`(?=\n\n\[\d+\] `|\Z)", re.S)
+
+
+def _truth(text: str):
+    """Deterministic oracle: a message is a signal iff the rule parser extracts symbol + side."""
+    from app.rule_parser import parse_signal_rules
+
+    rule = parse_signal_rules(text)
+    return rule.fields if rule is not None else None
+
+
+class _FakeRunnable:
+    def __init__(self, kind: str, sim: LLMSim) -> None:
+        self.kind = kind
+        self.sim = sim
+
+    async def ainvoke(self, prompt: list) -> Any:
+        from langchain_core.messages import AIMessage
+
+        from app.schemas import BatchVerdictItem, BatchVerdicts, SignalVerdict
+
+        body = str(prompt[-1].content)
+        await self.sim.call(self.kind, sum(len(str(m.content)) for m in prompt))
+        if self.kind == "classify_batch":
+            items = [BatchVerdictItem(index=int(i), is_signal=_truth(t) is not None) for i, t in _NUMBERED_RE.findall(body)]
+            parsed: Any = BatchVerdicts(items=items)
+        else:
+            m = _QUOTED_RE.search(body)
+            fields = _truth(m.group(1) if m else body)
+            if self.kind == "classify":
+                return AIMessage("yes" if fields else "no", usage_metadata=_usage(body, 1))
+            parsed = fields if self.kind == "parse" else SignalVerdict(is_signal=fields is not None, signal=fields)
+        return {"raw": AIMessage("", usage_metadata=_usage(body, 40)), "parsed": parsed, "parsing_error": None}
+
+
+def _usage(body: str, out: int) -> dict:
+    inp = len(body) // 3 + 60
+    return {"input_tokens": inp, "output_tokens": out, "total_tokens": inp + out}
+
+
+def make_fake_llm(sim: LLMSim, limiter: Any = None) -> Any:
+    """Real LLMClient (prompts, limiter, retries) with the model calls replaced by `sim`."""
+    from app.llm import LLMClient
+
+    client = LLMClient(limiter=limiter)
+    client.llm = _FakeRunnable("classify", sim)
+    client._structured_llm = _FakeRunnable("parse", sim)
+    client._verdict_llm = _FakeRunnable("classify_and_parse", sim)
+    client._batch_verdict_llm = _FakeRunnable("classify_batch", sim)
+    return client
+
+
+class FakeTelegram:
+    """get_messages over the stored signals with deterministic deletions/edits, latency and FloodWaits."""
+
+    def __init__(self, texts: dict[tuple[int, int], str], delete_rate: float = 0.05, edit_rate: float = 0.05,
+                 latency_ms: float = 50, flood_rate: float = 0.0, seed: int = 0) -> None:
+        self.texts = texts
+        self.delete_rate = delete_rate
+        self.edit_rate = edit_rate
+        self.latency = latency_ms / 1000.0
+        self.flood_rate = flood_rate
+        self.rnd = random.Random(seed)
+        self.rpcs = 0
+
+    def _roll(self, chat_id: int, message_id: int) -> float:
+        return (zlib.crc32(f"{chat_id}:{message_id}".encode()) % 10_000) / 10_000
+
+    async def get_messages(self, chat_id: int, message_ids: list[int]) -> list:
+        from pyrogram.errors import FloodWait
+
+        self.rpcs += 1
+        await asyncio.sleep(self.latency)
+        if self.rnd.random() < self.flood_rate:
+            raise FloodWait(value=0)
+        out = []
+        for mid in message_ids:
+            roll = self._roll(chat_id, mid)
+            text = self.texts.get((chat_id, mid))
+            if text is None or roll < self.delete_rate:
+                out.append(SimpleNamespace(id=mid, empty=True, text=None, caption=None, edit_date=None))
+            elif roll < self.delete_rate + self.edit_rate:
+                out.append(SimpleNamespace(id=mid, empty=False, text=text + "\nUPD: moved SL",
+                                           caption=None, edit_date=datetime.now(timezone.utc)))
+            else:
+                out.append(SimpleNamespace(id=mid, empty=False, text=text, caption=None, edit_date=None))
+        return out
+
+
+def _ms(summary: dict) -> dict:
+    return {k: (round(v * 1000, 3) if isinstance(v, float) and k != "count" else v) for k, v in summary.items()}
+
+
+async def replay(args: argparse.Namespace) -> dict:
+    from sqlalchemy import event, func, select
+
+    from app.channel_cache import ChannelCache
+    from app.checker import MessageChecker
+    from app.db import Base, engine, AsyncSessionLocal
+    from app.dedup import DedupCache
+    from app.ingest import _QUEUE_WAIT, IngestQueue
+    from app.llm_batch import ClassifyBatcher
+    from app.models import Signal
+    from app.processor import MessageEnvelope, Processor
+    from app.ratelimit import AdaptiveLimiter
+    from app.writer import SignalWriter
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    commits = {"n": 0}
+    event.listen(engine.sync_engine, "commit", lambda conn: commits.__setitem__("n", commits["n"] + 1))
+
+    with open(args.corpus, encoding="utf-8") as fh:
+        envs = [MessageEnvelope.from_dict(json.loads(line)) for line in fh if line.strip()]
+    if args.limit:
+        envs = envs[: args.limit]
+
+    sim = LLMSim(args.llm_latency_ms, args.llm_jitter, args.llm_error_rate, args.llm_429_rate, args.seed)
+    llm = make_fake_llm(sim, AdaptiveLimiter(max_concurrency=args.llm_concurrency, initial_concurrency=args.llm_concurrency))
+    writer = SignalWriter(flush_interval_ms=args.writer_flush_ms, max_batch=args.writer_max_batch)
+    await writer.start()
+    channels = ChannelCache(writer)
+    await channels.load()
+    dedup = None if args.no_dedup else DedupCache(writer)
+    processor = Processor(
+        llm=llm,
+        writer=writer,
+        channels=channels,
+        dedup=dedup,
+        single_call=args.mode == "single_call",
+        rule_min_confidence=None if args.no_rules else 0.85,
+        batcher=ClassifyBatcher(llm, max_batch=args.batch_max) if args.batch_max > 1 else None,
+    )
+    ingest = IngestQueue(processor, maxsize=args.queue_size, workers=args.workers)
+    await ingest.start()
+
+    started = time.perf_counter()
+    for env in envs:
+        await ingest.submit(env)
+    await ingest.stop(drain_timeout=3600)
+    await channels.stop()
+    await writer.stop()
+    elapsed = time.perf_counter() - started
+
+    async with AsyncSessionLocal() as session:
+        stored = await session.scalar(select(func.count()).select_from(Signal))
+
+    report: dict[str, Any] = {
+        "messages": len(envs),
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(len(envs) / elapsed, 1) if elapsed else None,
+        "signals_stored": stored,
+        "db_commits": commits["n"],
+        "stages_ms": {stage: _ms(s) for stage, s in processor.stage_stats().items()},
+        "queue_wait_ms": _ms(_QUEUE_WAIT.summary()),
+        "paths": processor.stats()["paths"],
+        "llm": {"calls": sim.calls, "errors": sim.errors, "prompt_tokens_est": sim.tokens,
+                "limiter": {k: v for k, v in llm.limiter.stats().items() if k != "wait_seconds"}},
+    }
+
+    if args.checker:
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(select(Signal.channel_id, Signal.message_id, Signal.original_text))).all()
+        tg = FakeTelegram({(r[0], r[1]): r[2] for r in rows}, latency_ms=args.tg_latency_ms,
+                          flood_rate=args.tg_flood_rate, seed=args.seed)
+        checker = MessageChecker(tg, writer, chunk_size=100, concurrency=4)
+        commits_before = commits["n"]
+        t0 = time.perf_counter()
+        await checker._cycle()
+        report["checker"] = {
+            "seconds": round(time.perf_counter() - t0, 3),
+            "rpcs": tg.rpcs,
+            "deleted": checker._deleted_count,
+            "edited": checker._edited_count,
+            "db_commits": commits["n"] - commits_before,
+        }
+
+    await engine.dispose()
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.bench.replay")
+    ap.add_argument("--corpus", required=True, help="JSONL of MessageEnvelope dicts")
+    ap.add_argument("--generate", type=int, default=0, help="write a synthetic corpus of N messages first")
+    ap.add_argument("--export-db", default=None, help="write the corpus from this SQLite DB file first")
+    ap.add_argument("--db", default=None, help="scratch SQLite file (default: temp file)")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--queue-size", type=int, default=1000)
+    ap.add_argument("--mode", choices=["two_step", "single_call"], default="two_step")
+    ap.add_argument("--batch-max", type=int, default=1, help="packed classification batch size (1 = off)")
+    ap.add_argument("--no-dedup", action="store_true")
+    ap.add_argument("--no-rules", action="store_true")
+    ap.add_argument("--writer-flush-ms", type=int, default=200)
+    ap.add_argument("--writer-max-batch", type=int, default=500)
+    ap.add_argument("--llm-latency-ms", type=float, default=300)
+    ap.add_argument("--llm-jitter", type=float, default=0.3, help="lognormal sigma of the latency")
+    ap.add_argument("--llm-error-rate", type=float, default=0.0, help="share of calls failing with a timeout")
+    ap.add_argument("--llm-429-rate", type=float, default=0.0, help="share of calls rejected with 429")
+    ap.add_argument("--llm-concurrency", type=int, default=16)
+    ap.add_argument("--checker", action="store_true", help="run one MessageChecker cycle afterwards")
+    ap.add_argument("--tg-latency-ms", type=float, default=50)
+    ap.add_argument("--tg-flood-rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="sc-replay-"), "replay.db")
+    os.environ["DB_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    for key, value in (("API_ID", "0"), ("API_HASH", "replay"), ("OPENAI_API_KEY", "sk-replay"),
+                       ("LOG_LEVEL", "WARNING")):
+        os.environ.setdefault(key, value)
+
+    if args.export_db:
+        n = asyncio.run(export_db(f"sqlite+aiosqlite:///{Path(args.export_db).resolve()}", args.corpus))
+        print(f"exported {n} messages to {args.corpus}")
+    elif args.generate:
+        generate_corpus(args.corpus, args.generate, seed=args.seed)
+        print(f"generated {args.generate} messages in {args.corpus}")
+
+    import logging
+
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(asyncio.run(replay(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
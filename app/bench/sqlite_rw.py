@@ -0,0 +1,194 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+# Concurrent read/write throughput of the SQLite storage profiles:
+#   default: one engine, default pool, SQLite defaults (rollback journal, synchronous=FULL)
+#   tuned:   WAL + PRAGMAs, single write connection, separate query_only read pool (app/db.py)
+# One writer commits signal batches (with rollups, like SignalWriter) while API-style readers
+# run listings and stats against the same file.
+#   python -m app.bench.sqlite_rw [--seconds 10] [--readers 8] [--batch 50] [--seed-rows 200000]
+
+os.environ.setdefault("API_ID", "1")
+os.environ.setdefault("API_HASH", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.db import Base, make_engine  # noqa: E402
+from app.models import Channel, Signal, TradeSide  # noqa: E402
+from app.schemas import PersistedSignal  # noqa: E402
+from app.service import query, rollups  # noqa: E402
+
+CHANNELS = 50
+SYMBOLS = ["BTC", "ETH", "SOL", "XRP", "DOGE", "ADA", "AVAX", "LINK", "DOT", "TON"]
+
+
+def _pct(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+
+def _record(rnd: random.Random, message_id: int, base: datetime) -> PersistedSignal:
+    return PersistedSignal(
+        channel_id=rnd.randint(1, CHANNELS),
+        message_id=message_id,
+        message_date=base + timedelta(seconds=message_id * 7),
+        symbol=rnd.choice(SYMBOLS),
+        side=rnd.choice(["long", "short"]),
+        leverage=rnd.choice([None, 5, 10, 20]),
+        stop_loss=[1.0],
+        take_profits=[1.1, 1.2],
+        original_text="BENCH LONG x10 TP 1.1 1.2 SL 1.0 " * 3,
+    )
+
+
+def _row(rec: PersistedSignal, now: datetime) -> dict:
+    return {
+        **rec.model_dump(),
+        "side": TradeSide(rec.side),
+        "deleted": False,
+        "edited": False,
+        "next_check_at": rec.message_date,
+        "created_at": now,
+    }
+
+
+async def _seed(path: str, rows: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    rnd = random.Random(0)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as session:
+        await session.execute(
+            sqlite_insert(Channel),
+            [{"id": i, "title": f"ch{i}", "created_at": now, "updated_at": now} for i in range(1, CHANNELS + 1)],
+        )
+        for start in range(0, rows, 5000):
+            recs = [_record(rnd, i, base) for i in range(start, min(rows, start + 5000))]
+            await session.execute(sqlite_insert(Signal), [_row(r, now) for r in recs])
+        await rollups.rebuild(session)
+        await session.commit()
+    await engine.dispose()
+
+
+async def _run(profile: str, path: str, seconds: float, readers: int, batch: int, first_id: int) -> dict:
+    url = f"sqlite+aiosqlite:///{path}"
+    if profile == "tuned":
+        write_engine = make_engine(url, pool_size=1, tuned=True)
+        read_engine = make_engine(url, pool_size=readers, read_only=True, tuned=True)
+    else:
+        write_engine = read_engine = create_async_engine(url)
+    Write = async_sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+    Read = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+    deadline = time.monotonic() + seconds
+    commit_lat: list[float] = []
+    read_lat: list[float] = []
+    errors = {"write": 0, "read": 0}
+    written = 0
+
+    async def writer() -> None:
+        nonlocal written
+        rnd = random.Random(1)
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        next_id = first_id
+        while time.monotonic() < deadline:
+            recs = [_record(rnd, next_id + i, base) for i in range(batch)]
+            next_id += batch
+            t0 = time.perf_counter()
+            try:
+                async with Write() as session:
+                    now = datetime.now(timezone.utc)
+                    await session.execute(sqlite_insert(Signal).on_conflict_do_nothing(), [_row(r, now) for r in recs])
+                    await rollups.apply_inserted(session, recs)
+                    await session.commit()
+                commit_lat.append(time.perf_counter() - t0)
+                written += len(recs)
+            except Exception:
+                errors["write"] += 1
+            await asyncio.sleep(0)
+
+    async def reader(seed: int) -> None:
+        rnd = random.Random(seed)
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                async with Read() as session:
+                    kind = rnd.random()
+                    if kind < 0.5:
+                        await query.get_signals_by_channel(session, rnd.randint(1, CHANNELS), limit=100)
+                    elif kind < 0.75:
+                        await query.get_signals_by_symbol(session, rnd.choice(SYMBOLS), limit=100)
+                    elif kind < 0.9:
+                        await query.list_channels_with_counts(session)
+                    else:
+                        await query.stats_by_channel(session)
+                read_lat.append(time.perf_counter() - t0)
+            except Exception:
+                errors["read"] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(writer(), *(reader(i) for i in range(readers)))
+    elapsed = time.monotonic() - started
+    await write_engine.dispose()
+    if read_engine is not write_engine:
+        await read_engine.dispose()
+    return {
+        "profile": profile,
+        "rows_written_per_sec": round(written / elapsed, 1),
+        "commits_per_sec": round(len(commit_lat) / elapsed, 1),
+        "commit_ms": {"p50": _pct(commit_lat, 0.5), "p99": _pct(commit_lat, 0.99)},
+        "reads_per_sec": round(len(read_lat) / elapsed, 1),
+        "read_ms": {"p50": _pct(read_lat, 0.5), "p99": _pct(read_lat, 0.99)},
+        "errors": errors,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ("default", "tuned"):
+            path = os.path.join(tmp, f"{profile}.db")
+            await _seed(path, args.seed_rows)
+            if profile == "default":
+                # The tuned run converts its file to WAL; make sure this one starts in rollback-journal mode
+                with sqlite3.connect(path) as conn:
+                    conn.execute("PRAGMA journal_mode=DELETE")
+            results.append(await _run(profile, path, args.seconds, args.readers, args.batch, args.seed_rows))
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.bench.sqlite_rw", description=__doc__)
+    ap.add_argument("--seconds", type=float, default=10.0, help="duration of each profile run")
+    ap.add_argument("--readers", type=int, default=8, help="concurrent API-style readers")
+    ap.add_argument("--batch", type=int, default=50, help="signals per write transaction")
+    ap.add_argument("--seed-rows", type=int, default=200_000, help="signals in the database before the run")
+    args = ap.parse_args()
+    results = asyncio.run(main_async(args))
+    default, tuned = results
+    print(json.dumps({
+        "runs": results,
+        "speedup": {
+            "writes": round(tuned["rows_written_per_sec"] / max(1e-9, default["rows_written_per_sec"]), 2),
+            "reads": round(tuned["reads_per_sec"] / max(1e-9, default["reads_per_sec"]), 2),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
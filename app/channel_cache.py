@@ -0,0 +1,129 @@
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.db import ReadSessionLocal
+from app.models import Channel
+from app.writer import ChannelUpsert, SignalWriter
+
+log = logging.getLogger("sc.channels")
+
+
+class _Entry:
+    __slots__ = ("title", "username", "last_message_id")
+
+    def __init__(self, title: Optional[str], username: Optional[str], last_message_id: Optional[int]) -> None:
+        self.title = title
+        self.username = username
+        self.last_message_id = last_message_id
+
+
+class ChannelCache:
+    """
+    Process-wide mirror of the `channels` table.
+
+    - Seeded once at startup; afterwards the DB is only written when a channel is new
+      or its title/username actually changed.
+    - `last_message_id` advances are coalesced in memory and handed to the writer
+      every `flush_interval_seconds` as one batch.
+    """
+
+    def __init__(self, writer: SignalWriter, flush_interval_seconds: float = 30.0) -> None:
+        self.writer = writer
+        self.flush_interval = max(1.0, flush_interval_seconds)
+        self._entries: dict[int, _Entry] = {}
+        self._pending_bumps: dict[int, int] = {}
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+
+    async def load(self) -> None:
+        async with ReadSessionLocal() as session:
+            rows = (await session.execute(select(Channel.id, Channel.title, Channel.username, Channel.last_message_id))).all()
+        self._entries = {r.id: _Entry(r.title, r.username, r.last_message_id) for r in rows}
+        log.info("channel cache loaded: %s channels", len(self._entries))
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._runner(), name="channel-cache-flush")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self.flush()
+
+    def get(self, channel_id: int) -> Optional[_Entry]:
+        return self._entries.get(channel_id)
+
+    def observe(
+        self,
+        channel_id: int,
+        title: Optional[str],
+        username: Optional[str],
+        last_message_id: Optional[int],
+        write_now: bool = False,
+    ) -> Optional[ChannelUpsert]:
+        """
+        Record a message seen in a channel.
+
+        Returns an upsert that must be written with the current batch, or None when the
+        change can wait for the periodic flush. With `write_now` (e.g. when a signal row is
+        being written anyway) any pending `last_message_id` bump rides along.
+        """
+        entry = self._entries.get(channel_id)
+        if entry is None:
+            self._entries[channel_id] = _Entry(title, username, last_message_id)
+            self._pending_bumps.pop(channel_id, None)
+            return ChannelUpsert(channel_id, title, username, last_message_id)
+
+        meta_changed = False
+        if title and entry.title != title:
+            entry.title = title
+            meta_changed = True
+        if username and entry.username != username:
+            entry.username = username
+            meta_changed = True
+
+        advanced = bool(last_message_id) and (not entry.last_message_id or last_message_id > entry.last_message_id)
+        if advanced:
+            entry.last_message_id = last_message_id
+
+        if meta_changed or write_now:
+            bump = self._pending_bumps.pop(channel_id, None)
+            return ChannelUpsert(
+                channel_id,
+                title if meta_changed else None,
+                username if meta_changed else None,
+                last_message_id if advanced else bump,
+            )
+
+        if advanced:
+            self._pending_bumps[channel_id] = last_message_id
+        return None
+
+    def flush(self) -> int:
+        """Hand coalesced `last_message_id` bumps to the writer. Returns the number of channels queued."""
+        if not self._pending_bumps:
+            return 0
+        bumps, self._pending_bumps = self._pending_bumps, {}
+        for channel_id, last_message_id in bumps.items():
+            self.writer.add_channel(ChannelUpsert(channel_id, last_message_id=last_message_id))
+        log.debug("channel cache: queued %s last_message_id bumps", len(bumps))
+        return len(bumps)
+
+    async def _runner(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush()
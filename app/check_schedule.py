@@ -0,0 +1,164 @@
+from __future__ import annotations
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ChannelStat
+
+# Priority model of the reconciliation sweep.
+# - A channel's change rate is the share of its signals ever deleted or edited (channel_stats
+#   rollups, i.e. the `deleted` flags and `signal_editions`), shrunk toward the global rate while
+#   the channel has few signals.
+# - Changes cluster right after posting: the share of a signal's changes that happen by age `a`
+#   is modelled as a / (a + half_life).
+# - The value of checking a signal is the expected number of changes it accumulated since it was
+#   last seen (or posted), so a fresh signal of a channel that edits constantly outranks a week-old
+#   one of a channel that never does. One RPC covers a chunk of ids of one channel; the budget is
+#   spent on the chunks with the highest total value.
+
+_PRIOR_SIGNALS = 20.0
+_MIN_RATE = 0.005
+# Recheck intervals scale with rate / global rate within these bounds
+_MIN_WEIGHT, _MAX_WEIGHT = 0.5, 4.0
+
+
+def _utc(dt: datetime) -> datetime:
+    # SQLite hands DateTime(timezone=True) columns back naive; they are stored in UTC
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+class Candidate(NamedTuple):
+    id: int
+    channel_id: int
+    message_id: int
+    message_date: datetime
+    last_checked_time: Optional[datetime]
+    next_check_at: datetime
+    original_text: str
+
+
+class ChangeRates:
+    """Smoothed per-channel probability that a signal gets deleted or edited."""
+
+    __slots__ = ("by_channel", "overall")
+
+    def __init__(self, by_channel: dict[int, float], overall: float) -> None:
+        self.by_channel = by_channel
+        self.overall = overall
+
+    def get(self, channel_id: int) -> float:
+        return self.by_channel.get(channel_id, self.overall)
+
+    def weight(self, channel_id: int) -> float:
+        """Check frequency relative to an average channel."""
+        return min(_MAX_WEIGHT, max(_MIN_WEIGHT, self.get(channel_id) / self.overall))
+
+
+async def load_rates(session: AsyncSession) -> ChangeRates:
+    rows = (
+        await session.execute(
+            select(ChannelStat.channel_id, ChannelStat.total, ChannelStat.deleted + ChannelStat.edited)
+        )
+    ).all()
+    return change_rates(rows)
+
+
+def change_rates(rows: Iterable[tuple[int, int, int]]) -> ChangeRates:
+    """From (channel_id, signals, signals deleted or edited) rows."""
+    rows = list(rows)
+    total = sum(r[1] for r in rows)
+    changed = sum(r[2] for r in rows)
+    overall = min(1.0, max(_MIN_RATE, changed / total if total else 0.0))
+    by_channel = {
+        ch: min(1.0, max(_MIN_RATE, (c + _PRIOR_SIGNALS * overall) / (n + _PRIOR_SIGNALS)))
+        for ch, n, c in rows
+    }
+    return ChangeRates(by_channel, overall)
+
+
+class CheckPolicy:
+    """
+    Recheck cadence: signals younger than `recent_days` every `recent_recheck_hours`, older ones
+    every `old_recheck_hours`, each divided by the channel's weight (see ChangeRates.weight).
+    """
+
+    __slots__ = ("recent_window", "recent_recheck", "old_recheck", "half_life")
+
+    def __init__(
+        self,
+        recent_days: float = 7,
+        recent_recheck_hours: float = 12,
+        old_recheck_hours: float = 168,
+        half_life_hours: float = 24,
+    ) -> None:
+        self.recent_window = timedelta(days=recent_days)
+        self.recent_recheck = timedelta(hours=recent_recheck_hours)
+        self.old_recheck = timedelta(hours=old_recheck_hours)
+        self.half_life = max(60.0, half_life_hours * 3600)
+
+    def base_interval(self, age: timedelta) -> timedelta:
+        return self.recent_recheck if age < self.recent_window else self.old_recheck
+
+    def next_check(self, now: datetime, message_date: datetime, weight: float = 1.0) -> datetime:
+        return now + self.base_interval(now - _utc(message_date)) / weight
+
+    def _share(self, age: timedelta) -> float:
+        s = max(0.0, age.total_seconds())
+        return s / (s + self.half_life)
+
+    def score(self, now: datetime, c: Candidate, rate: float) -> float:
+        posted = _utc(c.message_date)
+        age = now - posted
+        seen = _utc(c.last_checked_time) - posted if c.last_checked_time else timedelta(0)
+        expected = rate * max(0.0, self._share(age) - self._share(seen))
+        # Overdue signals gain up to 2x so low-value ones are not starved by a steady fresh stream
+        overdue = (now - _utc(c.next_check_at)) / self.base_interval(age)
+        return expected * (1.0 + min(1.0, max(0.0, overdue)))
+
+
+def plan(
+    now: datetime,
+    candidates: Sequence[Candidate],
+    rates: ChangeRates,
+    policy: CheckPolicy,
+    chunk_size: int,
+    budget: int,
+) -> list[tuple[int, list[Candidate]]]:
+    """Pick at most `budget` (channel_id, chunk) pairs, one get_messages RPC each, by total score."""
+    by_channel: dict[int, list[tuple[float, Candidate]]] = defaultdict(list)
+    for c in candidates:
+        by_channel[c.channel_id].append((policy.score(now, c, rates.get(c.channel_id)), c))
+    chunks: list[tuple[float, int, list[Candidate]]] = []
+    for ch, items in by_channel.items():
+        items.sort(key=lambda x: x[0], reverse=True)
+        for i in range(0, len(items), chunk_size):
+            part = items[i:i + chunk_size]
+            chunks.append((sum(s for s, _ in part), ch, [c for _, c in part]))
+    best = heapq.nlargest(max(1, budget), chunks, key=lambda x: x[0])
+    return [(ch, part) for _, ch, part in best]
+
+
+def fill(
+    chunks: list[tuple[int, list[Candidate]]], upcoming: Sequence[Candidate], chunk_size: int
+) -> int:
+    """
+    Top up chunks with spare ids with `upcoming` signals of the same channel (soonest first):
+    checking them early rides on an RPC that is made anyway. Returns how many were added.
+    """
+    room: dict[int, list[Candidate]] = {}
+    for ch, part in chunks:
+        if len(part) < chunk_size and ch not in room:
+            room[ch] = part
+    taken = {c.id for _, part in chunks for c in part}
+    added = 0
+    for c in upcoming:
+        part = room.get(c.channel_id)
+        if part is not None and len(part) < chunk_size and c.id not in taken:
+            part.append(c)
+            taken.add(c.id)
+            added += 1
+    return added
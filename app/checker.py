@@ -1,32 +1,98 @@
 from __future__ import annotations
 import asyncio
 import logging
-from collections import defaultdict
-from datetime import datetime, timedelta, timezone
-from typing import Iterable, List, Dict
+import time
+from datetime import datetime, timezone
 
 from pyrogram import Client
-from pyrogram.errors import RPCError
-from sqlalchemy import select, or_, and_
-from sqlalchemy.ext.asyncio import AsyncSession
+from pyrogram.errors import (
+    ChannelBanned,
+    ChannelInvalid,
+    ChannelPrivate,
+    ChannelPublicGroupNa,
+    ChatForbidden,
+    FloodWait,
+    RPCError,
+    UsernameInvalid,
+    UsernameNotOccupied,
+)
+from sqlalchemy import false, select
 
-from app.db import AsyncSessionLocal
-from app.models import Signal, SignalEdition
+from app.check_schedule import Candidate, ChangeRates, CheckPolicy, fill, load_rates, plan
+from app.db import ReadSessionLocal
+from app.metrics import REGISTRY
+from app.models import Signal
+from app.shard import LOCAL, Shard
+from app.service.changes import Edit, SignalRef, detect_edit
+from app.writer import SignalWriter
 
 log = logging.getLogger("sc.checker")
 
+_CYCLE = REGISTRY.histogram("sc_checker_cycle_seconds", "Duration of a checker reconciliation cycle")
+_RPCS = REGISTRY.counter("sc_checker_rpcs_total", "get_messages RPCs issued by the checker")
+_LAST_RPCS = REGISTRY.gauge("sc_checker_last_cycle_rpcs", "get_messages RPCs in the last checker cycle")
+_CANDIDATES = REGISTRY.gauge("sc_checker_last_cycle_signals", "Signals checked in the last checker cycle")
+_DEFERRED = REGISTRY.gauge("sc_checker_last_cycle_deferred", "Due signals left for a later cycle by the RPC budget")
+_CHANGES = REGISTRY.counter("sc_checker_changes_total", "Changes found by the checker", labels=("kind",))
+_RPC_ERRORS = REGISTRY.counter("sc_checker_rpc_errors_total", "get_messages RPC errors by type", labels=("error",))
+
+# The channel itself is gone or closed to this account: its messages count as deleted. Any other
+# RPC error (timeouts, internal server errors, unresolved peers) leaves the chunk due for a retry.
+_CHANNEL_GONE = (
+    ChannelPrivate,
+    ChannelInvalid,
+    ChannelBanned,
+    ChannelPublicGroupNa,
+    ChatForbidden,
+    UsernameNotOccupied,
+    UsernameInvalid,
+)
+
 
 class MessageChecker:
     """
-    Periodically check signals for deletion/edits:
-      - For messages younger than 7 days: check at most hourly.
-      - Older than 7 days: check at most every 72 hours.
-    Every 30 minutes the loop selects candidates by last_checked_time and processes them.
+    Low-frequency reconciliation sweep for deletions/edits. Live changes arrive through the
+    listener's edited/deleted handlers; this only catches what those missed (downtime, gaps).
+    The writer makes a new signal due from its posting time; each check reschedules it
+    (`next_check_at`, see CheckPolicy):
+      - For messages younger than `recent_days`: `recent_recheck_hours` later.
+      - Older: `old_recheck_hours` later.
+    Both are shortened for channels that edit/delete more than average and stretched for quiet
+    ones. Every `interval_seconds` the loop takes the most overdue signals, scores them by the
+    expected number of changes they hide and spends at most `rpc_budget` get_messages RPCs (chunks
+    of up to `chunk_size` ids of one channel) on the best chunks, with at most `concurrency` in
+    flight. Spare ids in those chunks go to the same channel's signals that come due soon. The rest
+    stays due for the next cycle. Only channels of `shard` are checked.
     """
 
-    def __init__(self, client: Client, interval_seconds: int = 1800) -> None:
+    def __init__(
+        self,
+        client: Client,
+        writer: SignalWriter,
+        interval_seconds: int = 1800,
+        chunk_size: int = 100,
+        concurrency: int = 4,
+        max_flood_retries: int = 3,
+        recent_days: int = 7,
+        recent_recheck_hours: float = 12,
+        old_recheck_hours: float = 168,
+        rpc_budget: int = 40,
+        change_half_life_hours: float = 24,
+        shard: Shard = LOCAL,
+    ) -> None:
         self.client = client
+        self.writer = writer
+        self.shard = shard
         self.interval = max(5, interval_seconds)
+        self.policy = CheckPolicy(recent_days, recent_recheck_hours, old_recheck_hours, change_half_life_hours)
+        self.chunk_size = max(1, min(200, chunk_size))  # Telegram caps get_messages at 200 ids
+        self.rpc_budget = max(1, rpc_budget)
+        self._rates: ChangeRates | None = None
+        self.max_flood_retries = max(0, max_flood_retries)
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._rpc_count = 0
+        self._deleted_count = 0
+        self._edited_count = 0
         self._task: asyncio.Task | None = None
         self._stop = asyncio.Event()
 
@@ -54,114 +120,145 @@ class MessageChecker:
                 break
             except Exception:
                 log.exception("message checker cycle failed")
-            await asyncio.wait([self._stop.wait()], timeout=self.interval)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
 
     async def _cycle(self) -> None:
         now = datetime.now(timezone.utc)
-        younger_than_7d = now - timedelta(days=7)
-        hour_ago = now - timedelta(hours=1)
-        hours72_ago = now - timedelta(hours=72)
-
-        async with AsyncSessionLocal() as session:
-            # Select non-deleted signals that need checking
-            q = select(Signal).where(
-                Signal.deleted.is_(False),
-                or_(
-                    and_(
-                        Signal.message_date >= younger_than_7d,
-                        or_(Signal.last_checked_time.is_(None), Signal.last_checked_time <= hour_ago),
-                    ),
-                    and_(
-                        Signal.message_date < younger_than_7d,
-                        or_(Signal.last_checked_time.is_(None), Signal.last_checked_time <= hours72_ago),
-                    ),
-                ),
-            ).limit(2000)
-
-            rows: list[Signal] = list((await session.execute(q)).scalars().all())
-
-        if not rows:
-            return
 
-        # Group by channel_id to leverage bulk fetches
-        by_channel: Dict[int, List[Signal]] = defaultdict(list)
-        for s in rows:
-            by_channel[s.channel_id].append(s)
+        cols = (
+            Signal.id, Signal.channel_id, Signal.message_id, Signal.message_date,
+            Signal.last_checked_time, Signal.next_check_at, Signal.original_text,
+        )
+        owned = self.shard.where(Signal.channel_id)
+        async with ReadSessionLocal() as session:
+            # Due signals, most overdue first: a range scan of ix_signals_next_check_at_live, whose
+            # cost depends on the limit, not the table size (the predicate must match the index's)
+            q = (
+                select(*cols)
+                .where(Signal.deleted == false(), Signal.next_check_at <= now)
+                .order_by(Signal.next_check_at)
+            )
+            if owned is not None:
+                q = q.where(owned)
+            # Twice what the budget can fetch, so the scores have something to choose from
+            q = q.limit(2 * self.rpc_budget * self.chunk_size)
+
+            candidates = [Candidate(*r) for r in (await session.execute(q)).all()]
+            if not candidates:
+                return
+            self._rates = await load_rates(session)
+            chunks = plan(now, candidates, self._rates, self.policy, self.chunk_size, self.rpc_budget)
+
+            # Spare ids in a chunk take signals of that channel coming due soon, at no extra RPC
+            room = {ch: self.chunk_size - len(part) for ch, part in chunks if len(part) < self.chunk_size}
+            if room:
+                upcoming = (
+                    select(*cols)
+                    .where(
+                        Signal.deleted == false(),
+                        Signal.channel_id.in_(room),
+                        Signal.next_check_at > now,
+                        Signal.next_check_at <= now + self.policy.recent_recheck,
+                    )
+                    .order_by(Signal.next_check_at)
+                    .limit(sum(room.values()))
+                )
+                fill(chunks, [Candidate(*r) for r in (await session.execute(upcoming)).all()], self.chunk_size)
 
-        for channel_id, signals in by_channel.items():
-            await self._check_channel_batch(channel_id, signals)
+        checked = sum(len(part) for _, part in chunks)
+        due_checked = len({c.id for _, part in chunks for c in part} & {c.id for c in candidates})
 
-    async def _check_channel_batch(self, channel_id: int, signals: list[Signal]) -> None:
-        # Process individually (simple & robust). Bulk fetching can be added later if desired.
-        for s in signals:
-            await self._check_one(s)
+        started = time.monotonic()
+        self._rpc_count = self._deleted_count = self._edited_count = 0
+        results = await asyncio.gather(
+            *(self._check_channel_batch(ch, part) for ch, part in chunks),
+            return_exceptions=True,
+        )
+        for (ch, _), res in zip(chunks, results):
+            if isinstance(res, Exception):
+                log.error("checker: channel %s failed: %r", ch, res)
+        _CYCLE.observe(time.monotonic() - started)
+        _LAST_RPCS.set(self._rpc_count)
+        _CANDIDATES.set(checked)
+        _DEFERRED.set(len(candidates) - due_checked)
+        log.info(
+            "checker cycle: signals=%s deferred=%s channels=%s rpcs=%s deleted=%s edited=%s in %.1fs",
+            checked, len(candidates) - due_checked, len({ch for ch, _ in chunks}), self._rpc_count,
+            self._deleted_count, self._edited_count, time.monotonic() - started,
+        )
 
-    async def _check_one(self, s: Signal) -> None:
+    async def _check_channel_batch(self, channel_id: int, chunk: list[Candidate]) -> None:
+        # One get_messages RPC per planned chunk; at most `concurrency` in flight
+        async with self._sem:
+            await self._check_chunk(channel_id, chunk)
+
+    async def _check_chunk(self, channel_id: int, chunk: list[Candidate]) -> None:
         now = datetime.now(timezone.utc)
         try:
-            msg = await self.client.get_messages(chat_id=s.channel_id, message_ids=s.message_id)
-        except RPCError:
-            # Consider deleted
-            await self._mark_deleted(s.id, now)
+            msgs = await self._fetch(channel_id, [s.message_id for s in chunk])
+        except FloodWait as e:
+            log.warning("checker: giving up on ch=%s this cycle after repeated FloodWait (%ss)", channel_id, e.value)
+            return
+        except _CHANNEL_GONE as e:
+            _RPC_ERRORS.inc(type(e).__name__)
+            log.warning("checker: ch=%s unavailable (%s), marking %s signals deleted", channel_id, e.ID, len(chunk))
+            await self._apply_chunk(now, checked=chunk, deleted_ids={s.id for s in chunk}, edits=[])
+            return
+        except RPCError as e:
+            _RPC_ERRORS.inc(type(e).__name__)
+            log.warning("checker: get_messages failed for ch=%s (%s ids): %s; retrying next cycle", channel_id, len(chunk), e)
             return
         except Exception:
-            log.exception("checker: get_messages failed for ch=%s msg=%s", s.channel_id, s.message_id)
+            log.exception("checker: get_messages failed for ch=%s (%s ids)", channel_id, len(chunk))
             # Do not update last_checked_time on unexpected error; try again next cycle.
             return
 
-        # Message exists: compare content
-        new_text = (msg.text or msg.caption or "").strip()
-        edited_at = msg.edit_date
-        original_changed = new_text and (new_text != (s.original_text or "").strip())
-
-        if edited_at and original_changed:
-            await self._mark_edited(s.id, new_text, edited_at)
-
-        # Update last_checked_time even if nothing happened
-        async with AsyncSessionLocal() as session:
-            db_s = await session.get(Signal, s.id)
-            if db_s:
-                db_s.last_checked_time = now
-                session.add(db_s)
-                await session.commit()
-
-    async def _mark_deleted(self, signal_id: int, ts: datetime) -> None:
-        async with AsyncSessionLocal() as session:
-            s = await session.get(Signal, signal_id)
-            if not s:
-                return
-            s.deleted = True
-            s.last_checked_time = ts
-            session.add(s)
-            await session.commit()
-        log.info("checker: marked deleted signal_id=%s", signal_id)
-
-    async def _mark_edited(self, signal_id: int, new_text: str, edited_at: datetime) -> None:
-        async with AsyncSessionLocal() as session:
-            s = await session.get(Signal, signal_id)
-            if not s:
-                return
+        by_id = {m.id: m for m in msgs if m is not None and not getattr(m, "empty", False)}
+        deleted_ids: set[int] = set()
+        edits: list[Edit] = []
+        for s in chunk:
+            msg = by_id.get(s.message_id)
+            if msg is None:
+                deleted_ids.add(s.id)
+                continue
+            # Message exists: compare content
+            ref = SignalRef(s.id, s.channel_id, s.message_id, s.original_text or "")
+            edit = detect_edit(ref, msg.text or msg.caption or "", msg.edit_date)
+            if edit:
+                edits.append(edit)
 
-            # Avoid duplicate edition rows with identical text and timestamp
-            last = (
-                await session.execute(
-                    select(SignalEdition)
-                    .where(SignalEdition.signal_id == signal_id)
-                    .order_by(SignalEdition.edited_at.desc())
-                    .limit(1)
-                )
-            ).scalars().first()
+        await self._apply_chunk(now, checked=chunk, deleted_ids=deleted_ids, edits=edits)
 
-            if last and last.text == new_text and last.edited_at == edited_at:
-                s.last_checked_time = datetime.now(timezone.utc)
-                s.edited = True
-                session.add(s)
-                await session.commit()
-                return
+    async def _fetch(self, channel_id: int, message_ids: list[int]) -> list:
+        """get_messages for a chunk of ids, sleeping through FloodWait (bounded number of times)."""
+        for attempt in range(self.max_flood_retries + 1):
+            try:
+                self._rpc_count += 1
+                _RPCS.inc()
+                result = await self.client.get_messages(chat_id=channel_id, message_ids=message_ids)
+                return result if isinstance(result, list) else [result]
+            except FloodWait as e:
+                wait = int(getattr(e, "value", 0) or 0) + 1
+                if attempt >= self.max_flood_retries:
+                    raise
+                log.warning("checker: FloodWait %ss on ch=%s, sleeping", wait, channel_id)
+                await asyncio.sleep(wait)
+        return []
 
-            edition = SignalEdition(signal_id=signal_id, text=new_text, edited_at=edited_at)
-            s.edited = True
-            s.last_checked_time = datetime.now(timezone.utc)
-            session.add_all([s, edition])
-            await session.commit()
-        log.info("checker: recorded edition signal_id=%s at %s", signal_id, edited_at.isoformat())
+    async def _apply_chunk(self, now: datetime, checked: list[Candidate], deleted_ids: set[int], edits: list[Edit]) -> None:
+        rates = self._rates
+        next_check = {
+            s.id: self.policy.next_check(now, s.message_date, rates.weight(s.channel_id) if rates else 1.0)
+            for s in checked
+            if s.id not in deleted_ids
+        }
+        await self.writer.record_changes(
+            now, checked_ids=[s.id for s in checked], deleted_ids=deleted_ids, edits=edits, next_check=next_check
+        )
+        self._deleted_count += len(deleted_ids)
+        self._edited_count += len(edits)
+        _CHANGES.inc("deleted", amount=len(deleted_ids))
+        _CHANGES.inc("edited", amount=len(edits))
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import asyncio
+import logging
+import signal
+from typing import Optional
+
+from app.backfill import Backfiller
+from app.channel_cache import ChannelCache
+from app.checker import MessageChecker
+from app.config import settings
+from app.ingest import IngestQueue
+from app.llm import LLMClient
+from app.metrics import serve_prometheus
+from app.notify import NotifyServer
+from app.pipeline import build_processor
+from app.processor import Processor
+from app.shard import LOCAL, Shard
+from app.telegram_client import TelegramListener
+from app.writer import SignalWriter
+from app.writer_ipc import RemoteWriter
+
+log = logging.getLogger("sc.collector")
+
+
+class Collector:
+    """
+    Ingest side of the app for one shard: Telegram listener -> ingest queue -> processor -> writer,
+    plus the startup backfill and the deletion/edition checker. Runs as its own process
+    (`python -m app.collector`); the API only reads the database.
+
+    Rows go to a local SignalWriter, or to the supervisor's shared writer when WRITER_SOCKET is set
+    (several shard processes on one SQLite file). With NOTIFY_DIR, commits and stats are broadcast
+    to API processes.
+    """
+
+    def __init__(self, shard: Shard = LOCAL, drain_seconds: float = 30.0) -> None:
+        self.shard = shard
+        self.drain_seconds = drain_seconds
+        self.writer: SignalWriter | RemoteWriter | None = None
+        self.channels: Optional[ChannelCache] = None
+        self.processor: Optional[Processor] = None
+        self.ingest: Optional[IngestQueue] = None
+        self.listener: Optional[TelegramListener] = None
+        self.checker: Optional[MessageChecker] = None
+        self.backfill: Optional[Backfiller] = None
+        self.notify: Optional[NotifyServer] = None
+        self._metrics: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        if settings.notify_dir:
+            self.notify = NotifyServer(
+                settings.notify_dir, f"collector-{self.shard.index}", self.stats, settings.notify_stats_seconds
+            )
+            await self.notify.start()
+        if settings.collector_metrics_port:
+            self._metrics = await serve_prometheus(settings.collector_metrics_host, settings.collector_metrics_port)
+            log.info("collector metrics on %s:%s", settings.collector_metrics_host, settings.collector_metrics_port)
+        llm = LLMClient()
+        if settings.writer_socket:
+            self.writer = RemoteWriter(settings.writer_socket)
+        else:
+            self.writer = SignalWriter(flush_interval_ms=settings.writer_flush_ms, max_batch=settings.writer_max_batch)
+        await self.writer.start()
+        self.channels = ChannelCache(writer=self.writer, flush_interval_seconds=settings.channel_flush_seconds)
+        await self.channels.load()
+        await self.channels.start()
+        self.processor = await build_processor(llm, self.writer, self.channels)
+        self.ingest = IngestQueue(
+            processor=self.processor,
+            maxsize=settings.ingest_queue_size,
+            workers=settings.ingest_workers,
+            policy=settings.ingest_backpressure,
+            spill_path=settings.ingest_spill_path,
+        )
+        await self.ingest.start()
+
+        self.listener = TelegramListener(ingest=self.ingest, writer=self.writer, shard=self.shard)
+        if settings.backfill_on_startup:
+            # Snapshot the gaps before live messages start advancing channels.last_message_id
+            self.backfill = Backfiller(
+                client=self.listener.client,
+                processor=self.processor,
+                writer=self.writer,
+                concurrency=settings.backfill_concurrency,
+                workers=settings.backfill_workers,
+                chunk_size=settings.backfill_chunk_size,
+                max_messages=settings.backfill_max_messages,
+                shard=self.shard,
+            )
+            await self.backfill.plan()
+        await self.listener.start()
+        if self.backfill:
+            await self.backfill.start()
+
+        # Start the deletion/edition reconciliation sweep (live changes come from the listener)
+        self.checker = MessageChecker(
+            client=self.listener.client,
+            writer=self.writer,
+            interval_seconds=settings.checker_interval_seconds,
+            chunk_size=settings.checker_chunk_size,
+            concurrency=settings.checker_concurrency,
+            recent_days=settings.checker_recent_days,
+            recent_recheck_hours=settings.checker_recent_recheck_hours,
+            old_recheck_hours=settings.checker_old_recheck_hours,
+            rpc_budget=settings.checker_rpc_budget,
+            change_half_life_hours=settings.checker_change_half_life_hours,
+            shard=self.shard,
+        )
+        await self.checker.start()
+        log.info("collector started (shard %s)", self.shard)
+
+    async def stop(self) -> None:
+        """
+        Drain in pipeline order: stop taking updates (backfill and checker use the listener's
+        client, so they go first), let the workers finish queued messages for up to
+        `drain_seconds`, then flush channel bumps and the writer.
+        """
+        if self.backfill:
+            await self.backfill.stop()
+        if self.checker:
+            await self.checker.stop()
+        if self.listener:
+            await self.listener.stop()
+        if self.ingest:
+            queued = self.ingest.stats().get("depth", 0)
+            if queued:
+                log.info("draining %s queued messages (up to %.0fs)", queued, self.drain_seconds)
+            await self.ingest.stop(drain_timeout=self.drain_seconds)
+        if self.channels:
+            await self.channels.stop()
+        if self.writer:
+            await self.writer.stop()
+        if self._metrics:
+            self._metrics.close()
+            await self._metrics.wait_closed()
+        if self.notify:
+            await self.notify.stop()
+        log.info("collector stopped (shard %s)", self.shard)
+
+    def stats(self) -> dict:
+        """Pipeline snapshot: queue, decision paths, dedup, LLM limiter/batches, backfill."""
+        processor = self.processor
+        dedup = processor.dedup if processor else None
+        return {
+            "shard": repr(self.shard),
+            "ingest": self.ingest.stats() if self.ingest else None,
+            "processor": processor.stats() if processor else None,
+            "dedup": dedup.stats() if dedup else None,
+            "llm": processor.llm.limiter.stats() if processor else None,
+            "llm_batches": processor.batcher.stats() if processor and processor.batcher else None,
+            "backfill": self.backfill.stats() if self.backfill else None,
+        }
+
+
+async def _run() -> None:
+    collector = Collector(drain_seconds=settings.collector_drain_seconds)
+    stop = asyncio.Event()
+    main_task = asyncio.current_task()
+
+    def _on_signal() -> None:
+        if stop.is_set():
+            log.warning("second signal, abandoning the drain")
+            main_task.cancel()
+        stop.set()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, _on_signal)
+    try:
+        await collector.start()
+        await stop.wait()
+        log.info("shutting down, draining")
+    finally:
+        await collector.stop()
+
+
+def main() -> None:
+    from app.log import setup_logging
+
+    setup_logging()
+    try:
+        asyncio.run(_run())
+    except asyncio.CancelledError:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from typing import Literal
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -15,9 +16,113 @@ class Settings(BaseSettings):
     # LLM
     openai_api_key: str = Field(..., alias="OPENAI_API_KEY")
     openai_model: str = Field("gpt-4o-mini", alias="OPENAI_MODEL")
+    # two_step: is_signal then parse_signal; single_call: one structured call returns verdict + fields
+    llm_mode: Literal["two_step", "single_call"] = Field("two_step", alias="LLM_MODE")
+
+    # Shared LLM limiter: budgets (0 = unlimited), adaptive concurrency bounds, retries of 429/transient errors
+    llm_requests_per_minute: float = Field(0, alias="LLM_REQUESTS_PER_MINUTE")
+    llm_tokens_per_minute: float = Field(0, alias="LLM_TOKENS_PER_MINUTE")
+    llm_min_concurrency: int = Field(1, alias="LLM_MIN_CONCURRENCY")
+    llm_max_concurrency: int = Field(16, alias="LLM_MAX_CONCURRENCY")
+    # Calls slower than this shrink the concurrency cap like a 429 does
+    llm_target_latency_seconds: float = Field(10.0, alias="LLM_TARGET_LATENCY_SECONDS")
+    llm_max_retries: int = Field(5, alias="LLM_MAX_RETRIES")
+
+    # Concurrent classifications are packed into one request (two_step mode); LLM_BATCH_MAX<=1 disables
+    llm_batch_window_ms: int = Field(50, alias="LLM_BATCH_WINDOW_MS")
+    llm_batch_max: int = Field(16, alias="LLM_BATCH_MAX")
+
+    # Local hashed n-gram classifier between the regex gate and the LLM (empty path disables);
+    # scores in [reject_below, accept_above) still go to the LLM
+    local_classifier_path: str = Field("", alias="LOCAL_CLASSIFIER_PATH")
+    local_classifier_reject_below: float = Field(0.05, alias="LOCAL_CLASSIFIER_REJECT_BELOW")
+    local_classifier_accept_above: float = Field(0.97, alias="LOCAL_CLASSIFIER_ACCEPT_ABOVE")
+    # Keep LLM-rejected messages as training negatives
+    log_rejections: bool = Field(True, alias="LOG_REJECTIONS")
+
+    # Deterministic parser for well-formed posts; confident parses skip the LLM
+    rule_parser_enabled: bool = Field(True, alias="RULE_PARSER_ENABLED")
+    rule_parser_min_confidence: float = Field(0.85, alias="RULE_PARSER_MIN_CONFIDENCE")
+
+    # LLM result cache for reposted texts (normalized fingerprint + optional SimHash near-duplicates)
+    llm_cache_enabled: bool = Field(True, alias="LLM_CACHE_ENABLED")
+    llm_cache_size: int = Field(50_000, alias="LLM_CACHE_SIZE")
+    llm_cache_near_duplicates: bool = Field(True, alias="LLM_CACHE_NEAR_DUPLICATES")
+    llm_cache_max_distance: int = Field(6, alias="LLM_CACHE_MAX_DISTANCE")
 
     # DB
     db_url: str = Field("sqlite+aiosqlite:///./signals.db", alias="DB_URL")
+    # Connections in the read-only pool used by API queries
+    db_read_pool_size: int = Field(8, alias="DB_READ_POOL_SIZE")
+    # PostgreSQL pools (SQLite uses a single write connection)
+    db_pool_size: int = Field(10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(10, alias="DB_MAX_OVERFLOW")
+    db_pool_recycle_seconds: int = Field(1800, alias="DB_POOL_RECYCLE_SECONDS")
+    db_statement_cache_size: int = Field(500, alias="DB_STATEMENT_CACHE_SIZE")
+    # SQLite profile: WAL, synchronous=NORMAL, bigger page cache, mmap and a single write connection
+    sqlite_tuned: bool = Field(True, alias="SQLITE_TUNED")
+    sqlite_busy_timeout_ms: int = Field(5000, alias="SQLITE_BUSY_TIMEOUT_MS")
+    sqlite_cache_size_kb: int = Field(65536, alias="SQLITE_CACHE_SIZE_KB")
+    sqlite_mmap_size_mb: int = Field(256, alias="SQLITE_MMAP_SIZE_MB")
+
+    # Ingest queue (listener -> processor workers)
+    ingest_queue_size: int = Field(1000, alias="INGEST_QUEUE_SIZE")
+    ingest_workers: int = Field(8, alias="INGEST_WORKERS")
+    ingest_backpressure: Literal["block", "drop_oldest", "spill"] = Field("block", alias="INGEST_BACKPRESSURE")
+    ingest_spill_path: str = Field("ingest_spill.jsonl", alias="INGEST_SPILL_PATH")
+
+    # Signal writer (micro-batched persistence)
+    writer_flush_ms: int = Field(200, alias="WRITER_FLUSH_MS")
+    writer_max_batch: int = Field(500, alias="WRITER_MAX_BATCH")
+    # How often coalesced channel last_message_id advances are written
+    channel_flush_seconds: float = Field(30.0, alias="CHANNEL_FLUSH_SECONDS")
+
+    # Deletion/edition checker
+    checker_interval_seconds: int = Field(1800, alias="CHECKER_INTERVAL_SECONDS")
+    checker_chunk_size: int = Field(100, alias="CHECKER_CHUNK_SIZE")
+    checker_concurrency: int = Field(4, alias="CHECKER_CONCURRENCY")
+    # Reconciliation cadence; live edits/deletions come from the listener's handlers
+    checker_recent_days: int = Field(7, alias="CHECKER_RECENT_DAYS")
+    checker_recent_recheck_hours: float = Field(12, alias="CHECKER_RECENT_RECHECK_HOURS")
+    checker_old_recheck_hours: float = Field(168, alias="CHECKER_OLD_RECHECK_HOURS")
+    # get_messages RPCs per cycle, spent on the signals most likely to hide a change
+    checker_rpc_budget: int = Field(40, alias="CHECKER_RPC_BUDGET")
+    # Age by which half of a signal's edits/deletions happen (priority model)
+    checker_change_half_life_hours: float = Field(24, alias="CHECKER_CHANGE_HALF_LIFE_HOURS")
+
+    # History catch-up from channels.last_message_id (also: python -m app.backfill)
+    backfill_on_startup: bool = Field(True, alias="BACKFILL_ON_STARTUP")
+    backfill_concurrency: int = Field(8, alias="BACKFILL_CONCURRENCY")
+    backfill_workers: int = Field(16, alias="BACKFILL_WORKERS")
+    backfill_chunk_size: int = Field(200, alias="BACKFILL_CHUNK_SIZE")
+    # Per-channel cap on fetched messages (newest kept); 0 = no cap
+    backfill_max_messages: int = Field(5000, alias="BACKFILL_MAX_MESSAGES")
+
+    # Read API response cache: entries live until the next write or this many seconds; 0 disables
+    api_cache_ttl_seconds: float = Field(30.0, alias="API_CACHE_TTL_SECONDS")
+    api_cache_max_entries: int = Field(1024, alias="API_CACHE_MAX_ENTRIES")
+
+    # Live stream (GET /api/stream): events kept for resume, per-client buffer before eviction
+    stream_history: int = Field(4096, alias="STREAM_HISTORY")
+    stream_buffer: int = Field(256, alias="STREAM_BUFFER")
+    stream_heartbeat_seconds: float = Field(15.0, alias="STREAM_HEARTBEAT_SECONDS")
+    stream_max_subscribers: int = Field(1000, alias="STREAM_MAX_SUBSCRIBERS")
+
+    # Sharding: this collector owns channels with abs(channel_id) % SHARD_COUNT == SHARD_INDEX
+    shard_count: int = Field(1, alias="SHARD_COUNT")
+    shard_index: int = Field(0, alias="SHARD_INDEX")
+    # Unix socket of the supervisor's shared SQLite writer (python -m app.shard_supervisor); empty = write directly
+    writer_socket: str = Field("", alias="WRITER_SOCKET")
+
+    # Collector process (python -m app.collector): seconds to drain queued messages on shutdown,
+    # Prometheus endpoint of the ingest metrics (0 = off; shard i of the supervisor listens on port + i)
+    collector_drain_seconds: float = Field(30.0, alias="COLLECTOR_DRAIN_SECONDS")
+    collector_metrics_host: str = Field("127.0.0.1", alias="COLLECTOR_METRICS_HOST")
+    collector_metrics_port: int = Field(9464, alias="COLLECTOR_METRICS_PORT")
+    # Cross-process change notifications: writers serve <dir>/<source>.sock, API processes follow them
+    # (relative to the working directory, which the collector and the API must share; "" = off)
+    notify_dir: str = Field("run/notify", alias="NOTIFY_DIR")
+    notify_stats_seconds: float = Field(10.0, alias="NOTIFY_STATS_SECONDS")
 
     # Logging
     log_level: str = Field("INFO", alias="LOG_LEVEL")
@@ -1,6 +1,10 @@
 from __future__ import annotations
-from typing import AsyncIterator
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from typing import AsyncIterator, Optional
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from app.config import settings
 
@@ -9,13 +13,97 @@ class Base(DeclarativeBase):
     pass
 
 
-engine = create_async_engine(
+# Storage profile. On SQLite, ingest (writer, change recorder, backfill) goes through a single
+# write connection, so writers queue in the pool instead of spinning on SQLITE_BUSY. API reads
+# use a separate pool of query_only connections; with WAL they never block on, or block, a commit.
+
+def sqlite_pragmas(read_only: bool = False) -> dict[str, object]:
+    """Per-connection PRAGMAs of the tuned SQLite profile."""
+    pragmas: dict[str, object] = {
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        # WAL only fsyncs at checkpoints with synchronous=NORMAL; a power loss can drop the last
+        # commits but never corrupts the database
+        "synchronous": "NORMAL",
+        "cache_size": -settings.sqlite_cache_size_kb,
+        "mmap_size": settings.sqlite_mmap_size_mb * 1024 * 1024,
+        "temp_store": "MEMORY",
+    }
+    if read_only:
+        pragmas["query_only"] = "ON"
+    else:
+        # Persistent in the database file; set once by the writer connection
+        pragmas = {"journal_mode": "WAL", **pragmas}
+    return pragmas
+
+
+def apply_pragmas(engine: AsyncEngine, pragmas: dict[str, object]) -> None:
+    if not pragmas:
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, _record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def make_engine(
+    url: str,
+    pool_size: Optional[int] = None,
+    read_only: bool = False,
+    tuned: Optional[bool] = None,
+    max_overflow: int = 0,
+) -> AsyncEngine:
+    """
+    Engine for `url` with a fixed-size pool. SQLite gets the tuned PRAGMAs unless `tuned` (default
+    SQLITE_TUNED) is off; PostgreSQL gets pool recycling, a UTC session and the asyncpg statement cache.
+    """
+    u = make_url(url)
+    kwargs: dict = {"echo": False, "pool_pre_ping": True, "future": True}
+    is_sqlite = u.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and u.database in (None, "", ":memory:")
+    if pool_size is not None and not in_memory:
+        kwargs.update(pool_size=pool_size, max_overflow=max_overflow)
+    if u.get_backend_name() == "postgresql":
+        kwargs["pool_recycle"] = settings.db_pool_recycle_seconds
+        if u.get_driver_name() == "asyncpg":
+            # Timestamps without an offset are read and written as UTC, as on SQLite
+            server_settings = {"timezone": "UTC"}
+            if read_only:
+                server_settings["default_transaction_read_only"] = "on"
+            kwargs["connect_args"] = {"server_settings": server_settings}
+            if "prepared_statement_cache_size" not in u.query:
+                u = u.update_query_dict({"prepared_statement_cache_size": str(settings.db_statement_cache_size)})
+    engine = create_async_engine(u, **kwargs)
+    if is_sqlite and (settings.sqlite_tuned if tuned is None else tuned):
+        apply_pragmas(engine, sqlite_pragmas(read_only))
+    return engine
+
+
+BACKEND = make_url(settings.db_url).get_backend_name()
+_memory = BACKEND == "sqlite" and make_url(settings.db_url).database in (None, "", ":memory:")
+
+if BACKEND == "sqlite":
+    engine = make_engine(settings.db_url, pool_size=1 if settings.sqlite_tuned else None)
+else:
+    engine = make_engine(settings.db_url, pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+# An in-memory database exists only on its own connection; reads then share the write engine
+read_engine = engine if _memory else make_engine(
     settings.db_url,
-    echo=False,
-    pool_pre_ping=True,
-    future=True,
+    pool_size=settings.db_read_pool_size,
+    read_only=True,
+    max_overflow=0 if BACKEND == "sqlite" else settings.db_max_overflow,
 )
 
+
+def dialect_insert(model):
+    """INSERT for `model` with the ON CONFLICT clauses of the configured backend (SQLite or PostgreSQL)."""
+    if BACKEND == "postgresql":
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     autoflush=False,
@@ -23,9 +111,22 @@ AsyncSessionLocal = async_sessionmaker(
     class_=AsyncSession,
 )
 
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    class_=AsyncSession,
+)
+
 
 # FastAPI dependency – plain async function that yields the session (NOT a contextmanager)
 async def get_session() -> AsyncIterator[AsyncSession]:
+    """Read-only session for API queries."""
+    async with ReadSessionLocal() as session:
+        yield session
+
+
+async def get_write_session() -> AsyncIterator[AsyncSession]:
     async with AsyncSessionLocal() as session:
         try:
             yield session
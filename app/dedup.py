@@ -0,0 +1,233 @@
+from __future__ import annotations
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.db import ReadSessionLocal
+from app.models import LLMCacheEntry
+from app.schemas import SignalFields
+from app.writer import SignalWriter
+
+log = logging.getLogger("sc.dedup")
+
+# Reposts typically differ by links, @mentions, emoji, whitespace and case only. Hashtags keep
+# their text (only the `#` goes with the other symbols): channels often tag the ticker (#BTC).
+_URL_RE = re.compile(r"https?://\S+|t\.me/\S+|www\.\S+", re.I)
+_MENTION_RE = re.compile(r"@\w+", re.U)
+_NON_TEXT_RE = re.compile(r"[^\w.,:/%+-]+", re.U)
+_WS_RE = re.compile(r"\s+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+# Tickers are written upper-case in practice (BTC, ETHUSDT); side words are matched case-insensitively.
+_TICKER_RE = re.compile(r"\b[A-Z][A-Z0-9]{1,14}\b")
+_SIDE_RE = re.compile(r"\b(?:long|short|buy|sell|лонг|шорт)\b", re.I | re.U)
+
+_SIMHASH_BITS = 64
+
+
+def normalize_text(text: str) -> str:
+    s = unicodedata.normalize("NFKC", text or "").lower()
+    s = _URL_RE.sub(" ", s)
+    s = _MENTION_RE.sub(" ", s)
+    s = _NON_TEXT_RE.sub(" ", s)
+    return _WS_RE.sub(" ", s).strip()
+
+
+def fingerprint(norm: str) -> str:
+    return hashlib.blake2b(norm.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def anchor_key(text: str) -> str:
+    """
+    Hash of everything a near-duplicate must NOT change: all numbers, tickers and side words, in order.
+    Only texts with equal anchors are compared by SimHash, so "BTC LONG 100" never matches "ETH SHORT 100".
+    Texts without numbers or tickers get an empty anchor and are only matched exactly.
+    """
+    nums = [n.replace(",", ".") for n in _NUMBER_RE.findall(text or "")]
+    tickers = _TICKER_RE.findall(text or "")
+    if not nums and not tickers:
+        return ""
+    sides = [m.lower() for m in _SIDE_RE.findall(text or "")]
+    raw = " ".join(nums) + "|" + " ".join(tickers) + "|" + " ".join(sides)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def simhash(norm: str) -> int:
+    """64-bit SimHash over words of the normalized text."""
+    words = norm.split()
+    if not words:
+        return 0
+    acc = [0] * _SIMHASH_BITS
+    for word in words:
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(_SIMHASH_BITS):
+            acc[bit] += 1 if (h >> bit) & 1 else -1
+    out = 0
+    for bit in range(_SIMHASH_BITS):
+        if acc[bit] > 0:
+            out |= 1 << bit
+    return out
+
+
+def _to_signed64(v: int) -> int:
+    return v - (1 << 64) if v >= (1 << 63) else v
+
+
+def _to_unsigned64(v: int) -> int:
+    return v + (1 << 64) if v < 0 else v
+
+
+class CachedVerdict:
+    __slots__ = ("fingerprint", "simhash", "anchor_key", "is_signal", "fields")
+
+    def __init__(
+        self, fingerprint: str, simhash: int, anchor_key: str, is_signal: bool, fields: Optional[SignalFields]
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.simhash = simhash
+        self.anchor_key = anchor_key
+        self.is_signal = is_signal
+        self.fields = fields
+
+
+class DedupCache:
+    """
+    Bounded LRU of LLM outcomes keyed by normalized-text fingerprint, persisted in `llm_cache`.
+
+    Exact lookups hit on the fingerprint; with `near_duplicates` enabled a SimHash within
+    `max_distance` bits also hits, but only among entries with the same anchor key
+    (identical numbers, tickers and side words).
+    """
+
+    def __init__(
+        self,
+        writer: SignalWriter,
+        max_entries: int = 50_000,
+        near_duplicates: bool = True,
+        max_distance: int = 6,
+    ) -> None:
+        self.writer = writer
+        self.max_entries = max(1, max_entries)
+        self.near_duplicates = near_duplicates
+        self.max_distance = max(0, max_distance)
+        self._lru: OrderedDict[str, CachedVerdict] = OrderedDict()
+        self._by_anchor: dict[str, set[str]] = {}
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    async def load(self) -> None:
+        """Warm the LRU with the most recently used rows and trim the table to `max_entries`."""
+        async with ReadSessionLocal() as session:
+            rows = (
+                await session.execute(
+                    select(LLMCacheEntry).order_by(LLMCacheEntry.last_used_at.desc()).limit(self.max_entries)
+                )
+            ).scalars().all()
+        if len(rows) == self.max_entries:
+            try:
+                await self.writer.trim_cache(rows[-1].last_used_at)
+            except Exception as e:
+                log.warning("dedup cache: trimming llm_cache failed: %r", e)
+
+        for r in reversed(rows):  # oldest first so the newest end up most-recently-used
+            fields = None
+            if r.fields:
+                try:
+                    fields = SignalFields.model_validate(r.fields)
+                except Exception:
+                    continue
+            self._put(CachedVerdict(r.fingerprint, _to_unsigned64(r.simhash), r.anchor_key, r.is_signal, fields))
+        log.info("dedup cache loaded: %s entries", len(self._lru))
+
+    def lookup(self, text: str) -> Optional[CachedVerdict]:
+        norm = normalize_text(text)
+        if not norm:
+            return None
+        fp = fingerprint(norm)
+        anchor = anchor_key(text)
+        hit = self._lru.get(fp)
+        if hit is not None and hit.anchor_key != anchor:
+            hit = None  # same words, different numbers/tickers/sides (e.g. case of a ticker)
+        if hit is None and self.near_duplicates:
+            hit = self._near(simhash(norm), anchor)
+            if hit is not None:
+                self.near_hits += 1
+        if hit is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._lru.move_to_end(hit.fingerprint)
+        self._persist(hit, hit_delta=1)
+        return hit
+
+    def store(self, text: str, is_signal: bool, fields: Optional[SignalFields]) -> None:
+        norm = normalize_text(text)
+        if not norm:
+            return
+        entry = CachedVerdict(fingerprint(norm), simhash(norm), anchor_key(text), is_signal, fields)
+        self._put(entry)
+        self._persist(entry, hit_delta=0)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._lru),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+        }
+
+    def _near(self, sh: int, anchor: str) -> Optional[CachedVerdict]:
+        if not anchor:
+            return None
+        best: Optional[CachedVerdict] = None
+        best_dist = self.max_distance + 1
+        for fp in self._by_anchor.get(anchor, ()):
+            cand = self._lru.get(fp)
+            if cand is None:
+                continue
+            dist = bin(cand.simhash ^ sh).count("1")
+            if dist < best_dist:
+                best, best_dist = cand, dist
+        return best
+
+    def _put(self, entry: CachedVerdict) -> None:
+        if entry.fingerprint in self._lru:
+            self._unindex(self._lru[entry.fingerprint])
+        self._lru[entry.fingerprint] = entry
+        self._lru.move_to_end(entry.fingerprint)
+        self._index(entry)
+        while len(self._lru) > self.max_entries:
+            _, evicted = self._lru.popitem(last=False)
+            self._unindex(evicted)
+
+    def _index(self, entry: CachedVerdict) -> None:
+        if self.near_duplicates and entry.anchor_key:
+            self._by_anchor.setdefault(entry.anchor_key, set()).add(entry.fingerprint)
+
+    def _unindex(self, entry: CachedVerdict) -> None:
+        if not self.near_duplicates:
+            return
+        bucket = self._by_anchor.get(entry.anchor_key)
+        if bucket is not None:
+            bucket.discard(entry.fingerprint)
+            if not bucket:
+                del self._by_anchor[entry.anchor_key]
+
+    def _persist(self, entry: CachedVerdict, hit_delta: int) -> None:
+        # Write-behind through the single writer; rows beyond max_entries are trimmed on next load.
+        self.writer.add_cache_entry({
+            "fingerprint": entry.fingerprint,
+            "simhash": _to_signed64(entry.simhash),
+            "anchor_key": entry.anchor_key,
+            "is_signal": entry.is_signal,
+            "fields": entry.fields.model_dump() if entry.fields else None,
+            "hits": hit_delta,
+            "last_used_at": datetime.now(timezone.utc),
+        })
@@ -0,0 +1,200 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import secrets
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from app.config import settings
+from app.metrics import REGISTRY
+
+log = logging.getLogger("sc.events")
+
+_PUBLISHED = REGISTRY.counter("sc_stream_events_total", "Events published to the live stream", labels=("type",))
+_EVICTED = REGISTRY.counter("sc_stream_evictions_total", "Stream subscribers dropped for falling behind")
+_SUBSCRIBERS = REGISTRY.gauge("sc_stream_subscribers", "Connected live stream subscribers")
+
+EVENT_TYPES = ("signal", "edition", "deletion")
+
+
+class Generation:
+    """
+    Monotonic data version of everything the read API serves. Bumped after a commit that changes
+    signals, flags or channel metadata; readers compare it to decide whether cached output is stale.
+    Writes made by other processes arrive through app.notify when NOTIFY_DIR is set.
+    """
+
+    def __init__(self) -> None:
+        self.value = 0
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, fn: Callable[[], None]) -> None:
+        """Call `fn` after every bump (e.g. to forward it to other processes)."""
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn: Callable[[], None]) -> None:
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def bump(self) -> int:
+        self.value += 1
+        for fn in self._listeners:
+            fn()
+        return self.value
+
+
+GENERATION = Generation()
+
+
+class Event:
+    """
+    One committed change. `frame` is the SSE wire form, encoded once and shared by all subscribers;
+    its id is `<broker epoch>-<id>`.
+    """
+    __slots__ = ("id", "type", "channel_id", "symbol", "frame")
+
+    def __init__(self, id: int, type: str, channel_id: int, symbol: str, data: dict, epoch: str = "") -> None:
+        self.id = id
+        self.type = type
+        self.channel_id = channel_id
+        self.symbol = symbol
+        body = json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+        self.frame = f"id: {epoch}-{id}\nevent: {type}\ndata: {body}\n\n".encode()
+
+
+class Subscription:
+    """
+    A subscriber's filters and bounded buffer. Filters are ANDed across kinds and ORed within one
+    (channels={1, 2}, symbols={"BTC"} = BTC signals from channel 1 or 2); None means "any".
+    """
+    __slots__ = ("channels", "symbols", "types", "queue", "evicted")
+
+    def __init__(
+        self,
+        buffer: int,
+        channels: Optional[set[int]] = None,
+        symbols: Optional[set[str]] = None,
+        types: Optional[set[str]] = None,
+    ) -> None:
+        self.channels = channels
+        self.symbols = symbols
+        self.types = types
+        self.queue: asyncio.Queue[Optional[Event]] = asyncio.Queue(maxsize=max(1, buffer))
+        self.evicted = False
+
+    def matches(self, ev: Event) -> bool:
+        return (
+            (self.types is None or ev.type in self.types)
+            and (self.channels is None or ev.channel_id in self.channels)
+            and (self.symbols is None or ev.symbol in self.symbols)
+        )
+
+
+class EventBroker:
+    """
+    In-process fan-out of committed signals, editions and deletions to live subscribers.
+
+    `publish` never blocks the writer: a subscriber whose buffer is full is evicted (its queue is
+    replaced by a single end marker) and can reconnect with the last id it saw. The newest
+    `history` events are kept so a reconnect resumes without a gap.
+
+    Ids are only meaningful to the broker that issued them: each API worker numbers the events it
+    relays on its own, so ids carry a random per-process epoch and a resume with an id from another
+    worker (or from before a restart) is answered with a gap instead of a wrong replay.
+    """
+
+    def __init__(self, history: int = 4096, buffer: int = 256) -> None:
+        self.buffer = buffer
+        self.epoch = secrets.token_hex(4)
+        self._history: deque[Event] = deque(maxlen=max(1, history))
+        self._subs: set[Subscription] = set()
+        self._seq = 0
+        self._listeners: list[Callable[[str, int, str, dict], None]] = []
+        _SUBSCRIBERS.set_function(lambda: len(self._subs))
+
+    @property
+    def last_id(self) -> str:
+        """Wire id of the newest event (`<epoch>-0` before the first one)."""
+        return f"{self.epoch}-{self._seq}"
+
+    def add_listener(self, fn: Callable[[str, int, str, dict], None]) -> None:
+        """Call `fn(type, channel_id, symbol, data)` for every published event."""
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn: Callable[[str, int, str, dict], None]) -> None:
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def publish(self, type: str, channel_id: int, symbol: str, data: dict) -> Event:
+        self._seq += 1
+        ev = Event(self._seq, type, channel_id, symbol, data, self.epoch)
+        self._history.append(ev)
+        _PUBLISHED.inc(type)
+        for fn in self._listeners:
+            fn(type, channel_id, symbol, data)
+        for sub in list(self._subs):
+            if not sub.matches(ev):
+                continue
+            try:
+                sub.queue.put_nowait(ev)
+            except asyncio.QueueFull:
+                self._evict(sub)
+        return ev
+
+    def subscribe(
+        self,
+        channels: Optional[Iterable[int]] = None,
+        symbols: Optional[Iterable[str]] = None,
+        types: Optional[Iterable[str]] = None,
+        since: Optional[str] = None,
+    ) -> tuple[Subscription, list[Event], bool]:
+        """
+        Register a subscriber. With `since` (a wire id), also return the retained events after it
+        and whether some were lost (older than the history, or not issued by this broker).
+        """
+        sub = Subscription(
+            self.buffer,
+            set(channels) if channels else None,
+            {s.upper() for s in symbols} if symbols else None,
+            set(types) if types else None,
+        )
+        backlog: list[Event] = []
+        gap = False
+        if since is not None:
+            seq = self._own_seq(since)
+            oldest = self._history[0].id if self._history else self._seq + 1
+            if seq is None or seq > self._seq or seq < oldest - 1:
+                gap = True
+            if seq is not None:
+                backlog = [ev for ev in self._history if ev.id > seq and sub.matches(ev)]
+        # No await between the backlog snapshot and registration: nothing is missed or repeated
+        self._subs.add(sub)
+        return sub, backlog, gap
+
+    def _own_seq(self, wire_id: str) -> Optional[int]:
+        epoch, _, seq = wire_id.strip().rpartition("-")
+        return int(seq) if epoch == self.epoch and seq.isdigit() else None
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subs.discard(sub)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subs),
+            "last_id": self.last_id,
+            "history": len(self._history),
+            "evicted": int(_EVICTED.value()),
+        }
+
+    def _evict(self, sub: Subscription) -> None:
+        self._subs.discard(sub)
+        sub.evicted = True
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+        _EVICTED.inc()
+        log.info("stream subscriber evicted: buffer of %s events full", sub.queue.maxsize)
+
+
+BROKER = EventBroker(history=settings.stream_history, buffer=settings.stream_buffer)
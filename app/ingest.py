@@ -0,0 +1,245 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Literal, Optional
+
+from app.metrics import REGISTRY
+from app.processor import MessageEnvelope, Processor
+
+log = logging.getLogger("sc.ingest")
+
+BackpressurePolicy = Literal["block", "drop_oldest", "spill"]
+
+_QUEUE_WAIT = REGISTRY.histogram("sc_ingest_queue_wait_seconds", "Time a message waited in the ingest queue")
+_PROCESS_TIME = REGISTRY.histogram("sc_ingest_process_seconds", "Time a worker spent processing one message")
+_EVENTS = REGISTRY.counter("sc_ingest_messages_total", "Ingest queue events by outcome", labels=("outcome",))
+_DEPTH = REGISTRY.gauge("sc_ingest_queue_depth", "Messages waiting in the ingest queue")
+_SPILL_DEPTH = REGISTRY.gauge("sc_ingest_spill_depth", "Messages waiting in the on-disk spill file")
+
+
+class DiskSpill:
+    """
+    Append-only JSONL overflow file, consumed FIFO and truncated once fully drained.
+
+    Both ends keep one handle open. Appends only fill the write buffer; reads flush it and then
+    run a batch of lines in a thread, so the event loop never waits on the disk per message.
+    `pending` counts lines not yet handed on: `read` leaves it alone and the caller calls
+    `consumed` once an item is safely in the queue.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        # Leftovers from a previous run are replayed from the start (processing is idempotent per message).
+        with self.path.open("rb") as fh:
+            self.pending = sum(1 for line in fh if line.strip())
+            torn = False
+            if fh.tell() > 0:
+                fh.seek(-1, 2)
+                torn = fh.read(1) != b"\n"
+        self._out = self.path.open("ab")
+        if torn:
+            # A line cut short by a crash: end it so it is skipped as corrupt, not glued to the next one
+            self._out.write(b"\n")
+        self._in = self.path.open("rb")
+
+    def append(self, enqueued_at: float, env: MessageEnvelope) -> None:
+        line = json.dumps({"t": enqueued_at, "env": env.to_dict()}, ensure_ascii=False)
+        self._out.write(line.encode("utf-8") + b"\n")
+        self.pending += 1
+
+    async def read(self, limit: int) -> list[tuple[float, MessageEnvelope]]:
+        """Up to `limit` of the next unread items; corrupt lines are skipped (and no longer pending)."""
+        self._out.flush()
+        items, skipped = await asyncio.to_thread(self._read, limit)
+        if skipped:
+            self._done(skipped)
+        return items
+
+    def consumed(self) -> None:
+        """One item returned by `read` has been handed on."""
+        self._done(1)
+
+    def flush(self) -> None:
+        self._out.flush()
+
+    def _done(self, n: int) -> None:
+        self.pending = max(0, self.pending - n)
+        if self.pending == 0:
+            self._out.truncate(0)
+            self._in.seek(0)
+
+    def _read(self, limit: int) -> tuple[list[tuple[float, MessageEnvelope]], int]:
+        items: list[tuple[float, MessageEnvelope]] = []
+        skipped = 0
+        while len(items) < limit:
+            start = self._in.tell()
+            line = self._in.readline()
+            if not line.endswith(b"\n"):
+                # End of file, or a line whose end is still in the write buffer
+                self._in.seek(start)
+                break
+            if not line.strip():
+                continue
+            try:
+                d = json.loads(line)
+                items.append((float(d["t"]), MessageEnvelope.from_dict(d["env"])))
+            except Exception:
+                skipped += 1
+                log.warning("ingest: skipping corrupt spill line: %s", line[:200])
+        return items, skipped
+
+
+class IngestQueue:
+    """
+    Bounded hand-off between the Telegram dispatcher and a pool of processor workers.
+
+    Backpressure policies when the queue is full:
+      - block:       `submit` waits for a free slot (slows down the Pyrogram dispatcher)
+      - drop_oldest: evict the oldest queued message to make room (lossy)
+      - spill:       overflow goes to a JSONL file on disk and is fed back as the queue drains
+    """
+
+    def __init__(
+        self,
+        processor: Processor,
+        maxsize: int = 1000,
+        workers: int = 8,
+        policy: BackpressurePolicy = "block",
+        spill_path: str = "ingest_spill.jsonl",
+    ) -> None:
+        self.processor = processor
+        self.policy = policy
+        self.workers = max(1, workers)
+        self._queue: asyncio.Queue[tuple[float, MessageEnvelope]] = asyncio.Queue(maxsize=max(1, maxsize))
+        self._spill: Optional[DiskSpill] = DiskSpill(spill_path) if policy == "spill" else None
+        self._spilled = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._refill_task: Optional[asyncio.Task] = None
+        self._accepting = False
+
+        _DEPTH.set_function(self._queue.qsize)
+        if self._spill is not None:
+            _SPILL_DEPTH.set_function(lambda: self._spill.pending if self._spill else 0)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._accepting = True
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"ingest-worker-{i}"))
+        if self._spill is not None:
+            if self._spill.pending:
+                log.info("ingest: resuming %s spilled messages from %s", self._spill.pending, self._spill.path)
+                self._spilled.set()
+            self._refill_task = asyncio.create_task(self._refill(), name="ingest-spill-refill")
+        log.info("ingest queue started (workers=%s, maxsize=%s, policy=%s)", self.workers, self._queue.maxsize, self.policy)
+
+    async def stop(self, drain_timeout: float = 30.0) -> None:
+        """Stop accepting, give workers up to `drain_timeout` seconds to finish queued work, then cancel.
+
+        Spilled messages stay on disk and are picked up on the next start.
+        """
+        self._accepting = False
+        if self._refill_task:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+        if self._spill is not None:
+            self._spill.flush()
+        if self._tasks and not self._queue.empty():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                log.warning("ingest: drain timed out with %s messages still queued", self._queue.qsize())
+        for t in self._tasks:
+            t.cancel()
+        for t in self._tasks:
+            try:
+                await t
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+
+    async def submit(self, env: MessageEnvelope) -> None:
+        if not self._accepting:
+            _EVENTS.inc("rejected")
+            log.warning("ingest: not accepting, dropped channel=%s msg=%s", env.channel_id, env.message_id)
+            return
+
+        item = (time.time(), env)
+        _EVENTS.inc("submitted")
+
+        if self.policy == "block":
+            await self._queue.put(item)
+            return
+
+        if self.policy == "spill":
+            assert self._spill is not None
+            # Keep FIFO order: once anything is on disk, new messages go behind it.
+            if self._spill.pending or self._queue.full():
+                self._spill.append(*item)
+                self._spilled.set()
+                _EVENTS.inc("spilled")
+                return
+            self._queue.put_nowait(item)
+            return
+
+        # drop_oldest
+        while self._queue.full():
+            try:
+                _, dropped = self._queue.get_nowait()
+                self._queue.task_done()
+                _EVENTS.inc("dropped")
+                log.warning("ingest: queue full, dropped channel=%s msg=%s", dropped.channel_id, dropped.message_id)
+            except asyncio.QueueEmpty:
+                break
+        self._queue.put_nowait(item)
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "workers": self.workers,
+            "depth": self._queue.qsize(),
+            "maxsize": self._queue.maxsize,
+            "spilled_pending": self._spill.pending if self._spill else 0,
+            "events": {k[0]: int(v) for k, v in _EVENTS.items()},
+            "queue_wait_seconds": _QUEUE_WAIT.summary(),
+            "process_seconds": _PROCESS_TIME.summary(),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            enqueued_at, env = await self._queue.get()
+            started = time.time()
+            _QUEUE_WAIT.observe(max(0.0, started - enqueued_at))
+            try:
+                await self.processor.process(env)
+                _EVENTS.inc("processed")
+            except Exception:
+                _EVENTS.inc("failed")
+                log.exception("ingest: processing failed for channel=%s msg=%s", env.channel_id, env.message_id)
+            finally:
+                _PROCESS_TIME.observe(time.time() - started)
+                self._queue.task_done()
+
+    async def _refill(self) -> None:
+        assert self._spill is not None
+        while True:
+            await self._spilled.wait()
+            items = await self._spill.read(max(1, self._queue.maxsize))
+            if not items:
+                self._spilled.clear()
+                continue
+            for item in items:
+                # Still counted as pending until it is in the queue, so `submit` keeps new messages
+                # behind it. Items read but not queued when cancelled stay in the file for the next run.
+                await self._queue.put(item)
+                self._spill.consumed()
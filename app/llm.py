@@ -1,14 +1,25 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Optional
+import random
+import time
+from typing import Any, Optional
+import openai
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from app.schemas import SignalFields
+from app.schemas import BatchVerdicts, SignalFields, SignalVerdict
 from app.config import settings
+from app.metrics import REGISTRY
+from app.ratelimit import AdaptiveLimiter, PRIORITY_CLASSIFY, PRIORITY_PARSE
 
 log = logging.getLogger("sc.llm")
 
+# kind: classify | parse | classify_and_parse | classify_batch
+_CALLS = REGISTRY.counter("sc_llm_calls_total", "LLM call attempts by kind and outcome", labels=("kind", "outcome"))
+_LATENCY = REGISTRY.histogram("sc_llm_call_seconds", "Latency of successful LLM calls", labels=("kind",))
+_TOKENS = REGISTRY.counter("sc_llm_tokens_total", "LLM tokens reported by the API", labels=("kind", "direction"))
+
 # System prompts kept tight and deterministic.
 _SIGNAL_CLASSIFIER_SYSTEM = (
     "You are a precise classifier. Decide if the user message contains a concrete trading signal "
@@ -22,18 +33,70 @@ _SIGNAL_PARSER_SYSTEM = (
     "If information is absent, leave it null. Do not guess."
 )
 
+_SIGNAL_CLASSIFY_PARSE_SYSTEM = (
+    "You are a precise classifier and strict information extractor. First decide if the user message contains "
+    "a concrete trading signal with explicit intent or request to open a position (long/short or buy/sell). "
+    "If it does not, set is_signal to false and signal to null. If it does, set is_signal to true and extract "
+    "the data of the single trading signal: stop_loss can be one or multiple numbers; take_profits can be one "
+    "or multiple numbers. If information is absent, leave it null. Do not guess."
+)
+
+_SIGNAL_BATCH_CLASSIFIER_SYSTEM = (
+    "You are a precise classifier. You receive several numbered messages. For each one decide independently "
+    "if it contains a concrete trading signal with explicit intent or request to open a position "
+    "(long/short or buy/sell). Be accurate. Return one verdict per message number."
+)
+
+_MAX_TOKENS = 400
+# Retried by LLMClient itself so every attempt goes through the limiter
+_RETRYABLE = (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _backoff(attempt: int) -> float:
+    return min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
 
 class LLMClient:
-    """LangChain LLMs for classification and structured parsing (no rate limiting)."""
+    """
+    LangChain LLMs for classification and structured parsing.
+
+    Two modes: `is_signal` + `parse_signal` (two round-trips for a signal), or
+    `classify_and_parse` which returns the verdict and the parse from one structured call.
+    `classify_batch` packs several messages into one classification request.
+
+    Every call is admitted by a shared AdaptiveLimiter (requests/min, tokens/min, adaptive
+    concurrency); parses are served before classifications. 429s and transient errors are
+    retried here, not inside the OpenAI client, so retries respect the limiter.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, limiter: Optional[AdaptiveLimiter] = None) -> None:
         self.llm = ChatOpenAI(
             model=settings.openai_model,
             api_key=settings.openai_api_key,
             temperature=0,
-            max_tokens=400,
+            max_tokens=_MAX_TOKENS,
             timeout=120,
-            max_retries=5
+            max_retries=0,
+        )
+        self.max_attempts = max(1, settings.llm_max_retries + 1)
+        self.limiter = limiter or AdaptiveLimiter(
+            requests_per_minute=settings.llm_requests_per_minute,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            min_concurrency=settings.llm_min_concurrency,
+            max_concurrency=settings.llm_max_concurrency,
+            target_latency=settings.llm_target_latency_seconds,
         )
 
         self._cls_prompt = ChatPromptTemplate.from_messages(
@@ -43,19 +106,99 @@ class LLMClient:
             [("system", _SIGNAL_PARSER_SYSTEM), ("human", "Message to parse: `{message}`")]
         )
 
-        self._structured_llm = self.llm.with_structured_output(SignalFields)
+        self._batch_cls_prompt = ChatPromptTemplate.from_messages(
+            [("system", _SIGNAL_BATCH_CLASSIFIER_SYSTEM), ("human", "Messages to classify:\n\n{messages}")]
+        )
+
+        self._single_prompt = ChatPromptTemplate.from_messages(
+            [("system", _SIGNAL_CLASSIFY_PARSE_SYSTEM), ("human", "Message to classify and parse: `{message}`")]
+        )
+
+        # include_raw keeps the AIMessage so actual token usage can be charged to the limiter
+        self._structured_llm = self.llm.with_structured_output(SignalFields, include_raw=True)
+        self._verdict_llm = self.llm.with_structured_output(SignalVerdict, include_raw=True)
+        self._batch_verdict_llm = self.llm.with_structured_output(BatchVerdicts, include_raw=True)
+
+    async def _invoke(self, kind: str, runnable: Any, prompt: list, priority: int) -> Any:
+        """Run one LLM call through the limiter, retrying 429s and transient errors."""
+        # ~3 chars per token for mixed EN/RU text, plus the completion budget
+        estimate = sum(len(str(m.content)) for m in prompt) // 3 + _MAX_TOKENS
+        for attempt in range(1, self.max_attempts + 1):
+            lease = await self.limiter.acquire(priority, estimate)
+            started = time.perf_counter()
+            try:
+                result = await runnable.ainvoke(prompt)
+            except openai.RateLimitError as e:
+                self.limiter.release(lease, ok=False, throttled=True)
+                _CALLS.inc(kind, "rate_limited")
+                if attempt >= self.max_attempts:
+                    raise
+                delay = _retry_after(e)
+                self.limiter.pause(min(60.0, delay) if delay is not None else _backoff(attempt))
+                log.warning("LLM rate limited (attempt %s/%s)", attempt, self.max_attempts)
+                continue
+            except _RETRYABLE as e:
+                self.limiter.release(lease, ok=False)
+                _CALLS.inc(kind, "transient_error")
+                if attempt >= self.max_attempts:
+                    raise
+                log.warning("LLM call failed (attempt %s/%s): %s", attempt, self.max_attempts, e)
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            except BaseException:
+                self.limiter.release(lease, ok=False)
+                _CALLS.inc(kind, "error")
+                raise
+            _LATENCY.observe(time.perf_counter() - started, kind)
+            _CALLS.inc(kind, "ok")
+            raw = result.get("raw") if isinstance(result, dict) else result
+            usage = getattr(raw, "usage_metadata", None)
+            if usage:
+                _TOKENS.inc(kind, "input", amount=usage.get("input_tokens", 0))
+                _TOKENS.inc(kind, "output", amount=usage.get("output_tokens", 0))
+            self.limiter.release(lease, ok=True, used_tokens=usage.get("total_tokens") if usage else None)
+            return result
+
+    async def _structured(self, kind: str, runnable: Any, prompt: list, priority: int) -> Any:
+        result = await self._invoke(kind, runnable, prompt, priority)
+        if result.get("parsing_error") is not None:
+            raise result["parsing_error"]
+        return result["parsed"]
 
     async def is_signal(self, text: str) -> bool:
         prompt = self._cls_prompt.format_messages(message=text)
-        resp = await self.llm.ainvoke(prompt)
+        resp = await self._invoke("classify", self.llm, prompt, PRIORITY_CLASSIFY)
         log.debug("LLM response '%s' for text %s", resp.content[:100], text[:100])
         content = (resp.content or "").strip().lower()
         return content.startswith("y")  # yes/no only
 
+    async def classify_batch(self, texts: list[str]) -> list[Optional[bool]]:
+        """
+        Classify several messages with one request. Items the model skipped (or the whole batch,
+        if the call failed) come back as None so the caller can fall back to `is_signal`.
+        """
+        if not texts:
+            return []
+        messages = "\n\n".join(f"[{i}] `{t}`" for i, t in enumerate(texts, 1))
+        prompt = self._batch_cls_prompt.format_messages(messages=messages)
+        try:
+            result: BatchVerdicts = await self._structured(
+                "classify_batch", self._batch_verdict_llm, prompt, PRIORITY_CLASSIFY
+            )
+        except Exception as e:
+            log.exception("Unexpected exception during batch classification", exc_info=e)
+            return [None] * len(texts)
+        out: list[Optional[bool]] = [None] * len(texts)
+        for item in result.items:
+            if 1 <= item.index <= len(texts):
+                out[item.index - 1] = item.is_signal
+        log.debug("Batch classified %s messages: %s", len(texts), out)
+        return out
+
     async def parse_signal(self, text: str) -> Optional[SignalFields]:
         prompt = self._parse_prompt.format_messages(message=text)
         try:
-            result: SignalFields = await self._structured_llm.ainvoke(prompt)
+            result: SignalFields = await self._structured("parse", self._structured_llm, prompt, PRIORITY_PARSE)
             log.debug("Parsed signal with LLM: %s", str(result).replace("\n", " "))
             if not result.symbol or not result.side:
                 log.warning("Signal without symbol or side parsed: %s", result)
@@ -64,3 +207,19 @@ class LLMClient:
         except Exception as e:
             log.exception("Unexpected exception during signal parsing", exc_info=e)
             return None
+
+    async def classify_and_parse(self, text: str) -> Optional[SignalVerdict]:
+        """One round-trip: verdict plus parsed fields. None means the call failed (not a 'no')."""
+        prompt = self._single_prompt.format_messages(message=text)
+        try:
+            result: SignalVerdict = await self._structured(
+                "classify_and_parse", self._verdict_llm, prompt, PRIORITY_CLASSIFY
+            )
+            log.debug("Classified+parsed with LLM: %s", str(result).replace("\n", " "))
+            if result.is_signal and (result.signal is None or not result.signal.symbol or not result.signal.side):
+                log.warning("Signal without symbol or side parsed: %s", result)
+                return SignalVerdict(is_signal=True, signal=None)
+            return result
+        except Exception as e:
+            log.exception("Unexpected exception during signal classification+parsing", exc_info=e)
+            return None
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Optional
+
+from app.llm import LLMClient
+from app.metrics import REGISTRY
+
+log = logging.getLogger("sc.llm_batch")
+
+_BATCH_SIZE = REGISTRY.histogram(
+    "sc_llm_classify_batch_size", "Messages per packed classification request", buckets=(1, 2, 4, 8, 12, 16, 20)
+)
+_FALLBACKS = REGISTRY.counter("sc_llm_classify_batch_fallbacks_total", "Batched messages re-classified one by one")
+
+# Packed verdicts must fit the completion budget of one call (~15 tokens per item)
+MAX_BATCH_LIMIT = 20
+
+
+class ClassifyBatcher:
+    """
+    Coalesces concurrent `is_signal` calls from ingest workers into packed `classify_batch` requests.
+
+    A batch is sent when `max_batch` messages are waiting or `window_ms` after the first one
+    arrived, whichever comes first. A lone message uses the plain single-message call, so an idle
+    pipeline pays at most `window_ms` of extra latency.
+    """
+
+    def __init__(self, llm: LLMClient, window_ms: int = 50, max_batch: int = 16) -> None:
+        self.llm = llm
+        self.window = max(0, window_ms) / 1000.0
+        self.max_batch = max(1, min(MAX_BATCH_LIMIT, max_batch))
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.fallbacks = 0
+
+    async def is_signal(self, text: str) -> bool:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((text, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        # The batch runs in its own task: a cancelled caller must not cancel its neighbours' verdicts
+        return await asyncio.shield(fut)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "messages": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "fallbacks": self.fallbacks,
+            "waiting": len(self._pending),
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._run(batch), name="llm-classify-batch")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        texts = [t for t, _ in batch]
+        self.batches += 1
+        self.items += len(batch)
+        _BATCH_SIZE.observe(len(batch))
+        try:
+            if len(batch) == 1:
+                verdicts: list[Optional[bool]] = [await self.llm.is_signal(texts[0])]
+            else:
+                verdicts = await self.llm.classify_batch(texts)
+                missing = [i for i, v in enumerate(verdicts) if v is None]
+                if missing:
+                    self.fallbacks += len(missing)
+                    _FALLBACKS.inc(amount=len(missing))
+                    log.debug("batch classify: %s of %s messages fall back to single calls", len(missing), len(batch))
+                    singles = await asyncio.gather(
+                        *(self.llm.is_signal(texts[i]) for i in missing), return_exceptions=True
+                    )
+                    for i, v in zip(missing, singles):
+                        verdicts[i] = v
+        except Exception as e:
+            verdicts = [e] * len(batch)
+
+        for (_, fut), verdict in zip(batch, verdicts):
+            if fut.done():
+                continue
+            if isinstance(verdict, BaseException):
+                fut.set_exception(verdict)
+            else:
+                fut.set_result(bool(verdict))
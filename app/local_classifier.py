@@ -0,0 +1,303 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import re
+import unicodedata
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from app.db import AsyncSessionLocal
+from app.models import RejectedMessage, Signal
+
+log = logging.getLogger("sc.local_classifier")
+
+# On-box signal/not-signal scorer between the regex gate and the remote LLM:
+# hashed word + char n-grams -> logistic regression, stored as one small .npz file.
+#   python -m app.local_classifier train --out models/local_classifier.npz
+#   python -m app.local_classifier eval --model models/local_classifier.npz
+
+FORMAT_VERSION = 1
+DEFAULT_BITS = 18
+
+_URL_RE = re.compile(r"https?://\S+|t\.me/\S+|www\.\S+", re.I)
+_DIGITS_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"[^\W_]+|[#$@%/:.\-]", re.U)
+
+
+def _normalize(text: str) -> str:
+    s = unicodedata.normalize("NFKC", text or "").lower()
+    s = _URL_RE.sub(" url ", s)
+    # Number shape matters ("0.0", "0x"), the value does not
+    return _DIGITS_RE.sub("0", s)
+
+
+def features(text: str, bits: int = DEFAULT_BITS) -> list[int]:
+    """Hashed feature ids: word unigrams/bigrams and char 3-4-grams inside words (crc32, stable across runs)."""
+    mask = (1 << bits) - 1
+    words = _WORD_RE.findall(_normalize(text))
+    grams: set[str] = set()
+    prev = "^"
+    for w in words:
+        grams.add("w:" + w)
+        grams.add("b:" + prev + " " + w)
+        prev = w
+        padded = f" {w} "
+        for n in (3, 4):
+            for i in range(len(padded) - n + 1):
+                grams.add("c:" + padded[i:i + n])
+    return sorted({zlib.crc32(g.encode("utf-8")) & mask for g in grams})
+
+
+def vectorize(texts: Iterable[str], bits: int = DEFAULT_BITS) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR-style batch: (indices, row ids, values); each row is binary and L2-normalized."""
+    indices: list[int] = []
+    rows: list[int] = []
+    values: list[float] = []
+    for r, text in enumerate(texts):
+        ids = features(text, bits)
+        if not ids:
+            continue
+        v = 1.0 / np.sqrt(len(ids))
+        indices.extend(ids)
+        rows.extend([r] * len(ids))
+        values.extend([v] * len(ids))
+    return (
+        np.asarray(indices, dtype=np.int64),
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(values, dtype=np.float32),
+    )
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+class LocalClassifier:
+    """
+    Logistic regression over hashed n-grams. `score_batch` is fully vectorized; the band
+    [`reject_below`, `accept_above`) is "uncertain" and still goes to the LLM.
+    """
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: float,
+        bits: int = DEFAULT_BITS,
+        reject_below: float = 0.05,
+        accept_above: float = 0.97,
+        meta: Optional[dict] = None,
+    ) -> None:
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.bits = bits
+        self.reject_below = reject_below
+        self.accept_above = accept_above
+        self.meta = meta or {}
+
+    @classmethod
+    def load(cls, path: str, reject_below: float = 0.05, accept_above: float = 0.97) -> "LocalClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["version"])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"unsupported local classifier format {version} in {path}")
+            meta = json.loads(str(data["meta"]))
+            return cls(data["weights"], float(data["bias"]), int(data["bits"]), reject_below, accept_above, meta)
+
+    def save(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            version=np.int32(FORMAT_VERSION),
+            bits=np.int32(self.bits),
+            weights=self.weights,
+            bias=np.float32(self.bias),
+            meta=np.str_(json.dumps(self.meta)),
+        )
+
+    def score_batch(self, texts: list[str]) -> np.ndarray:
+        """Signal probability for every text."""
+        indices, rows, values = vectorize(texts, self.bits)
+        z = np.bincount(rows, weights=self.weights[indices] * values, minlength=len(texts)) + self.bias
+        return _sigmoid(z)
+
+    def score(self, text: str) -> float:
+        return float(self.score_batch([text])[0])
+
+    @classmethod
+    def train(
+        cls,
+        texts: list[str],
+        labels: np.ndarray,
+        bits: int = DEFAULT_BITS,
+        epochs: int = 8,
+        batch_size: int = 256,
+        lr: float = 0.5,
+        l2: float = 1e-6,
+        seed: int = 0,
+    ) -> "LocalClassifier":
+        """Mini-batch Adagrad on the class-balanced log loss."""
+        dim = 1 << bits
+        y = labels.astype(np.float64)
+        n = len(texts)
+        pos = max(1.0, y.sum())
+        neg = max(1.0, n - y.sum())
+        sample_w = np.where(y > 0, n / (2 * pos), n / (2 * neg))
+
+        indices, rows, values = vectorize(texts, bits)
+        # Row slices into the flat arrays (rows are emitted in order)
+        starts = np.searchsorted(rows, np.arange(n + 1))
+
+        w = np.zeros(dim, dtype=np.float64)
+        b = 0.0
+        gw_acc = np.full(dim, 1e-8)
+        gb_acc = 1e-8
+        rnd = np.random.default_rng(seed)
+        for _ in range(epochs):
+            order = rnd.permutation(n)
+            for k in range(0, n, batch_size):
+                batch = order[k:k + batch_size]
+                parts = [np.arange(starts[i], starts[i + 1]) for i in batch]
+                sel = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+                local_rows = np.repeat(np.arange(len(batch)), [len(p) for p in parts])
+                idx, val = indices[sel], values[sel]
+                z = np.bincount(local_rows, weights=w[idx] * val, minlength=len(batch)) + b
+                g = (_sigmoid(z) - y[batch]) * sample_w[batch] / len(batch)
+                grad = np.bincount(idx, weights=g[local_rows] * val, minlength=dim)
+                touched = np.unique(idx)
+                grad[touched] += l2 * w[touched]
+                gw_acc[touched] += grad[touched] ** 2
+                w[touched] -= lr * grad[touched] / np.sqrt(gw_acc[touched])
+                gb = float(g.sum())
+                gb_acc += gb * gb
+                b -= lr * gb / np.sqrt(gb_acc)
+        return cls(w.astype(np.float32), b, bits)
+
+
+def evaluate(model: LocalClassifier, texts: list[str], labels: np.ndarray) -> dict:
+    """Precision/recall at 0.5 plus what the uncertain band would send to the LLM."""
+    p = model.score_batch(texts)
+    y = labels.astype(bool)
+    pred = p >= 0.5
+    tp = int((pred & y).sum())
+    fp = int((pred & ~y).sum())
+    fn = int((~pred & y).sum())
+    rejected = p < model.reject_below
+    accepted = p >= model.accept_above
+    n = max(1, len(texts))
+    return {
+        "samples": len(texts),
+        "positives": int(y.sum()),
+        "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+        "band": {
+            "reject_below": model.reject_below,
+            "accept_above": model.accept_above,
+            "auto_rejected": round(float(rejected.mean()) if len(texts) else 0.0, 4),
+            "auto_accepted": round(float(accepted.mean()) if len(texts) else 0.0, 4),
+            "to_llm": round(float((~rejected & ~accepted).sum()) / n, 4),
+            # Signals the tier would drop without asking the LLM, as a share of all signals
+            "missed_signals": round(float((rejected & y).sum()) / max(1, int(y.sum())), 4),
+            "accept_precision": round(float((accepted & y).sum()) / max(1, int(accepted.sum())), 4),
+        },
+    }
+
+
+async def load_dataset() -> tuple[list[str], np.ndarray, list[tuple[str, int]]]:
+    """
+    Positives: stored signals. Negatives: messages the LLM rejected (not the local tier's own
+    rejections). Also returns each text's source row as ("signals" | "rejected", id).
+    """
+    async with AsyncSessionLocal() as session:
+        pos = (await session.execute(select(Signal.id, Signal.original_text))).all()
+        neg = (
+            await session.execute(
+                select(RejectedMessage.id, RejectedMessage.text).where(RejectedMessage.source != "local")
+            )
+        ).all()
+    pos = [r for r in pos if r[1]]
+    neg = [r for r in neg if r[1]]
+    texts = [t for _, t in pos] + [t for _, t in neg]
+    labels = np.concatenate([np.ones(len(pos)), np.zeros(len(neg))])
+    rows = [("signals", i) for i, _ in pos] + [("rejected", i) for i, _ in neg]
+    return texts, labels, rows
+
+
+def _split(n: int, holdout: float, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    order = np.random.default_rng(seed).permutation(n)
+    cut = int(n * (1 - holdout))
+    return order[:cut], order[cut:]
+
+
+def train_rows_meta(rows: list[tuple[str, int]], idx: np.ndarray) -> dict:
+    """Ids of the training rows per table, for model.meta["train_rows"]."""
+    out: dict[str, list[int]] = {"signals": [], "rejected": []}
+    for i in idx:
+        table, row_id = rows[i]
+        out[table].append(row_id)
+    return {table: sorted(ids) for table, ids in out.items()}
+
+
+def rows_outside(rows: list[tuple[str, int]], train_rows: dict) -> np.ndarray:
+    """Indices of the rows a model with meta["train_rows"] = `train_rows` was not trained on."""
+    seen = {(table, row_id) for table, ids in train_rows.items() for row_id in ids}
+    return np.asarray([i for i, row in enumerate(rows) if row not in seen], dtype=np.int64)
+
+
+def main() -> None:
+    from app.config import settings
+
+    ap = argparse.ArgumentParser(prog="python -m app.local_classifier")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    tr = sub.add_parser("train", help="retrain from the signals/rejected_messages tables")
+    tr.add_argument("--out", default=settings.local_classifier_path or "models/local_classifier.npz")
+    tr.add_argument("--holdout", type=float, default=0.2)
+    tr.add_argument("--epochs", type=int, default=8)
+    tr.add_argument("--bits", type=int, default=DEFAULT_BITS)
+    tr.add_argument("--seed", type=int, default=0)
+    ev = sub.add_parser("eval", help="report precision/recall of a saved model on the rows it was not trained on")
+    ev.add_argument("--model", default=settings.local_classifier_path or "models/local_classifier.npz")
+    args = ap.parse_args()
+
+    texts, labels, rows = asyncio.run(load_dataset())
+    if len(texts) < 10 or labels.min() == labels.max():
+        raise SystemExit(f"not enough labelled data: {len(texts)} texts, {int(labels.sum())} signals")
+    band = dict(
+        reject_below=settings.local_classifier_reject_below, accept_above=settings.local_classifier_accept_above
+    )
+
+    if args.cmd == "train":
+        train_idx, test_idx = _split(len(texts), args.holdout, args.seed)
+        model = LocalClassifier.train(
+            [texts[i] for i in train_idx], labels[train_idx], bits=args.bits, epochs=args.epochs, seed=args.seed
+        )
+        model.reject_below, model.accept_above = band["reject_below"], band["accept_above"]
+        report = evaluate(model, [texts[i] for i in test_idx], labels[test_idx])
+        model.meta = {
+            "trained_at": datetime.now(timezone.utc).isoformat(),
+            "train_samples": len(train_idx),
+            "train_rows": train_rows_meta(rows, train_idx),
+            "holdout": report,
+        }
+        model.save(args.out)
+        print(f"saved {args.out}")
+    else:
+        model = LocalClassifier.load(args.model, **band)
+        if "train_rows" not in model.meta:
+            raise SystemExit(f"{args.model} does not record its training rows; retrain it to evaluate")
+        # The held-out rows of training plus everything stored since
+        test_idx = rows_outside(rows, model.meta["train_rows"])
+        if not len(test_idx):
+            raise SystemExit("no rows outside the training set to evaluate on")
+        report = evaluate(model, [texts[i] for i in test_idx], labels[test_idx])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+from __future__ import annotations
+import asyncio
+import bisect
+import threading
+from typing import Callable, Iterable, Optional
+
+# Tiny in-process metrics (counters, gauges, histograms). No external deps; cheap enough for the hot path.
+
+# Latency buckets in seconds: 100µs .. 120s, roughly x2.5 per step
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+LabelValues = tuple[str, ...]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, label_values: tuple) -> LabelValues:
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name}: expected labels {self.labels}, got {label_values}")
+        return tuple(str(v) for v in label_values)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: object, amount: float = 1.0) -> None:
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *label_values: object) -> float:
+        return self._values.get(self._key(label_values), 0.0)
+
+    def items(self) -> list[tuple[LabelValues, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(_Metric):
+    """Gauge either set explicitly or computed on read via a callback."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[LabelValues, float] = {}
+        self._functions: dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, *label_values: object) -> None:
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def set_function(self, fn: Callable[[], float], *label_values: object) -> None:
+        key = self._key(label_values)
+        with self._lock:
+            self._functions[key] = fn
+
+    def items(self) -> list[tuple[LabelValues, float]]:
+        with self._lock:
+            out = dict(self._values)
+            fns = list(self._functions.items())
+        for key, fn in fns:
+            try:
+                out[key] = float(fn())
+            except Exception:
+                continue
+        return list(out.items())
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int) -> None:
+        self.counts = [0] * (n_buckets + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; quantiles are estimated by linear interpolation inside a bucket."""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, value: float, *label_values: object) -> None:
+        key = self._key(label_values)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[idx] += 1
+            series.sum += value
+            series.count += 1
+
+    def items(self) -> list[tuple[LabelValues, _HistogramSeries]]:
+        with self._lock:
+            return list(self._series.items())
+
+    def quantile(self, q: float, *label_values: object) -> Optional[float]:
+        series = self._series.get(self._key(label_values))
+        if series is None or series.count == 0:
+            return None
+        rank = q * series.count
+        seen = 0
+        lower = 0.0
+        for i, cnt in enumerate(series.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else lower
+            if cnt and seen + cnt >= rank:
+                return lower + (upper - lower) * ((rank - seen) / cnt)
+            seen += cnt
+            lower = upper
+        return lower
+
+    def summary(self, *label_values: object) -> dict:
+        series = self._series.get(self._key(label_values))
+        if series is None or series.count == 0:
+            return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None}
+        return {
+            "count": series.count,
+            "mean": series.sum / series.count,
+            "p50": self.quantile(0.5, *label_values),
+            "p95": self.quantile(0.95, *label_values),
+            "p99": self.quantile(0.99, *label_values),
+        }
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, *args, **kwargs):
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                if not isinstance(existing, cls):
+                    raise ValueError(f"metric {name} already registered as {existing.kind}")
+                return existing
+            metric = cls(name, *args, **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labels)
+
+    def histogram(
+        self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets)
+
+    def metrics(self) -> list[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+
+REGISTRY = Registry()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def render_prometheus(registry: Optional[Registry] = None) -> str:
+    """Prometheus text exposition format (0.0.4) of every metric in the registry."""
+    out: list[str] = []
+    for m in (registry or REGISTRY).metrics():
+        out.append(f"# HELP {m.name} {m.help}")
+        out.append(f"# TYPE {m.name} {m.kind}")
+        if isinstance(m, Histogram):
+            for key, series in m.items():
+                cumulative = 0
+                for bound, cnt in zip(m.buckets + (float("inf"),), series.counts):
+                    cumulative += cnt
+                    le = 'le="%s"' % _num(bound)
+                    out.append(f"{m.name}_bucket{_labels(m.labels, key, le)} {cumulative}")
+                out.append(f"{m.name}_sum{_labels(m.labels, key)} {_num(series.sum)}")
+                out.append(f"{m.name}_count{_labels(m.labels, key)} {series.count}")
+        else:
+            for key, value in m.items():
+                out.append(f"{m.name}{_labels(m.labels, key)} {_num(value)}")
+    return "\n".join(out) + "\n"
+
+
+async def serve_prometheus(host: str, port: int, registry: Optional[Registry] = None) -> asyncio.AbstractServer:
+    """Bare HTTP endpoint answering any request with the exposition, for processes without the API."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = render_prometheus(registry).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from sqlalchemy import (
     String,
@@ -7,16 +7,25 @@ from sqlalchemy import (
     BigInteger,
     Boolean,
     DateTime,
+    Date,
+    Float,
     Text,
     JSON,
     Enum,
     UniqueConstraint,
     ForeignKey,
+    Index,
+    column,
+    false,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base
 import enum
 
+# JSON on SQLite, binary JSONB on PostgreSQL
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 
 class TradeSide(str, enum.Enum):
     long = "long"
@@ -41,6 +50,16 @@ class Signal(Base):
     __tablename__ = "signals"
     __table_args__ = (
         UniqueConstraint("channel_id", "message_id", name="uq_channel_message"),
+        # Keyset pagination of the channel / symbol listings, newest first
+        Index("ix_signals_channel_date_id", "channel_id", "message_date", "id"),
+        Index("ix_signals_symbol_date_id", "symbol", "message_date", "id"),
+        # Checker candidates: a range scan over live signals only
+        Index(
+            "ix_signals_next_check_at_live",
+            "next_check_at",
+            sqlite_where=column("deleted") == false(),
+            postgresql_where=column("deleted") == false(),
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -52,8 +71,8 @@ class Signal(Base):
     side: Mapped[TradeSide] = mapped_column(Enum(TradeSide), index=True)
     leverage: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
-    stop_loss: Mapped[Optional[list[float]]] = mapped_column(JSON, nullable=True)
-    take_profits: Mapped[list[float]] = mapped_column(JSON, nullable=False)
+    stop_loss: Mapped[Optional[list[float]]] = mapped_column(JSONType, nullable=True)
+    take_profits: Mapped[list[float]] = mapped_column(JSONType, nullable=False)
 
     original_text: Mapped[str] = mapped_column(Text, nullable=False)
 
@@ -61,6 +80,8 @@ class Signal(Base):
     deleted: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     edited: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     last_checked_time: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # When the checker should look at it again (app/check_schedule.py); set on insert and every check
+    next_check_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
@@ -80,3 +101,96 @@ class SignalEdition(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
     signal: Mapped[Signal] = relationship(back_populates="editions")
+
+
+class LLMCacheEntry(Base):
+    """Persisted LLM verdict/parse keyed by a normalized-text fingerprint (dedup of reposted signals)."""
+    __tablename__ = "llm_cache"
+
+    fingerprint: Mapped[str] = mapped_column(String(32), primary_key=True)
+    simhash: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    anchor_key: Mapped[str] = mapped_column(String(32), nullable=False)
+    is_signal: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    fields: Mapped[Optional[dict]] = mapped_column(JSONType, nullable=True)
+    hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, index=True, nullable=False)
+
+
+class RejectedMessage(Base):
+    """Message the LLM classified as not a signal; negatives for training the local classifier."""
+    __tablename__ = "rejected_messages"
+    __table_args__ = (
+        UniqueConstraint("channel_id", "message_id", name="uq_rejected_channel_message"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    channel_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    message_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    message_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    # Decision path that rejected it: two_step | single_call | local
+    source: Mapped[str] = mapped_column(String(20), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, index=True, nullable=False)
+
+
+class BackfillState(Base):
+    """Per-channel history catch-up checkpoint: everything below `next_message_id` has been processed."""
+    __tablename__ = "backfill_state"
+
+    channel_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    next_message_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Newest message id seen when the run started; the run ends after it
+    target_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+# --- Rollups read by the stats endpoints; kept in step by the writer, the change recorder and API deletes.
+# `python -m app.service.rollups rebuild` recomputes them exactly from `signals`.
+
+class ChannelStat(Base):
+    __tablename__ = "channel_stats"
+
+    channel_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    long_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    short_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # mean leverage = leverage_sum / leverage_count (signals without leverage are not counted)
+    leverage_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    leverage_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    first_date: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_date: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    deleted: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    edited: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class SymbolStat(Base):
+    __tablename__ = "symbol_stats"
+
+    symbol: Mapped[str] = mapped_column(String(50), primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    long_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    short_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    leverage_sum: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    leverage_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    first_date: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_date: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class ChannelWeekStat(Base):
+    """Signals per channel per ISO week (`week_start` is the Monday); rows at zero are removed."""
+    __tablename__ = "channel_week_stats"
+
+    channel_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    week_start: Mapped[date] = mapped_column(Date, primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class SymbolWeekStat(Base):
+    __tablename__ = "symbol_week_stats"
+
+    symbol: Mapped[str] = mapped_column(String(50), primary_key=True)
+    week_start: Mapped[date] = mapped_column(Date, primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -0,0 +1,212 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.events import BROKER, GENERATION
+from app.metrics import REGISTRY
+
+log = logging.getLogger("sc.notify")
+
+# Optional change feed between processes (NOTIFY_DIR). Every process that commits data (a collector,
+# the shard supervisor's shared writer) serves NOTIFY_DIR/<source>.sock and broadcasts its
+# generation bumps, stream events and periodic stats. API processes follow every socket in the
+# directory and replay what arrives into their own GENERATION and BROKER, so response caches drop
+# stale entries and live streams see writes made elsewhere. Newline-delimited JSON, one-way.
+# API workers are writers too (DELETE /api/signals/{id}); each serves NOTIFY_DIR/api-<pid>.sock with
+# `relay=False` and sends only its own writes, so replayed notifications are never re-broadcast.
+
+_LINE_LIMIT = 4 * 1024 * 1024
+
+_SENT = REGISTRY.counter("sc_notify_sent_total", "Change notifications broadcast", labels=("op",))
+_RECEIVED = REGISTRY.counter("sc_notify_received_total", "Change notifications received", labels=("op",))
+_DROPPED = REGISTRY.counter("sc_notify_dropped_clients_total", "Notification followers dropped for falling behind")
+
+
+def _encode(msg: dict) -> bytes:
+    return json.dumps(msg, separators=(",", ":"), ensure_ascii=False, default=str).encode() + b"\n"
+
+
+class NotifyServer:
+    """
+    Broadcast this process's commits to followers. Writes never block: a follower whose unsent
+    backlog exceeds `max_backlog_bytes` is disconnected and resynchronises on reconnect.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        source: str,
+        stats: Optional[Callable[[], dict]] = None,
+        stats_interval: float = 10.0,
+        max_backlog_bytes: int = 1 << 20,
+        relay: bool = True,
+    ) -> None:
+        self.path = str(Path(directory) / f"{source}.sock")
+        self.source = source
+        self.stats_fn = stats
+        self.stats_interval = max(1.0, stats_interval)
+        self.max_backlog = max_backlog_bytes
+        # False: broadcast only what is passed to send_bump/send_event, not every local GENERATION/BROKER change
+        self.relay = relay
+        self._server: asyncio.AbstractServer | None = None
+        self._clients: set[asyncio.StreamWriter] = set()
+        self._handlers: set[asyncio.Task] = set()
+        self._stats_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket of a previous run
+        self._server = await asyncio.start_unix_server(self._accept, path=self.path)
+        os.chmod(self.path, 0o600)
+        if self.relay:
+            GENERATION.add_listener(self.send_bump)
+            BROKER.add_listener(self.send_event)
+        if self.stats_fn:
+            self._stats_task = asyncio.create_task(self._stats_loop(), name="notify-stats")
+        log.info("change notifications on %s", self.path)
+
+    async def stop(self) -> None:
+        if self.relay:
+            GENERATION.remove_listener(self.send_bump)
+            BROKER.remove_listener(self.send_event)
+        if self._stats_task:
+            self._stats_task.cancel()
+            try:
+                await self._stats_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._stats_task = None
+        if self._server:
+            self._server.close()
+            for w in list(self._clients):
+                w.close()  # buffered notifications are still written out
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _accept(self, reader: asyncio.StreamReader, w: asyncio.StreamWriter) -> None:
+        self._clients.add(w)
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        if self.stats_fn:
+            w.write(self._stats_line())
+        try:
+            await reader.read()  # followers never send; returns at EOF
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(w)
+            self._handlers.discard(task)
+            w.close()
+
+    def _broadcast(self, msg: dict) -> None:
+        if not self._clients:
+            return
+        line = _encode(msg)
+        _SENT.inc(msg["op"])
+        for w in list(self._clients):
+            if w.transport.get_write_buffer_size() > self.max_backlog:
+                self._clients.discard(w)
+                w.close()
+                _DROPPED.inc()
+                log.warning("notify: dropped a follower of %s with a full backlog", self.source)
+                continue
+            w.write(line)
+
+    def send_bump(self) -> None:
+        self._broadcast({"op": "bump"})
+
+    def send_event(self, type: str, channel_id: int, symbol: str, data: dict) -> None:
+        self._broadcast({"op": "event", "type": type, "channel_id": channel_id, "symbol": symbol, "data": data})
+
+    def _stats_line(self) -> bytes:
+        return _encode({"op": "stats", "data": self.stats_fn()})
+
+    async def _stats_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            try:
+                self._broadcast({"op": "stats", "data": self.stats_fn()})
+            except Exception:
+                log.exception("notify: stats snapshot failed")
+
+
+class NotifyClient:
+    """
+    Follow every NotifyServer socket in `directory`; new sockets are picked up every `scan_seconds`.
+    Sources in `skip` (this process's own server) are not followed.
+    """
+
+    def __init__(self, directory: str, scan_seconds: float = 5.0, skip: tuple[str, ...] = ()) -> None:
+        self.directory = Path(directory)
+        self.scan_seconds = max(0.5, scan_seconds)
+        self.skip = frozenset(skip)
+        self._follows: dict[str, asyncio.Task] = {}
+        self._stats: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._scan_loop(), name="notify-client")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._follows.values()) if t]
+        for t in tasks:
+            t.cancel()
+        for t in tasks:
+            try:
+                await t
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+        self._follows.clear()
+
+    def stats(self) -> dict:
+        """Latest stats snapshot of each connected source."""
+        return dict(self._stats)
+
+    async def _scan_loop(self) -> None:
+        while True:
+            for path in sorted(self.directory.glob("*.sock")):
+                if path.stem in self.skip:
+                    continue
+                key = str(path)
+                task = self._follows.get(key)
+                if task is None or task.done():
+                    self._follows[key] = asyncio.create_task(self._follow(key), name=f"notify-follow:{path.stem}")
+            await asyncio.sleep(self.scan_seconds)
+
+    async def _follow(self, path: str) -> None:
+        source = Path(path).stem
+        try:
+            reader, w = await asyncio.open_unix_connection(path, limit=_LINE_LIMIT)
+        except OSError:
+            return  # not listening (yet, or a stale file); retried on the next scan
+        log.info("notify: following %s", source)
+        # Anything committed while we were not connected is unknown: drop cached responses
+        GENERATION.bump()
+        try:
+            while line := await reader.readline():
+                msg = json.loads(line)
+                op = msg.get("op")
+                _RECEIVED.inc(op if op in ("bump", "event", "stats") else "other")
+                if op == "bump":
+                    GENERATION.bump()
+                elif op == "event":
+                    BROKER.publish(msg["type"], msg["channel_id"], msg["symbol"], msg["data"])
+                elif op == "stats":
+                    self._stats[source] = msg["data"]
+        except (ConnectionError, ValueError, KeyError) as e:
+            log.warning("notify: dropping %s: %r", source, e)
+        finally:
+            self._stats.pop(source, None)
+            w.close()
+            log.info("notify: %s disconnected", source)
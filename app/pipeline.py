@@ -0,0 +1,53 @@
+from __future__ import annotations
+import logging
+
+from app.channel_cache import ChannelCache
+from app.config import settings
+from app.dedup import DedupCache
+from app.llm import LLMClient
+from app.llm_batch import ClassifyBatcher
+from app.processor import Processor
+from app.writer import SignalWriter
+
+log = logging.getLogger("sc.pipeline")
+
+
+async def build_processor(llm: LLMClient, writer: SignalWriter, channels: ChannelCache) -> Processor:
+    """Processor wired from settings (dedup cache, local classifier, batching); shared by the server and CLIs."""
+    dedup: DedupCache | None = None
+    if settings.llm_cache_enabled:
+        dedup = DedupCache(
+            writer=writer,
+            max_entries=settings.llm_cache_size,
+            near_duplicates=settings.llm_cache_near_duplicates,
+            max_distance=settings.llm_cache_max_distance,
+        )
+        await dedup.load()
+    local = None
+    if settings.local_classifier_path:
+        from app.local_classifier import LocalClassifier
+
+        try:
+            local = LocalClassifier.load(
+                settings.local_classifier_path,
+                reject_below=settings.local_classifier_reject_below,
+                accept_above=settings.local_classifier_accept_above,
+            )
+            log.info("local classifier loaded from %s", settings.local_classifier_path)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("local classifier disabled, cannot load %s: %s", settings.local_classifier_path, e)
+    return Processor(
+        llm=llm,
+        writer=writer,
+        channels=channels,
+        dedup=dedup,
+        single_call=settings.llm_mode == "single_call",
+        rule_min_confidence=settings.rule_parser_min_confidence if settings.rule_parser_enabled else None,
+        batcher=(
+            ClassifyBatcher(llm, window_ms=settings.llm_batch_window_ms, max_batch=settings.llm_batch_max)
+            if settings.llm_batch_max > 1
+            else None
+        ),
+        local=local,
+        log_rejections=settings.log_rejections,
+    )
@@ -1,17 +1,31 @@
 from __future__ import annotations
 import logging
 from datetime import datetime, timezone
-from typing import Optional
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import AsyncSessionLocal
-from app.models import Channel, Signal, TradeSide
+from time import perf_counter
+from typing import TYPE_CHECKING, Optional
 from app.schemas import SignalFields, PersistedSignal
+from app.metrics import REGISTRY
 from app.regex_gate import looks_like_signal
+from app.rule_parser import parse_signal_rules
 from app.llm import LLMClient
+from app.channel_cache import ChannelCache
+from app.dedup import DedupCache
+from app.llm_batch import ClassifyBatcher
+from app.writer import SignalWriter
+
+if TYPE_CHECKING:  # numpy is only needed when the local classifier is enabled
+    from app.local_classifier import LocalClassifier
 
 log = logging.getLogger("sc.processor")
 
+# stage: dedup | gate | rules | local | classify | parse | persist (persist = in-memory hand-off to the writer)
+_STAGES = REGISTRY.histogram("sc_processor_stage_seconds", "Time spent per pipeline stage", labels=("stage",))
+_GATE = REGISTRY.counter("sc_regex_gate_total", "Regex gate decisions", labels=("result",))
+# path: dedup | rules | gate_llm | local | single_call | two_step; outcome: signal | not_signal | parse_failed
+_PATHS = REGISTRY.counter(
+    "sc_processor_messages_total", "Processed messages by decision path and outcome", labels=("path", "outcome")
+)
+
 
 class MessageEnvelope:
     """Container for Telegram message attributes we rely on."""
@@ -35,68 +49,194 @@ class MessageEnvelope:
         self.message_date = message_date.astimezone(timezone.utc)
         self.text = text or ""
 
+    def to_dict(self) -> dict:
+        return {
+            "channel_id": self.channel_id,
+            "channel_title": self.channel_title,
+            "channel_username": self.channel_username,
+            "message_id": self.message_id,
+            "message_date": self.message_date.isoformat(),
+            "text": self.text,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "MessageEnvelope":
+        return cls(
+            channel_id=int(d["channel_id"]),
+            channel_title=d.get("channel_title"),
+            channel_username=d.get("channel_username"),
+            message_id=int(d["message_id"]),
+            message_date=datetime.fromisoformat(d["message_date"]),
+            text=d.get("text") or "",
+        )
+
 
 class Processor:
-    """Inline pipeline (no queue): heuristics -> LLM classify -> LLM parse -> persist."""
+    """Per-message pipeline: dedup -> heuristics -> rule parse | LLM classify + parse (or one combined call) -> persist.
+
+    Runs inside IngestQueue workers, so several messages are processed concurrently.
+    """
 
-    def __init__(self, llm: LLMClient) -> None:
+    def __init__(
+        self,
+        llm: LLMClient,
+        writer: SignalWriter,
+        channels: ChannelCache,
+        dedup: Optional[DedupCache] = None,
+        single_call: bool = False,
+        rule_min_confidence: Optional[float] = None,
+        batcher: Optional[ClassifyBatcher] = None,
+        local: Optional["LocalClassifier"] = None,
+        log_rejections: bool = False,
+    ) -> None:
         self.llm = llm
+        self.writer = writer
+        self.channels = channels
+        self.dedup = dedup
+        # Classify+parse in one LLM call for messages the regex gate did not already accept
+        self.single_call = single_call
+        # Rule-parser results at or above this confidence skip the LLM (None disables the rule parser)
+        self.rule_min_confidence = rule_min_confidence
+        # Coalesces concurrent two-step classifications into packed requests
+        self.batcher = batcher
+        # On-box classifier for gate-rejected texts: confident scores skip the LLM classification
+        self.local = local
+        # Store LLM "not a signal" verdicts as training negatives for the local classifier
+        self.log_rejections = log_rejections
 
     async def process(self, env: MessageEnvelope) -> None:
         text = env.text.strip()
         if not text:
             return
 
-        likely = looks_like_signal(text)
-        is_sig = likely or await self.llm.is_signal(text)
-        if not is_sig:
-            log.debug("not a signal: channel=%s msg=%s", env.channel_id, env.message_id)
-            await self._ensure_channel(env, last_message_id=env.message_id)
+        # Reposted text: reuse the earlier LLM outcome, no network calls
+        t0 = perf_counter()
+        cached = self.dedup.lookup(text) if self.dedup else None
+        t1 = perf_counter()
+        _STAGES.observe(t1 - t0, "dedup")
+        if cached is not None:
+            log.debug("dedup hit: channel=%s msg=%s signal=%s", env.channel_id, env.message_id, cached.is_signal)
+            if cached.is_signal and cached.fields is not None:
+                self._count("dedup", "signal")
+                self._persist_signal(env, cached.fields)
+            else:
+                self._count("dedup", "not_signal")
+                self._ensure_channel(env, last_message_id=env.message_id)
+            _STAGES.observe(perf_counter() - t1, "persist")
             return
 
-        parsed = await self.llm.parse_signal(text)
+        likely = looks_like_signal(text)
+        t0 = perf_counter()
+        _STAGES.observe(t0 - t1, "gate")
+        _GATE.inc("pass" if likely else "reject")
+        if likely:
+            # Well-formed posts are parsed deterministically; only ambiguous ones go to the LLM
+            rule = parse_signal_rules(text) if self.rule_min_confidence is not None else None
+            t1 = perf_counter()
+            _STAGES.observe(t1 - t0, "rules")
+            if rule is not None and rule.confidence >= self.rule_min_confidence:
+                log.debug("rule parse (%.2f): channel=%s msg=%s", rule.confidence, env.channel_id, env.message_id)
+                self._count("rules", "signal")
+                self._persist_signal(env, rule.fields)
+                _STAGES.observe(perf_counter() - t1, "persist")
+                return
+            path = "gate_llm"
+            parsed = await self.llm.parse_signal(text)
+            _STAGES.observe(perf_counter() - t1, "parse")
+        else:
+            score = self.local.score(text) if self.local is not None else None
+            t1 = perf_counter()
+            if score is not None:
+                _STAGES.observe(t1 - t0, "local")
+            if score is not None and score < self.local.reject_below:
+                self._not_a_signal(env, text, "local")
+                return
+            if score is not None and score >= self.local.accept_above:
+                path = "local"
+                parsed = await self.llm.parse_signal(text)
+                _STAGES.observe(perf_counter() - t1, "parse")
+            elif self.single_call:
+                path = "single_call"
+                verdict = await self.llm.classify_and_parse(text)
+                _STAGES.observe(perf_counter() - t1, "classify")
+                if verdict is not None and not verdict.is_signal:
+                    self._not_a_signal(env, text, path)
+                    return
+                parsed = verdict.signal if verdict else None
+            else:
+                path = "two_step"
+                is_signal = await (self.batcher.is_signal(text) if self.batcher else self.llm.is_signal(text))
+                t0 = perf_counter()
+                _STAGES.observe(t0 - t1, "classify")
+                if not is_signal:
+                    self._not_a_signal(env, text, path)
+                    return
+                parsed = await self.llm.parse_signal(text)
+                _STAGES.observe(perf_counter() - t0, "parse")
+
+        t0 = perf_counter()
         if not parsed:
             log.debug("LLM failed to parse signal: channel=%s msg=%s", env.channel_id, env.message_id)
-            await self._ensure_channel(env, last_message_id=env.message_id)
-            return
+            self._count(path, "parse_failed")
+            self._ensure_channel(env, last_message_id=env.message_id)
+        else:
+            self._count(path, "signal")
+            self._remember(text, True, parsed)
+            self._persist_signal(env, parsed)
+        _STAGES.observe(perf_counter() - t0, "persist")
 
-        await self._persist_signal(env, parsed)
-
-    async def _ensure_channel(self, env: MessageEnvelope, last_message_id: Optional[int] = None) -> None:
-        async with AsyncSessionLocal() as session:
-            try:
-                existing = await session.get(Channel, env.channel_id)
-                if existing is None:
-                    ch = Channel(
-                        id=env.channel_id,
-                        title=env.channel_title,
-                        username=env.channel_username,
-                        last_message_id=last_message_id,
-                    )
-                    session.add(ch)
-                    await session.commit()
-                    return
+    @staticmethod
+    def stage_stats() -> dict:
+        """p50/p95/p99 per pipeline stage (seconds)."""
+        return {key[0]: _STAGES.summary(*key) for key, _ in _STAGES.items()}
+
+    def stats(self) -> dict:
+        """Messages per decision path/outcome and each path's share of all processed messages."""
+        by_path: dict[str, dict[str, int]] = {}
+        for (path, outcome), n in _PATHS.items():
+            by_path.setdefault(path, {})[outcome] = int(n)
+        total = sum(sum(v.values()) for v in by_path.values())
+        return {
+            "total": total,
+            "paths": by_path,
+            "hit_rates": {p: round(sum(v.values()) / total, 4) for p, v in by_path.items()} if total else {},
+            "llm_bypassed": sum(sum(by_path.get(p, {}).values()) for p in ("dedup", "rules"))
+            + by_path.get("local", {}).get("not_signal", 0),
+        }
 
-                updated = False
-                if env.channel_title and existing.title != env.channel_title:
-                    existing.title = env.channel_title
-                    updated = True
-                if env.channel_username and existing.username != env.channel_username:
-                    existing.username = env.channel_username
-                    updated = True
-                if last_message_id and (
-                    not existing.last_message_id or last_message_id > existing.last_message_id
-                ):
-                    existing.last_message_id = last_message_id
-                    updated = True
-                if updated:
-                    session.add(existing)
-                await session.commit()
-            except Exception:
-                await session.rollback()
-                raise
-
-    async def _persist_signal(self, env: MessageEnvelope, parsed: SignalFields) -> None:
+    @staticmethod
+    def _count(path: str, outcome: str) -> None:
+        _PATHS.inc(path, outcome)
+
+    def _not_a_signal(self, env: MessageEnvelope, text: str, path: str) -> None:
+        t0 = perf_counter()
+        self._count(path, "not_signal")
+        log.debug("not a signal (%s): channel=%s msg=%s", path, env.channel_id, env.message_id)
+        if path != "local":
+            # Only LLM verdicts are cached and kept as training negatives; the local model may be retrained
+            self._remember(text, False, None)
+            if self.log_rejections:
+                self.writer.add_rejection({
+                    "channel_id": env.channel_id,
+                    "message_id": env.message_id,
+                    "message_date": env.message_date,
+                    "text": env.text,
+                    "source": path,
+                })
+        self._ensure_channel(env, last_message_id=env.message_id)
+        _STAGES.observe(perf_counter() - t0, "persist")
+
+    def _remember(self, text: str, is_signal: bool, fields: Optional[SignalFields]) -> None:
+        if self.dedup is not None:
+            self.dedup.store(text, is_signal, fields)
+
+    def _ensure_channel(self, env: MessageEnvelope, last_message_id: Optional[int] = None) -> None:
+        # Usually a pure in-memory update; the cache only queues a write for new/renamed channels.
+        upd = self.channels.observe(env.channel_id, env.channel_title, env.channel_username, last_message_id)
+        if upd is not None:
+            self.writer.add_channel(upd)
+
+    def _persist_signal(self, env: MessageEnvelope, parsed: SignalFields) -> None:
         record = PersistedSignal(
             channel_id=env.channel_id,
             message_id=env.message_id,
@@ -108,41 +248,8 @@ class Processor:
             take_profits=parsed.take_profits,
             original_text=env.text,
         )
-
-        async with AsyncSessionLocal() as session:
-            try:
-                await self._ensure_channel(env, last_message_id=env.message_id)
-                await self._insert_signal(session, record)
-                await session.commit()
-                log.info(
-                    "stored signal: ch=%s msg=%s %s %s tp=%s sl=%s lev=%s",
-                    record.channel_id,
-                    record.message_id,
-                    record.symbol,
-                    record.side,
-                    record.take_profits,
-                    record.stop_loss,
-                    record.leverage,
-                )
-            except IntegrityError:
-                await session.rollback()
-                # Duplicate message in same channel; ignore.
-            except Exception:
-                await session.rollback()
-                raise
-
-    @staticmethod
-    async def _insert_signal(session: AsyncSession, rec: PersistedSignal) -> None:
-        sig = Signal(
-            channel_id=rec.channel_id,
-            message_id=rec.message_id,
-            message_date=rec.message_date,
-            symbol=rec.symbol,
-            side=TradeSide(rec.side),
-            leverage=rec.leverage,
-            stop_loss=rec.stop_loss,
-            take_profits=rec.take_profits,
-            original_text=rec.original_text,
+        # Buffered; the writer flushes batches in one transaction and skips duplicates.
+        upd = self.channels.observe(
+            env.channel_id, env.channel_title, env.channel_username, env.message_id, write_now=True
         )
-        session.add(sig)
-        await session.flush()
+        self.writer.add_signal(record, upd)
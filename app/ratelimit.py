@@ -0,0 +1,218 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Optional
+
+from app.metrics import REGISTRY
+
+log = logging.getLogger("sc.ratelimit")
+
+# Lanes: lower value is served first. Parses of likely signals go ahead of speculative classifications.
+PRIORITY_PARSE = 0
+PRIORITY_CLASSIFY = 1
+
+_LANES = {PRIORITY_PARSE: "parse", PRIORITY_CLASSIFY: "classify"}
+
+_WAIT = REGISTRY.histogram("sc_llm_limiter_wait_seconds", "Time spent waiting for an LLM slot", labels=("lane",))
+_THROTTLED = REGISTRY.counter("sc_llm_throttled_total", "LLM calls rejected with 429 by the provider")
+_LIMIT = REGISTRY.gauge("sc_llm_concurrency_limit", "Current adaptive LLM concurrency cap")
+_IN_FLIGHT = REGISTRY.gauge("sc_llm_in_flight", "LLM calls currently in flight")
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute / 60` per second; `per_minute <= 0` disables it."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None) -> None:
+        self.rate = max(0.0, per_minute) / 60.0
+        self.capacity = capacity if capacity is not None else max(0.0, per_minute)
+        self.tokens = self.capacity
+        self._ts = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 when available now)."""
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # an oversized request waits for a full bucket, not forever
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.enabled:
+            self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Refund (positive) or charge (negative) the difference between estimated and actual usage."""
+        if self.enabled:
+            self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: int, seq: int, tokens: int, future: asyncio.Future) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Lease:
+    """One granted LLM slot; hand it back with `AdaptiveLimiter.release`."""
+    __slots__ = ("tokens", "started_at", "released")
+
+    def __init__(self, tokens: int) -> None:
+        self.tokens = tokens
+        self.started_at = time.monotonic()
+        self.released = False
+
+
+class AdaptiveLimiter:
+    """
+    Admission control for LLM calls, shared by every LLMClient method.
+
+    - requests/min and tokens/min token buckets (0 disables a budget);
+    - AIMD concurrency cap: +1 per window of successful calls under `target_latency`,
+      halved on a 429 or a slow call (at most once per `decrease_cooldown`);
+    - strict-priority lanes, FIFO within a lane; a waiting parse is never overtaken by a classification.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        initial_concurrency: Optional[int] = None,
+        target_latency: float = 10.0,
+        decrease_cooldown: float = 5.0,
+    ) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        start = initial_concurrency if initial_concurrency is not None else self.max_concurrency // 2
+        self.limit = float(min(self.max_concurrency, max(self.min_concurrency, start)))
+        self.target_latency = target_latency
+        self.decrease_cooldown = decrease_cooldown
+
+        self.in_flight = 0
+        self.throttled = 0
+        self.slow = 0
+        self._heap: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        _LIMIT.set_function(lambda: int(self.limit))
+        _IN_FLIGHT.set_function(lambda: self.in_flight)
+
+    async def acquire(self, priority: int = PRIORITY_CLASSIFY, tokens: int = 0) -> Lease:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), tokens, loop.create_future())
+        heapq.heappush(self._heap, waiter)
+        self._dispatch()
+        try:
+            lease = await waiter.future
+        except asyncio.CancelledError:
+            # Granted and cancelled in the same tick: give the slot back
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(waiter.future.result(), ok=False)
+            raise
+        _WAIT.observe(time.monotonic() - waiter.enqueued_at, _LANES.get(priority, str(priority)))
+        return lease
+
+    def release(self, lease: Lease, ok: bool = True, throttled: bool = False, used_tokens: Optional[int] = None) -> None:
+        if lease.released:
+            return
+        lease.released = True
+        self.in_flight -= 1
+        if used_tokens is not None:
+            self.tokens.adjust(lease.tokens - used_tokens)
+
+        now = time.monotonic()
+        latency = now - lease.started_at
+        if throttled:
+            self.throttled += 1
+            _THROTTLED.inc()
+            self._decrease(now, "429")
+        elif ok and latency > self.target_latency:
+            self.slow += 1
+            self._decrease(now, f"latency {latency:.1f}s")
+        elif ok and self.limit < self.max_concurrency:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / max(1.0, self.limit))
+        self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """Stop admitting calls for `seconds` (e.g. the provider's Retry-After)."""
+        if seconds > 0:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._dispatch()
+
+    def stats(self) -> dict:
+        lanes: dict[str, int] = {}
+        for w in self._heap:
+            if not w.future.done():
+                name = _LANES.get(w.priority, str(w.priority))
+                lanes[name] = lanes.get(name, 0) + 1
+        return {
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": lanes,
+            "throttled": self.throttled,
+            "slow": self.slow,
+            "wait_seconds": {lane: _WAIT.summary(lane) for lane in _LANES.values()},
+        }
+
+    def _decrease(self, now: float, reason: str) -> None:
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self.limit = max(float(self.min_concurrency), self.limit / 2)
+        log.info("LLM concurrency %s -> %s (%s)", int(old), int(self.limit), reason)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._heap:
+            head = self._heap[0]
+            if head.future.done():  # cancelled while waiting
+                heapq.heappop(self._heap)
+                continue
+            if self.in_flight >= int(self.limit):
+                return  # a release will dispatch again
+
+            now = time.monotonic()
+            delay = max(
+                self._paused_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(head.tokens, now),
+            )
+            if delay > 0:
+                # Head-of-line waits so lower lanes can't starve it of budget
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            heapq.heappop(self._heap)
+            self.requests.take(1)
+            self.tokens.take(head.tokens)
+            self.in_flight += 1
+            head.future.set_result(Lease(head.tokens))
@@ -1,39 +1,87 @@
 from __future__ import annotations
 import re
+from typing import Iterable
 
 # Quick heuristic to reduce LLM calls while still using LLM for final decision/parse.
 
 # Symbols like BTC, BTCUSDT, BTC-PERP
-_SYMBOL = r"[A-Z]{2,15}(?:USDT|USD|PERP)?"
+SYMBOL_PATTERN = r"[A-Z]{2,15}(?:USDT|USD|PERP)?"
 
 # Sides (EN/RU) and simple verb variants
 # long/short/buy/sell, лонг/шорт, покупка/купить/покупаем, продажа/продаем/продать
-_SIDE = r"\b(?:long|short|buy|sell|лонг|шорт|покуп(?:ка|аем|ать)|купить|продажа|прода(?:ем|ть))\b"
+SIDE_PATTERN = r"\b(?:long|short|buy|sell|лонг|шорт|покуп(?:ка|аем|ать)|купить|продажа|прода(?:ем|ть))\b"
 
 # Take profit keywords (EN/RU): tp, t/p, take profit, тейк, тейк профит, цель/цели, target/targets
-_TP = r"\b(?:tp|t/p|take\s*profit|тейк(?:\s*профит)?|цели?|targets?)\b"
+TP_PATTERN = r"\b(?:tp|t/p|take\s*profit|тейк(?:\s*профит)?|цели?|targets?)\b"
 
 # Stop loss keywords (EN/RU): sl, s/l, stop loss, стоп, стоп лосс, стоплосс
-_SL = r"\b(?:sl|s/l|stop\s*loss|стоп(?:\s*лосс)?|стоплосс)\b"
+SL_PATTERN = r"\b(?:sl|s/l|stop\s*loss|стоп(?:\s*лосс)?|стоплосс)\b"
 
 # Entry keywords (EN/RU): entry point, enter, вход, заходим
-_ENTRY = r"\b(?:entry\s*point|enter|вход|заходим)\b"
+ENTRY_PATTERN = r"\b(?:entry\s*point|enter|вход|заходим)\b"
 
 # Leverage forms:
 # - numeric with x: 10x, 25 x, x10
 # - words + number: leverage 10, lev 10, плечо 10, кредитное плечо 10
-_LEVERAGE = r"\b(?:(?:\d{1,3}\s*x|x\s*\d{1,3})|(?:lev(?:erage)?|плечо|кредитное\s*плечо)\s*:?\s*\d{1,3})\b"
+LEVERAGE_PATTERN = r"\b(?:(?:\d{1,3}\s*x|x\s*\d{1,3})|(?:lev(?:erage)?|плечо|кредитное\s*плечо)\s*:?\s*\d{1,3})\b"
 
 # Price numbers (kept simple)
-_PRICE = r"\d{1,5}(?:\.\d+)?"
+PRICE_PATTERN = r"\d{1,5}(?:\.\d+)?"
 
-_SYMBOL_RE = re.compile(_SYMBOL, re.I | re.U)
-_SIDE_RE = re.compile(_SIDE, re.I | re.U)
-_TP_RE = re.compile(_TP, re.I | re.U)
-_SL_RE = re.compile(_SL, re.I | re.U)
-_ENTRY_RE = re.compile(_ENTRY, re.I | re.U)
-_LEVERAGE_RE = re.compile(_LEVERAGE, re.I | re.U)
-_PRICE_RE = re.compile(_PRICE)
+_PRICE_RE = re.compile(PRICE_PATTERN)
+
+# Single-pass scanner: every keyword category is one named group of a single alternation, so the
+# text is walked once and scanning stops as soon as the threshold is reached. The categories never
+# overlap lexically (all are word-bounded and share no words), so a consumed match can't hide another
+# category. The symbol check only needs two letters in a row: any SYMBOL_PATTERN match starts with
+# them.
+_SYMBOL_START_RE = re.compile(r"[A-Z]{2}", re.I | re.U)
+# Every keyword starts with one of these characters; the lookahead lets the engine skip all other
+# positions before trying the five alternatives. Keep it in sync when adding keywords.
+# (Each keyword pattern starts with `\b`; it is hoisted in front of the alternation.)
+_KEYWORD_FIRST = r"[lsbtexлшпкцтсвз\d]"
+_KEYWORDS_RE = re.compile(
+    rf"(?={_KEYWORD_FIRST})\b(?:"
+    rf"(?P<side>{SIDE_PATTERN[2:]})|(?P<tp>{TP_PATTERN[2:]})|(?P<sl>{SL_PATTERN[2:]})"
+    rf"|(?P<entry>{ENTRY_PATTERN[2:]})|(?P<leverage>{LEVERAGE_PATTERN[2:]}))",
+    re.I | re.U,
+)
+# Prices stay a separate scan: leverage ("10x") would otherwise consume digits that count as prices.
+_MIN_PRICES = 3
+_THRESHOLD = 2
+
+
+def signal_hits(text: str, stop_at: int | None = _THRESHOLD) -> int:
+    """
+    Number of heuristic categories present in `text` (symbol, side, TP, SL, entry, leverage,
+    price density). Counting stops once `stop_at` is reached; pass None for the full score.
+    """
+    if not text:
+        return 0
+    limit = stop_at if stop_at is not None else 7
+
+    hits = 1 if _SYMBOL_START_RE.search(text) else 0
+    if hits >= limit:
+        return hits
+    seen: set[str] = set()
+    for m in _KEYWORDS_RE.finditer(text):
+        kind = m.lastgroup
+        if kind not in seen:
+            seen.add(kind)
+            hits += 1
+            if hits >= limit:
+                return hits
+            if len(seen) == 5:
+                break
+
+    # Price lines often accompany TP/SL tables; count if there are several prices
+    prices = 0
+    for _ in _PRICE_RE.finditer(text):
+        prices += 1
+        if prices >= _MIN_PRICES:
+            hits += 1
+            break
+    return hits
 
 
 def looks_like_signal(text: str) -> bool:
@@ -42,25 +90,16 @@ def looks_like_signal(text: str) -> bool:
     - hits: symbol, side, TP, SL, entry keywords, leverage, price density
     - require at least 2 signals to pass (conservative)
     """
-    if not text:
-        return False
-
-    hits = 0
-    if _SYMBOL_RE.search(text):
-        hits += 1
-    if _SIDE_RE.search(text):
-        hits += 1
-    if _TP_RE.search(text):
-        hits += 1
-    if _SL_RE.search(text):
-        hits += 1
-    if _ENTRY_RE.search(text):
-        hits += 1
-    if _LEVERAGE_RE.search(text):
-        hits += 1
+    return signal_hits(text) >= _THRESHOLD  # conservative gate
+
+
+def looks_like_signal_batch(texts: Iterable[str]) -> list[bool]:
+    """`looks_like_signal` over many texts (backfills, replays) without per-call overhead."""
+    hits = signal_hits
+    return [hits(t) >= _THRESHOLD for t in texts]
 
-    # Price lines often accompany TP/SL tables; count if there are several prices
-    if len(_PRICE_RE.findall(text)) >= 3:
-        hits += 1
 
-    return hits >= 2  # conservative gate
+def signal_hits_batch(texts: Iterable[str]) -> list[int]:
+    """Full (non-short-circuited) heuristic score for each text."""
+    hits = signal_hits
+    return [hits(t, None) for t in texts]
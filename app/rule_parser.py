@@ -0,0 +1,155 @@
+from __future__ import annotations
+import re
+from typing import Optional
+
+from pydantic import ValidationError
+
+from app.regex_gate import ENTRY_PATTERN, SIDE_PATTERN, SL_PATTERN
+from app.schemas import SignalFields
+
+# Deterministic extractor for well-formed posts, e.g.
+#   "BTC/USDT LONG x10  TP: 1,2,3  SL: 0.9"
+#   "#ETH SHORT\nEntry: 3500\nTargets:\n1) 3400\n2) 3300\nStop loss 3600\nLeverage 20x"
+# High-confidence results skip the LLM; anything ambiguous returns a low score and falls back to it.
+
+_QUOTES = r"USDT|USDC|BUSD|USD|PERP"
+# BTC/USDT, BTC-USDT, BTCUSDT, #BTC, $BTC
+_PAIR_RE = re.compile(rf"\b([A-Z][A-Z0-9]{{1,14}}?)\s*[/\-_]?\s*(?:{_QUOTES})\b")
+_SLASH_PAIR_RE = re.compile(rf"\b([A-Z][A-Z0-9]{{1,14}})\s*/\s*(?:{_QUOTES})\b", re.I)
+_TAG_RE = re.compile(r"[#$]([A-Za-z][A-Za-z0-9]{1,14})\b")
+_BARE_RE = re.compile(r"\b([A-Z][A-Z0-9]{1,9})\b")
+
+_NOT_SYMBOLS = {
+    "LONG", "SHORT", "BUY", "SELL", "TP", "SL", "ENTRY", "TARGET", "TARGETS", "STOP", "LOSS", "TAKE", "PROFIT",
+    "LEVERAGE", "LEV", "CROSS", "ISOLATED", "USDT", "USD", "USDC", "BUSD", "PERP", "SPOT", "FUTURES", "SIGNAL",
+    "NEW", "VIP", "FREE", "NOW", "UPDATE", "ZONE", "BUYING", "SELLING", "AND", "OR", "THE", "DCA", "PNL", "ROI",
+    "ALERT", "NOTE", "RISK", "MARKET", "LIMIT", "ORDER", "HOLD", "AT", "IN", "ON", "TO", "IS", "OF", "FOR",
+    "PRICE", "TRADE", "MARGIN", "TF", "TIMEFRAME",
+}
+
+_LONG_WORDS = ("long", "buy", "лонг", "покуп", "купить")
+
+# Tokens, in priority order. TP labels may carry an index ("TP1", "TP 2:") which must not be read as a price.
+_TOKEN_RE = re.compile(
+    r"(?P<tp>\b(?:tp|t/p|take\s*profits?|targets?|цел[ьи]|тейк(?:\s*профит)?)(?![^\W\d_])"
+    r"(?:\s*\d{1,2}(?=\s*(?:[:)\-–=]|\.(?!\d))))?)"
+    rf"|(?P<sl>{SL_PATTERN}|\bstop\b)"
+    rf"|(?P<entry>{ENTRY_PATTERN}|\bentry\b|\bвход\b)"
+    r"|(?P<lev_kw>\b(?:lev(?:erage)?|плечо|кредитное\s*плечо)\b)"
+    r"|(?P<lev>\b(?:\d{1,3}\s*x|x\s*\d{1,3})\b)"
+    r"|(?P<label>(?m:^)\s*\d{1,2}\s*[).]\s)"
+    r"|(?P<num>(?<![\w.])\d+(?:\.\d+)?(?!\w|\.\d|\s*%))",
+    re.I | re.U,
+)
+_SIDE_RE = re.compile(SIDE_PATTERN, re.I | re.U)
+# "0,95" style decimal commas are ambiguous with "TP: 1,2,3" lists; we read commas as separators and lower confidence.
+_DECIMAL_COMMA_RE = re.compile(r"\b0,\d+\b")
+
+MIN_CONFIDENCE_DEFAULT = 0.85
+
+
+class RuleParse:
+    __slots__ = ("fields", "confidence")
+
+    def __init__(self, fields: SignalFields, confidence: float) -> None:
+        self.fields = fields
+        self.confidence = confidence
+
+    def __repr__(self) -> str:
+        return f"RuleParse({self.fields!r}, confidence={self.confidence:.2f})"
+
+
+def _symbol(text: str) -> tuple[Optional[str], float]:
+    strong = {m.group(1).upper() for m in _PAIR_RE.finditer(text)}
+    strong |= {m.group(1).upper() for m in _SLASH_PAIR_RE.finditer(text)}
+    strong |= {m.group(1).upper() for m in _TAG_RE.finditer(text)}
+    strong -= _NOT_SYMBOLS
+    if len(strong) == 1:
+        return strong.pop(), 0.35
+    if len(strong) > 1:
+        return None, 0.0  # several instruments in one post: let the LLM decide
+    bare = {m.group(1) for m in _BARE_RE.finditer(text)} - _NOT_SYMBOLS
+    bare = {b for b in bare if not b[0].isdigit()}
+    if len(bare) == 1:
+        return bare.pop(), 0.2
+    return None, 0.0
+
+
+def _side(text: str) -> Optional[str]:
+    sides = set()
+    for m in _SIDE_RE.finditer(text):
+        word = m.group(0).lower()
+        sides.add("long" if word.startswith(_LONG_WORDS) else "short")
+    return sides.pop() if len(sides) == 1 else None
+
+
+def _sections(text: str) -> tuple[list[float], list[float], Optional[int]]:
+    """Walk tokens; numbers are assigned to the most recent keyword section."""
+    tps: list[float] = []
+    sls: list[float] = []
+    leverage: Optional[int] = None
+    section: Optional[str] = None
+
+    for m in _TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind in ("tp", "sl", "entry", "lev_kw"):
+            section = kind
+        elif kind == "lev":
+            if leverage is None:
+                leverage = int(re.sub(r"\D", "", m.group(0)))
+        elif kind == "num":
+            value = float(m.group(0))
+            if section == "tp":
+                tps.append(value)
+            elif section == "sl":
+                sls.append(value)
+            elif section == "lev_kw":
+                if leverage is None and value.is_integer():
+                    leverage = int(value)
+                section = None
+        # "label" tokens (list indices like "1)") are skipped on purpose
+    return tps, sls, leverage
+
+
+def parse_signal_rules(text: str) -> Optional[RuleParse]:
+    """Rule-based parse with a confidence in [0, 1]; None when symbol or side can't be determined."""
+    if not text:
+        return None
+
+    symbol, confidence = _symbol(text)
+    side = _side(text)
+    if not symbol or not side:
+        return None
+    confidence += 0.3
+
+    tps, sls, leverage = _sections(text)
+    if tps:
+        confidence += 0.2
+    if sls:
+        confidence += 0.1
+    if leverage is not None:
+        confidence += 0.05
+
+    # Price sanity: stops on the losing side of every target, targets ordered in trade direction.
+    if tps and sls:
+        if side == "long" and not max(sls) < min(tps):
+            confidence -= 0.4
+        if side == "short" and not min(sls) > max(tps):
+            confidence -= 0.4
+    if len(tps) > 1:
+        ordered = tps == sorted(tps) if side == "long" else tps == sorted(tps, reverse=True)
+        confidence += 0.05 if ordered else -0.1
+    if _DECIMAL_COMMA_RE.search(text):
+        confidence -= 0.2
+
+    try:
+        fields = SignalFields(
+            symbol=symbol,
+            side=side,
+            leverage=leverage if leverage and 1 <= leverage <= 200 else None,
+            stop_loss=sls or None,
+            take_profits=tps or None,
+        )
+    except ValidationError:
+        return None
+    return RuleParse(fields, round(max(0.0, min(1.0, confidence)), 4))
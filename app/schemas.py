@@ -33,6 +33,22 @@ class SignalFields(BaseModel):
         return s
 
 
+class SignalVerdict(BaseModel):
+    """Single-call LLM output: classification and, for signals, the parsed fields."""
+    is_signal: bool = Field(..., description="True only if the message is a concrete trading signal to open a position")
+    signal: Optional[SignalFields] = Field(None, description="Parsed signal if is_signal is true, otherwise null")
+
+
+class BatchVerdictItem(BaseModel):
+    index: int = Field(..., description="Number of the message in the request, as given in square brackets")
+    is_signal: bool = Field(..., description="True only if the message is a concrete trading signal to open a position")
+
+
+class BatchVerdicts(BaseModel):
+    """Packed classification output: one verdict per numbered message."""
+    items: list[BatchVerdictItem] = Field(..., description="Exactly one verdict for every numbered message")
+
+
 class PersistedSignal(BaseModel):
     """Full record that will be stored to DB after merging metadata."""
     channel_id: int
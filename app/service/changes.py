@@ -0,0 +1,169 @@
+from __future__ import annotations
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Iterable, Mapping, NamedTuple, Optional
+
+from sqlalchemy import select, update, case, literal, tuple_
+
+from app.db import AsyncSessionLocal, ReadSessionLocal
+from app.events import BROKER, GENERATION
+from app.models import Signal, SignalEdition
+from app.metrics import REGISTRY
+from app.service import rollups
+
+log = logging.getLogger("sc.changes")
+
+_DB_COMMIT = REGISTRY.histogram("sc_db_commit_seconds", "Time spent in COMMIT", labels=("source",))
+
+
+class Edit(NamedTuple):
+    signal_id: int
+    text: str
+    edited_at: datetime
+
+
+class SignalRef(NamedTuple):
+    id: int
+    channel_id: int
+    message_id: int
+    original_text: str
+
+
+async def find_signals(channel_id: int, message_ids: Iterable[int]) -> list[SignalRef]:
+    """Resolve live (not yet deleted) signals for Telegram message ids of one channel."""
+    ids = list(message_ids)
+    if not ids:
+        return []
+    async with ReadSessionLocal() as session:
+        rows = (
+            await session.execute(
+                select(Signal.id, Signal.channel_id, Signal.message_id, Signal.original_text).where(
+                    Signal.channel_id == channel_id,
+                    Signal.message_id.in_(ids),
+                    Signal.deleted.is_(False),
+                )
+            )
+        ).all()
+    return [SignalRef(r.id, r.channel_id, r.message_id, r.original_text or "") for r in rows]
+
+
+def detect_edit(ref: SignalRef, new_text: str, edited_at: datetime | None) -> Edit | None:
+    """An edition is recorded only for a real edit whose text differs from the stored original."""
+    new_text = (new_text or "").strip()
+    if edited_at and new_text and new_text != ref.original_text.strip():
+        return Edit(ref.id, new_text, edited_at)
+    return None
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+async def record_changes(
+    now: datetime,
+    checked_ids: Iterable[int] = (),
+    deleted_ids: Iterable[int] = (),
+    edits: Iterable[Edit] = (),
+    next_check: Optional[Mapping[int, datetime]] = None,
+) -> None:
+    """
+    Apply deletions/editions in one transaction: a single UPDATE over every touched signal
+    (flags + last_checked_time, and `next_check` times from the checker's schedule), any new
+    edition rows and the per-channel deleted/edited rollups. Shared by the checker and live handlers.
+    """
+    deleted_ids = set(deleted_ids)
+    edits = list(edits)
+    edited_ids = {e.signal_id for e in edits}
+    ids = set(checked_ids) | deleted_ids | edited_ids
+    if not ids:
+        return
+
+    new_editions: list[Edit] = []
+    rows: dict[int, Any] = {}
+    deleted_now: list[int] = []
+    async with AsyncSessionLocal() as session:
+        if edits:
+            # Avoid duplicate edition rows with identical text and timestamp
+            stored = (
+                await session.execute(
+                    select(SignalEdition.signal_id, SignalEdition.text, SignalEdition.edited_at).where(
+                        tuple_(SignalEdition.signal_id, SignalEdition.text).in_(
+                            [(e.signal_id, e.text) for e in edits]
+                        )
+                    )
+                )
+            ).all()
+            # SQLite hands timestamps back naive; they were stored as UTC
+            existing = {(r.signal_id, r.text, _utc(r.edited_at)) for r in stored}
+            for e in edits:
+                if (e.signal_id, e.text, _utc(e.edited_at)) in existing:
+                    continue
+                session.add(SignalEdition(signal_id=e.signal_id, text=e.text, edited_at=e.edited_at))
+                new_editions.append(e)
+                log.info("recorded edition signal_id=%s at %s", e.signal_id, e.edited_at.isoformat())
+
+        if deleted_ids or edited_ids:
+            # Only false -> true transitions move the rollup counters
+            flags = (
+                await session.execute(
+                    select(
+                        Signal.channel_id, Signal.id, Signal.message_id, Signal.symbol, Signal.deleted, Signal.edited
+                    ).where(Signal.id.in_(deleted_ids | edited_ids))
+                )
+            ).all()
+            newly_deleted: dict[int, int] = {}
+            newly_edited: dict[int, int] = {}
+            for r in flags:
+                rows[r.id] = r
+                if r.id in deleted_ids and not r.deleted:
+                    newly_deleted[r.channel_id] = newly_deleted.get(r.channel_id, 0) + 1
+                    deleted_now.append(r.id)
+                if r.id in edited_ids and not r.edited:
+                    newly_edited[r.channel_id] = newly_edited.get(r.channel_id, 0) + 1
+            await rollups.apply_flags(session, newly_deleted, newly_edited)
+
+        values: dict = {"last_checked_time": now}
+        if deleted_ids:
+            values["deleted"] = case((Signal.id.in_(deleted_ids), True), else_=Signal.deleted)
+        if edited_ids:
+            values["edited"] = case((Signal.id.in_(edited_ids), True), else_=Signal.edited)
+        if next_check:
+            values["next_check_at"] = case(
+                {sid: literal(at, Signal.next_check_at.type) for sid, at in next_check.items()},
+                value=Signal.id,
+                else_=Signal.next_check_at,
+            )
+        await session.execute(update(Signal).where(Signal.id.in_(ids)).values(**values))
+        t0 = time.perf_counter()
+        await session.commit()
+        _DB_COMMIT.observe(time.perf_counter() - t0, "changes")
+    if deleted_ids or edits:
+        GENERATION.bump()
+    _publish(rows, new_editions, deleted_now)
+
+    for sid in deleted_ids:
+        log.info("marked deleted signal_id=%s", sid)
+
+
+def _publish(rows: dict[int, Any], editions: list[Edit], deleted_ids: list[int]) -> None:
+    """Push committed editions and first-time deletions to live stream subscribers."""
+    for e in editions:
+        r = rows.get(e.signal_id)
+        if r is not None:
+            BROKER.publish("edition", r.channel_id, r.symbol, {
+                "signal_id": r.id,
+                "channel_id": r.channel_id,
+                "message_id": r.message_id,
+                "symbol": r.symbol,
+                "text": e.text,
+                "edited_at": e.edited_at.isoformat(),
+            })
+    for sid in deleted_ids:
+        r = rows[sid]
+        BROKER.publish("deletion", r.channel_id, r.symbol, {
+            "signal_id": r.id,
+            "channel_id": r.channel_id,
+            "message_id": r.message_id,
+            "symbol": r.symbol,
+        })
@@ -1,26 +1,25 @@
 from __future__ import annotations
+import base64
 from datetime import datetime
-from sqlalchemy import select, func, case, Float, literal
+from typing import Optional
+from sqlalchemy import select, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import Channel, Signal, TradeSide, SignalEdition
+from app.models import Channel, ChannelStat, ChannelWeekStat, Signal, SymbolStat, SymbolWeekStat
 
 
 async def list_channels_with_counts(session: AsyncSession) -> list[dict]:
-    deleted_case = case((Signal.deleted.is_(True), 1), else_=0)
-    edited_case = case((Signal.edited.is_(True), 1), else_=0)
-
+    total = func.coalesce(ChannelStat.total, 0)
     q = (
         select(
             Channel.id,
             Channel.title,
             Channel.username,
-            func.count(Signal.id).label("total"),
-            func.sum(deleted_case).label("deleted"),
-            func.sum(edited_case).label("edited"),
+            total.label("total"),
+            ChannelStat.deleted,
+            ChannelStat.edited,
         )
-        .join(Signal, Signal.channel_id == Channel.id, isouter=True)
-        .group_by(Channel.id)
-        .order_by(func.count(Signal.id).desc())
+        .join(ChannelStat, ChannelStat.channel_id == Channel.id, isouter=True)
+        .order_by(total.desc())
     )
     rows = (await session.execute(q)).all()
     return [
@@ -37,26 +36,56 @@ async def list_channels_with_counts(session: AsyncSession) -> list[dict]:
 
 
 async def list_symbols_with_counts(session: AsyncSession) -> list[dict]:
-    q = (
-        select(
-            Signal.symbol,
-            func.count(Signal.id).label("total")
-        )
-        .group_by(Signal.symbol)
-        .order_by(func.count(Signal.id).desc())
-    )
+    q = select(SymbolStat.symbol, SymbolStat.total).order_by(SymbolStat.total.desc())
     rows = (await session.execute(q)).all()
     return [{"symbol": r.symbol, "total": int(r.total or 0)} for r in rows]
 
 
-async def get_signals_by_channel(session: AsyncSession, channel_id: int, limit: int = 100, offset: int = 0) -> list[Signal]:
-    q = (
-        select(Signal)
-        .where(Signal.channel_id == channel_id)
-        .order_by(Signal.message_date.desc())
-        .limit(limit)
-        .offset(offset)
-    )
+# Listings are keyset-paginated on (message_date, id), newest first. The cursor is the last row's
+# key, base64url-encoded so clients treat it as opaque; each page is one range scan on the
+# (channel_id|symbol, message_date, id) index however deep it is.
+Cursor = tuple[datetime, int]
+
+
+def encode_cursor(message_date: datetime, signal_id: int) -> str:
+    raw = f"{message_date.isoformat()}|{signal_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of `encode_cursor`; raises ValueError on anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_s, id_s = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date_s), int(id_s)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+
+def next_cursor(rows: list[Signal], limit: int) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this page was the last one."""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.message_date, last.id)
+
+
+def _page(q, limit: int, offset: int, cursor: Optional[Cursor]):
+    q = q.order_by(Signal.message_date.desc(), Signal.id.desc()).limit(limit)
+    if cursor is not None:
+        return q.where(tuple_(Signal.message_date, Signal.id) < tuple_(*cursor))
+    # Legacy offset paging; still scans and discards `offset` rows
+    return q.offset(offset) if offset else q
+
+
+async def get_signals_by_channel(
+    session: AsyncSession,
+    channel_id: int,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[Cursor] = None,
+) -> list[Signal]:
+    q = _page(select(Signal).where(Signal.channel_id == channel_id), limit, offset, cursor)
     return list((await session.execute(q)).scalars().all())
 
 
@@ -64,153 +93,88 @@ async def get_signals_by_symbol(
     session: AsyncSession,
     symbol: str,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[Cursor] = None,
 ):
     """
     Return signals for a symbol joined with Channel to avoid N+1.
     """
-    q = (
+    q = _page(
         select(Signal, Channel)
         .join(Channel, Signal.channel_id == Channel.id)
-        .where(Signal.symbol == symbol.upper())
-        .order_by(Signal.message_date.desc())
-        .limit(limit)
-        .offset(offset)
+        .where(Signal.symbol == symbol.upper()),
+        limit,
+        offset,
+        cursor,
     )
     return list((await session.execute(q)).all())
 
 
-async def stats_by_channel(session: AsyncSession) -> list[dict]:
-    long_case = case((Signal.side == TradeSide.long, 1), else_=0)
-    short_case = case((Signal.side == TradeSide.short, 1), else_=0)
-    deleted_case = case((Signal.deleted.is_(True), 1), else_=0)
-    edited_case = case((Signal.edited.is_(True), 1), else_=0)
+# Stats read the rollup tables (see app/service/rollups.py), so they cost O(channels + symbols)
+# rather than a scan of `signals`. Mean per week = signals / calendar weeks that had any.
 
-    # average per week (calendar weeks) per channel using SQLite strftime('%Y-%W')
-    weekly_counts = (
-        select(
-            Signal.channel_id.label("channel_id"),
-            func.strftime("%Y-%W", Signal.message_date).label("wk"),
-            func.count(Signal.id).label("cnt"),
-        )
-        .group_by(Signal.channel_id, "wk")
-    ).subquery("wk_ch")
+def _weeks(model, key):
+    return (
+        select(getattr(model, key).label("key"), func.count().label("weeks"))
+        .where(model.total > 0)
+        .group_by(getattr(model, key))
+    ).subquery()
 
-    avg_weekly = (
-        select(
-            weekly_counts.c.channel_id,
-            func.avg(weekly_counts.c.cnt).label("avg_per_week"),
-        )
-        .group_by(weekly_counts.c.channel_id)
-    ).subquery("avg_wk_ch")
 
+def _derived(st: ChannelStat | SymbolStat | None, weeks: int | None) -> dict:
+    total = st.total if st else 0
+    if not total:
+        return {"long_total_ratio": None, "mean_leverage": None, "mean_per_day": None, "mean_per_week": None}
+    per_day, _ = _per_day_week(total, st.first_date, st.last_date)
+    return {
+        "long_total_ratio": st.long_count / total,
+        "mean_leverage": (float(st.leverage_sum) / st.leverage_count) if st.leverage_count else None,
+        "mean_per_day": per_day,
+        "mean_per_week": round(total / weeks, 6) if weeks else None,
+    }
+
+
+async def stats_by_channel(session: AsyncSession) -> list[dict]:
+    weeks = _weeks(ChannelWeekStat, "channel_id")
     q = (
-        select(
-            Channel.id.label("channel_id"),
-            Channel.title,
-            Channel.username,
-            func.count(Signal.id).label("total"),
-            func.sum(long_case).label("long_count"),
-            func.sum(short_case).label("short_count"),
-            func.avg(Signal.leverage.cast(Float)).label("mean_leverage"),
-            func.min(Signal.message_date).label("first_dt"),
-            func.max(Signal.message_date).label("last_dt"),
-            avg_weekly.c.avg_per_week,
-            func.sum(deleted_case).label("deleted"),
-            func.sum(edited_case).label("edited"),
-        )
-        .join(Signal, Signal.channel_id == Channel.id, isouter=True)
-        .join(avg_weekly, avg_weekly.c.channel_id == Channel.id, isouter=True)
-        .group_by(Channel.id)
+        select(Channel.id.label("channel_id"), Channel.title, Channel.username, ChannelStat, weeks.c.weeks)
+        .join(ChannelStat, ChannelStat.channel_id == Channel.id, isouter=True)
+        .join(weeks, weeks.c.key == Channel.id, isouter=True)
     )
-
     rows = (await session.execute(q)).all()
 
     out: list[dict] = []
     for r in rows:
-        total = int(r.total or 0)
-        long_count = int(r.long_count or 0)
-        short_count = int(r.short_count or 0)
-        long_total_ratio = (long_count / total) if total else None
-
-        per_day, _ = _per_day_week(total, r.first_dt, r.last_dt)
-        per_week = float(r.avg_per_week) if r.avg_per_week is not None else None
-
+        st: ChannelStat | None = r.ChannelStat
+        total = st.total if st else 0
         out.append({
             "channel_id": r.channel_id,
             "title": r.title,
             "username": r.username,
             "total": total,
-            "long_count": long_count,
-            "short_count": short_count,
-            "long_total_ratio": long_total_ratio,
-            "mean_leverage": float(r.mean_leverage) if r.mean_leverage is not None else None,
-            "mean_per_day": per_day,
-            "mean_per_week": round(per_week, 6) if per_week is not None else None,
-            "deleted": int(r.deleted or 0),
-            "edited": int(r.edited or 0),
+            "long_count": st.long_count if st else 0,
+            "short_count": st.short_count if st else 0,
+            **_derived(st, r.weeks),
+            "deleted": st.deleted if st else 0,
+            "edited": st.edited if st else 0,
         })
     return out
 
 
 async def stats_by_symbol(session: AsyncSession) -> list[dict]:
-    long_case = case((Signal.side == TradeSide.long, 1), else_=0)
-    short_case = case((Signal.side == TradeSide.short, 1), else_=0)
-
-    # average per week per symbol
-    weekly_counts = (
-        select(
-            Signal.symbol.label("symbol"),
-            func.strftime("%Y-%W", Signal.message_date).label("wk"),
-            func.count(Signal.id).label("cnt"),
-        )
-        .group_by(Signal.symbol, "wk")
-    ).subquery("wk_sym")
-
-    avg_weekly = (
-        select(
-            weekly_counts.c.symbol,
-            func.avg(weekly_counts.c.cnt).label("avg_per_week"),
-        )
-        .group_by(weekly_counts.c.symbol)
-    ).subquery("avg_wk_sym")
-
-    q = (
-        select(
-            Signal.symbol,
-            func.count(Signal.id).label("total"),
-            func.sum(long_case).label("long_count"),
-            func.sum(short_case).label("short_count"),
-            func.avg(Signal.leverage.cast(Float)).label("mean_leverage"),
-            func.min(Signal.message_date).label("first_dt"),
-            func.max(Signal.message_date).label("last_dt"),
-            avg_weekly.c.avg_per_week,
-        )
-        .join(avg_weekly, avg_weekly.c.symbol == Signal.symbol, isouter=True)
-        .group_by(Signal.symbol)
-    )
-
+    weeks = _weeks(SymbolWeekStat, "symbol")
+    q = select(SymbolStat, weeks.c.weeks).join(weeks, weeks.c.key == SymbolStat.symbol, isouter=True)
     rows = (await session.execute(q)).all()
 
     out: list[dict] = []
     for r in rows:
-        total = int(r.total or 0)
-        long_count = int(r.long_count or 0)
-        short_count = int(r.short_count or 0)
-        long_total_ratio = (long_count / total) if total else None
-
-        per_day, _ = _per_day_week(total, r.first_dt, r.last_dt)
-        per_week = float(r.avg_per_week) if r.avg_per_week is not None else None
-
+        st: SymbolStat = r.SymbolStat
         out.append({
-            "symbol": r.symbol,
-            "total": total,
-            "long_count": long_count,
-            "short_count": short_count,
-            "long_total_ratio": long_total_ratio,
-            "mean_leverage": float(r.mean_leverage) if r.mean_leverage is not None else None,
-            "mean_per_day": per_day,
-            "mean_per_week": round(per_week, 6) if per_week is not None else None,
+            "symbol": st.symbol,
+            "total": st.total,
+            "long_count": st.long_count,
+            "short_count": st.short_count,
+            **_derived(st, r.weeks),
         })
     return out
 
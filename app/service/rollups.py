@@ -0,0 +1,267 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import Date, bindparam, case, delete, func, insert, or_, select, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import AsyncSessionLocal, dialect_insert
+from app.models import ChannelStat, ChannelWeekStat, Signal, SymbolStat, SymbolWeekStat, TradeSide
+
+log = logging.getLogger("sc.rollups")
+
+# Incremental maintenance of the stats rollups. Every function here runs inside the caller's
+# transaction, so a rollup change commits or rolls back together with the signal change behind it.
+
+
+def week_start(dt: datetime) -> date:
+    """Monday of the ISO week containing `dt` (as stored, no timezone conversion)."""
+    d = dt.date()
+    return d - timedelta(days=d.weekday())
+
+
+class week_start_sql(FunctionElement):
+    """SQL counterpart of `week_start`: Monday of the week of a timestamp column, as a date."""
+    type = Date()
+    name = "week_start"
+    inherit_cache = True
+
+
+@compiles(week_start_sql)
+def _week_start_sqlite(element, compiler, **kw):
+    # SQLite: move to the Sunday ending the week, then back to its Monday
+    return "date(%s, 'weekday 0', '-6 days')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(week_start_sql, "postgresql")
+def _week_start_postgresql(element, compiler, **kw):
+    # ISO weeks start on Monday; bucket in UTC whatever the session time zone
+    return "CAST(date_trunc('week', %s AT TIME ZONE 'UTC') AS DATE)" % compiler.process(element.clauses, **kw)
+
+
+class _Agg:
+    __slots__ = ("total", "long_count", "short_count", "leverage_sum", "leverage_count", "first_date", "last_date",
+                 "deleted", "edited")
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.long_count = 0
+        self.short_count = 0
+        self.leverage_sum = 0.0
+        self.leverage_count = 0
+        self.first_date: Optional[datetime] = None
+        self.last_date: Optional[datetime] = None
+        self.deleted = 0
+        self.edited = 0
+
+    def add(self, s) -> None:
+        self.total += 1
+        side = getattr(s.side, "value", s.side)
+        if side == TradeSide.long.value:
+            self.long_count += 1
+        elif side == TradeSide.short.value:
+            self.short_count += 1
+        if s.leverage is not None:
+            self.leverage_sum += float(s.leverage)
+            self.leverage_count += 1
+        if self.first_date is None or s.message_date < self.first_date:
+            self.first_date = s.message_date
+        if self.last_date is None or s.message_date > self.last_date:
+            self.last_date = s.message_date
+        self.deleted += int(bool(getattr(s, "deleted", False)))
+        self.edited += int(bool(getattr(s, "edited", False)))
+
+    def row(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+def _aggregate(signals: Iterable) -> tuple[dict, dict, dict, dict]:
+    """Group signal-like objects (channel_id, symbol, side, leverage, message_date) by every rollup key."""
+    channels: dict[int, _Agg] = {}
+    symbols: dict[str, _Agg] = {}
+    channel_weeks: dict[tuple[int, date], int] = {}
+    symbol_weeks: dict[tuple[str, date], int] = {}
+    for s in signals:
+        channels.setdefault(s.channel_id, _Agg()).add(s)
+        symbols.setdefault(s.symbol, _Agg()).add(s)
+        wk = week_start(s.message_date)
+        channel_weeks[(s.channel_id, wk)] = channel_weeks.get((s.channel_id, wk), 0) + 1
+        symbol_weeks[(s.symbol, wk)] = symbol_weeks.get((s.symbol, wk), 0) + 1
+    return channels, symbols, channel_weeks, symbol_weeks
+
+
+def _stat_upsert(model, key):
+    stmt = dialect_insert(model)
+    ex = stmt.excluded
+    set_ = {
+        c: getattr(model, c) + getattr(ex, c)
+        for c in ("total", "long_count", "short_count", "leverage_sum", "leverage_count")
+    }
+    set_["first_date"] = case(
+        (or_(model.first_date.is_(None), ex.first_date < model.first_date), ex.first_date), else_=model.first_date
+    )
+    set_["last_date"] = case(
+        (or_(model.last_date.is_(None), ex.last_date > model.last_date), ex.last_date), else_=model.last_date
+    )
+    return stmt.on_conflict_do_update(index_elements=[key], set_=set_)
+
+
+def _week_upsert(model, key):
+    stmt = dialect_insert(model)
+    return stmt.on_conflict_do_update(
+        index_elements=[key, model.week_start], set_={"total": model.total + stmt.excluded.total}
+    )
+
+
+async def apply_inserted(session: AsyncSession, signals: Iterable) -> None:
+    """Add freshly inserted signals to every rollup."""
+    channels, symbols, channel_weeks, symbol_weeks = _aggregate(signals)
+    if not channels:
+        return
+    await session.execute(_stat_upsert(ChannelStat, ChannelStat.channel_id), [
+        {"channel_id": k, **{c: v for c, v in a.row().items() if c not in ("deleted", "edited")}}
+        for k, a in channels.items()
+    ])
+    await session.execute(_stat_upsert(SymbolStat, SymbolStat.symbol), [
+        {"symbol": k, **{c: v for c, v in a.row().items() if c not in ("deleted", "edited")}}
+        for k, a in symbols.items()
+    ])
+    await session.execute(_week_upsert(ChannelWeekStat, ChannelWeekStat.channel_id), [
+        {"channel_id": k, "week_start": wk, "total": n} for (k, wk), n in channel_weeks.items()
+    ])
+    await session.execute(_week_upsert(SymbolWeekStat, SymbolWeekStat.symbol), [
+        {"symbol": k, "week_start": wk, "total": n} for (k, wk), n in symbol_weeks.items()
+    ])
+
+
+async def apply_flags(session: AsyncSession, deleted: Mapping[int, int], edited: Mapping[int, int]) -> None:
+    """Count signals that just became deleted / edited, keyed by channel id (transitions only)."""
+    t = ChannelStat.__table__
+    rows = [
+        {"k": ch, "d_deleted": deleted.get(ch, 0), "d_edited": edited.get(ch, 0)}
+        for ch in set(deleted) | set(edited)
+    ]
+    if rows:
+        await session.execute(
+            update(t)
+            .where(t.c.channel_id == bindparam("k"))
+            .values(deleted=t.c.deleted + bindparam("d_deleted"), edited=t.c.edited + bindparam("d_edited")),
+            rows,
+        )
+
+
+async def apply_removed(session: AsyncSession, signals: list[Signal]) -> None:
+    """
+    Subtract signals that were hard-deleted (already flushed). First/last dates of the touched
+    channels and symbols are re-read from `signals`, an index seek on the listing indexes.
+    """
+    channels, symbols, channel_weeks, symbol_weeks = _aggregate(signals)
+    if not channels:
+        return
+    for model, key, groups in (
+        (ChannelStat, "channel_id", channels),
+        (SymbolStat, "symbol", symbols),
+    ):
+        t = model.__table__
+        cols = ["total", "long_count", "short_count", "leverage_sum", "leverage_count"]
+        if model is ChannelStat:
+            cols += ["deleted", "edited"]
+        src = getattr(Signal, key)
+        await session.execute(
+            update(t)
+            .where(t.c[key] == bindparam("k"))
+            .values(
+                **{c: t.c[c] - bindparam("d_" + c) for c in cols},
+                first_date=select(func.min(Signal.message_date)).where(src == bindparam("k")).scalar_subquery(),
+                last_date=select(func.max(Signal.message_date)).where(src == bindparam("k")).scalar_subquery(),
+            ),
+            [{"k": k, **{"d_" + c: getattr(a, c) for c in cols}} for k, a in groups.items()],
+        )
+        await session.execute(delete(t).where(t.c[key].in_(list(groups)), t.c.total <= 0))
+
+    for model, key, groups in (
+        (ChannelWeekStat, "channel_id", channel_weeks),
+        (SymbolWeekStat, "symbol", symbol_weeks),
+    ):
+        t = model.__table__
+        await session.execute(
+            update(t)
+            .where(t.c[key] == bindparam("k"), t.c.week_start == bindparam("wk"))
+            .values(total=t.c.total - bindparam("n")),
+            [{"k": k, "wk": wk, "n": n} for (k, wk), n in groups.items()],
+        )
+        await session.execute(delete(t).where(t.c[key].in_([k for k, _ in groups]), t.c.total <= 0))
+
+
+async def rebuild(session: AsyncSession) -> dict:
+    """Recompute every rollup exactly from `signals` (one full scan); the caller commits."""
+    long_case = case((Signal.side == TradeSide.long, 1), else_=0)
+    short_case = case((Signal.side == TradeSide.short, 1), else_=0)
+    lev_case = case((Signal.leverage.is_not(None), 1), else_=0)
+    common = [
+        func.count(Signal.id),
+        func.sum(long_case),
+        func.sum(short_case),
+        func.coalesce(func.sum(Signal.leverage), 0),
+        func.sum(lev_case),
+        func.min(Signal.message_date),
+        func.max(Signal.message_date),
+    ]
+    common_cols = ["total", "long_count", "short_count", "leverage_sum", "leverage_count", "first_date", "last_date"]
+
+    for model in (ChannelStat, SymbolStat, ChannelWeekStat, SymbolWeekStat):
+        await session.execute(delete(model))
+
+    await session.execute(insert(ChannelStat).from_select(
+        ["channel_id", *common_cols, "deleted", "edited"],
+        select(
+            Signal.channel_id,
+            *common,
+            func.sum(case((Signal.deleted.is_(True), 1), else_=0)),
+            func.sum(case((Signal.edited.is_(True), 1), else_=0)),
+        ).group_by(Signal.channel_id),
+    ))
+    await session.execute(insert(SymbolStat).from_select(
+        ["symbol", *common_cols],
+        select(Signal.symbol, *common).group_by(Signal.symbol),
+    ))
+    for model, key in ((ChannelWeekStat, Signal.channel_id), (SymbolWeekStat, Signal.symbol)):
+        wk = week_start_sql(Signal.message_date)
+        await session.execute(insert(model).from_select(
+            [key.key, "week_start", "total"],
+            select(key, wk, func.count(Signal.id)).group_by(key, wk),
+        ))
+
+    counts = {}
+    for model in (ChannelStat, SymbolStat, ChannelWeekStat, SymbolWeekStat):
+        counts[model.__tablename__] = int((await session.execute(select(func.count()).select_from(model))).scalar_one())
+    return counts
+
+
+async def _rebuild() -> dict:
+    async with AsyncSessionLocal() as session:
+        counts = await rebuild(session)
+        await session.commit()
+    return counts
+
+
+def main() -> None:
+    from app.log import setup_logging
+
+    ap = argparse.ArgumentParser(prog="python -m app.service.rollups", description="Maintain the stats rollup tables.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild", help="recompute channel/symbol/week rollups exactly from the signals table")
+    ap.parse_args()
+    setup_logging()
+    counts = asyncio.run(_rebuild())
+    log.info("rollups rebuilt: %s", counts)
+    print(counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+from __future__ import annotations
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.config import settings
+
+
+def shard_of(channel_id: int, count: int) -> int:
+    """Shard owning `channel_id`; stable across processes and restarts (unlike hash())."""
+    return abs(channel_id) % count
+
+
+class Shard:
+    """Hash partition of channel ids owned by one collector process."""
+    __slots__ = ("index", "count")
+
+    def __init__(self, index: int = 0, count: int = 1) -> None:
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"invalid shard {index}/{count}: need SHARD_COUNT >= 1 and 0 <= SHARD_INDEX < SHARD_COUNT")
+        self.index = index
+        self.count = count
+
+    @property
+    def partitioned(self) -> bool:
+        return self.count > 1
+
+    def owns(self, channel_id: int) -> bool:
+        return self.count == 1 or shard_of(channel_id, self.count) == self.index
+
+    def where(self, channel_col) -> Optional[ColumnElement[bool]]:
+        """SQL filter on a channel id column, or None when unsharded."""
+        if self.count == 1:
+            return None
+        return func.abs(channel_col) % self.count == self.index
+
+    def __repr__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+LOCAL = Shard(settings.shard_index, settings.shard_count)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+from app.db import BACKEND
+from app.metrics import serve_prometheus
+from app.shard import Shard
+from app.notify import NotifyServer
+from app.writer import SignalWriter
+from app.writer_ipc import WriterServer
+
+log = logging.getLogger("sc.supervisor")
+
+# Supervisor for sharded ingest: one collector process per shard (python -m app.collector with
+# SHARD_INDEX/SHARD_COUNT) and optionally the read-only API (uvicorn), restarted when they exit.
+# On SQLite the supervisor owns the only SignalWriter and workers reach it over WRITER_SOCKET; on
+# PostgreSQL every worker writes directly. Each shard needs its own Telegram session
+# (TELEGRAM_SESSION_NAME=<name>-<i> python -m app.login); every session of the account receives
+# all channel updates and each worker keeps only its partition.
+#   python -m app.shard_supervisor --shards 4 --api --port 8000
+
+
+def _shard_path(path: str, index: int) -> str:
+    p = Path(path)
+    return str(p.with_name(f"{p.stem}.shard{index}{p.suffix}"))
+
+
+class _Child:
+    """One supervised process; restarted with exponential backoff, reset after a stable run."""
+
+    def __init__(self, name: str, cmd: list[str], env: dict[str, str]) -> None:
+        self.name = name
+        self.cmd = cmd
+        self.env = env
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        backoff = 1.0
+        while not stopping.is_set():
+            started = time.monotonic()
+            # Own session: terminal signals reach only the supervisor, which stops children in order
+            self.proc = await asyncio.create_subprocess_exec(*self.cmd, env=self.env, start_new_session=True)
+            log.info("%s started (pid %s)", self.name, self.proc.pid)
+            code = await self.proc.wait()
+            if stopping.is_set():
+                break
+            backoff = 1.0 if time.monotonic() - started > 60 else min(60.0, backoff * 2)
+            self.restarts += 1
+            log.error("%s exited with %s, restarting in %.0fs", self.name, code, backoff)
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+
+    async def terminate(self, grace: float) -> None:
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        self.proc.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(self.proc.wait(), timeout=grace)
+        except asyncio.TimeoutError:
+            log.warning("%s did not stop within %.0fs, killing", self.name, grace)
+            self.proc.kill()
+            await self.proc.wait()
+
+
+def _children(args: argparse.Namespace, writer_socket: str) -> list[_Child]:
+    base = {**os.environ, "SHARD_COUNT": str(args.shards), "WRITER_SOCKET": writer_socket}
+    children = []
+    for i in range(args.shards):
+        env = {**base, "SHARD_INDEX": str(i)}
+        if settings.collector_metrics_port:
+            env["COLLECTOR_METRICS_PORT"] = str(settings.collector_metrics_port + i)
+        if args.shards > 1:
+            # Sessions and spill files are per process
+            env["TELEGRAM_SESSION_NAME"] = f"{settings.session_name}-{i}"
+            env["INGEST_SPILL_PATH"] = _shard_path(settings.ingest_spill_path, i)
+        children.append(_Child(f"collector[{i}]", [sys.executable, "-m", "app.collector"], env))
+    if args.api:
+        env = dict(base)
+        cmd = [sys.executable, "-m", "uvicorn", "app.api.server:app", "--host", args.host, "--port", str(args.port)]
+        if args.api_workers > 1:
+            cmd += ["--workers", str(args.api_workers)]
+        children.append(_Child("api", cmd, env))
+    return children
+
+
+async def _run(args: argparse.Namespace) -> None:
+    Shard(0, args.shards)  # validate
+    writer: Optional[SignalWriter] = None
+    server: Optional[WriterServer] = None
+    notify: Optional[NotifyServer] = None
+    metrics: Optional[asyncio.AbstractServer] = None
+    socket_path = ""
+    if BACKEND == "sqlite":
+        socket_path = os.path.abspath(settings.writer_socket or "run/writer.sock")
+        if settings.notify_dir:
+            # New signals are committed here, not in the collectors
+            notify = NotifyServer(settings.notify_dir, "writer")
+            await notify.start()
+        writer = SignalWriter(flush_interval_ms=settings.writer_flush_ms, max_batch=settings.writer_max_batch)
+        await writer.start()
+        server = WriterServer(writer, socket_path)
+        await server.start()
+        if settings.collector_metrics_port:
+            # The shared writer's commit metrics, next to the shards' ports
+            port = settings.collector_metrics_port + args.shards
+            metrics = await serve_prometheus(settings.collector_metrics_host, port)
+            log.info("shared writer metrics on %s:%s", settings.collector_metrics_host, port)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    children = _children(args, socket_path)
+    log.info("supervising %s shard(s)%s, backend=%s", args.shards, " + api" if args.api else "", BACKEND)
+    runners = [asyncio.create_task(c.run(stopping), name=c.name) for c in children]
+    await stopping.wait()
+
+    log.info("stopping children")
+    await asyncio.gather(*(c.terminate(args.grace) for c in children))
+    await asyncio.gather(*runners, return_exceptions=True)
+    # Workers flushed into the shared writer before exiting; commit what is left
+    if server:
+        await server.stop()
+    if writer:
+        await writer.stop()
+    if metrics:
+        metrics.close()
+        await metrics.wait_closed()
+    if notify:
+        await notify.stop()
+
+
+def main() -> None:
+    from app.log import setup_logging
+
+    ap = argparse.ArgumentParser(prog="python -m app.shard_supervisor", description="Run sharded collector workers.")
+    ap.add_argument("--shards", type=int, default=settings.shard_count, help="collector processes (default SHARD_COUNT)")
+    ap.add_argument("--api", action="store_true", help="also run the API (uvicorn)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--api-workers", type=int, default=1, help="uvicorn worker processes for the API")
+    ap.add_argument("--grace", type=float, default=60.0, help="seconds a child gets to drain after SIGTERM")
+    setup_logging()
+    asyncio.run(_run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,53 @@
 from __future__ import annotations
 import logging
+from collections import defaultdict
+from datetime import datetime, timezone
 from pathlib import Path
 from pyrogram import Client, filters
-from pyrogram.handlers import MessageHandler
+from pyrogram.handlers import DeletedMessagesHandler, EditedMessageHandler, MessageHandler
 from pyrogram.types import Message
-from app.processor import Processor, MessageEnvelope
+from app.ingest import IngestQueue
+from app.service.changes import detect_edit, find_signals
+from app.processor import MessageEnvelope
 from app.config import settings
+from app.shard import LOCAL, Shard
+from app.writer import SignalWriter
 
 log = logging.getLogger("sc.telegram")
 
 
+def envelope_from_message(message: Message) -> MessageEnvelope | None:
+    """Envelope for a channel post with text/caption; None for anything else (service, media-only, non-channel)."""
+    if not message or getattr(message, "empty", False) or not message.chat:
+        return None
+    if not message.chat.type.name.lower().startswith("channel"):
+        return None
+    text = (message.text or message.caption or "").strip()
+    if not text:
+        return None
+    return MessageEnvelope(
+        channel_id=message.chat.id,
+        channel_title=message.chat.title,
+        channel_username=message.chat.username,
+        message_id=message.id,
+        message_date=message.date,
+        text=text,
+    )
+
+
 class TelegramListener:
-    """Wire Pyrogram events to the processing pipeline (inline, no queue)."""
+    """
+    Wire Pyrogram events to the pipeline:
+      - new channel messages go to the ingest queue (processing happens in its workers);
+      - edits/deletions of stored signals are recorded right away via the shared change logic.
+    Every session of the account receives all updates; with several shards each listener keeps
+    only the channels of its own `shard`.
+    """
 
-    def __init__(self, processor: Processor) -> None:
-        self.processor = processor
+    def __init__(self, ingest: IngestQueue, writer: SignalWriter, shard: Shard = LOCAL) -> None:
+        self.ingest = ingest
+        self.writer = writer
+        self.shard = shard
         Path(settings.session_dir).mkdir(parents=True, exist_ok=True)
         self._session_path = Path(settings.session_dir) / f"{settings.session_name}.session"
 
@@ -33,28 +66,47 @@ class TelegramListener:
             )
 
         self.client.add_handler(MessageHandler(self._on_channel_message, filters.channel))
+        self.client.add_handler(EditedMessageHandler(self._on_edited_message, filters.channel))
+        self.client.add_handler(DeletedMessagesHandler(self._on_deleted_messages))
         await self.client.start()
-        log.info("pyrogram client started (session: %s)", self._session_path)
+        log.info("pyrogram client started (session: %s, shard %s)", self._session_path, self.shard)
 
     async def stop(self) -> None:
-        await self.client.stop()
+        if self.client.is_connected:
+            await self.client.stop()
 
     async def _on_channel_message(self, client: Client, message: Message) -> None:  # type: ignore[override]
-        if not message or not message.chat or not message.chat.type.name.lower().startswith("channel"):
+        env = envelope_from_message(message)
+        if env is None or not self.shard.owns(env.channel_id):
             return
 
-        text = (message.text or message.caption or "").strip()
-        if not text:
+        # Hand off to the worker pool; returns immediately unless the queue applies backpressure
+        await self.ingest.submit(env)
+
+    async def _on_edited_message(self, client: Client, message: Message) -> None:  # type: ignore[override]
+        if not message or not message.chat or not self.shard.owns(message.chat.id):
             return
+        try:
+            refs = await find_signals(message.chat.id, [message.id])
+            if not refs:
+                return  # edit of a message we never stored as a signal
+            now = datetime.now(timezone.utc)
+            edit = detect_edit(refs[0], message.text or message.caption or "", message.edit_date or now)
+            await self.writer.record_changes(now, checked_ids=[refs[0].id], edits=[edit] if edit else [])
+        except Exception:
+            log.exception("failed to record edit ch=%s msg=%s", message.chat.id, message.id)
 
-        env = MessageEnvelope(
-            channel_id=message.chat.id,
-            channel_title=message.chat.title,
-            channel_username=message.chat.username,
-            message_id=message.id,
-            message_date=message.date,
-            text=text,
-        )
+    async def _on_deleted_messages(self, client: Client, messages: list[Message]) -> None:  # type: ignore[override]
+        # Telegram only reports the chat for channel/supergroup deletions; others are ambiguous ids.
+        by_channel: dict[int, list[int]] = defaultdict(list)
+        for m in messages or []:
+            if m is not None and m.chat is not None and self.shard.owns(m.chat.id):
+                by_channel[m.chat.id].append(m.id)
 
-        # Process inline (no queue/backpressure)
-        await self.processor.process(env)
+        for channel_id, message_ids in by_channel.items():
+            try:
+                refs = await find_signals(channel_id, message_ids)
+                if refs:
+                    await self.writer.record_changes(datetime.now(timezone.utc), deleted_ids=[r.id for r in refs])
+            except Exception:
+                log.exception("failed to record deletions ch=%s msgs=%s", channel_id, message_ids)
@@ -0,0 +1,451 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import case, delete, or_, update
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.db import AsyncSessionLocal, dialect_insert
+from app.events import BROKER, GENERATION
+from app.metrics import REGISTRY
+from app.models import BackfillState, Channel, LLMCacheEntry, RejectedMessage, Signal, TradeSide
+from app.schemas import PersistedSignal
+from app.service import changes, rollups
+
+log = logging.getLogger("sc.writer")
+
+_DB_COMMIT = REGISTRY.histogram("sc_db_commit_seconds", "Time spent in COMMIT", labels=("source",))
+_BATCH_ROWS = REGISTRY.histogram(
+    "sc_writer_batch_signals", "Signals per writer transaction", buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+_DROPPED = REGISTRY.counter(
+    "sc_writer_dropped_rows_total", "Rows dropped because the database rejects them", labels=("kind",)
+)
+
+# Failures worth retrying as they are: the database is locked, down or unreachable. Anything else
+# is taken to be caused by the data, and the batch is split to find the rows responsible.
+_TRANSIENT = (OperationalError, InterfaceError, OSError)
+
+
+class ChannelUpsert:
+    """Channel metadata + last seen message id to merge into the `channels` table."""
+    __slots__ = ("channel_id", "title", "username", "last_message_id")
+
+    def __init__(
+        self,
+        channel_id: int,
+        title: Optional[str] = None,
+        username: Optional[str] = None,
+        last_message_id: Optional[int] = None,
+    ) -> None:
+        self.channel_id = channel_id
+        self.title = title
+        self.username = username
+        self.last_message_id = last_message_id
+
+    def merge(self, other: "ChannelUpsert") -> None:
+        self.title = other.title or self.title
+        self.username = other.username or self.username
+        if other.last_message_id and (not self.last_message_id or other.last_message_id > self.last_message_id):
+            self.last_message_id = other.last_message_id
+
+
+class SignalWriter:
+    """
+    Single writer task that micro-batches persistence.
+
+    Signals and channel updates are buffered and flushed in one transaction every
+    `flush_interval_ms` or as soon as `max_batch` signals are pending, whichever comes first.
+    Duplicates on (channel_id, message_id) are skipped by `ON CONFLICT DO NOTHING`; only the rows
+    actually inserted are added to the stats rollups, in the same transaction.
+
+    A batch is never dropped as a whole. When the database is unavailable it stays buffered and is
+    retried with exponential backoff (up to `max_backoff_seconds`); when the database rejects it,
+    it is split in halves until the offending rows are isolated, and only those are dropped.
+
+    The other writes of a collector (change records, backfill checkpoints, llm_cache trims) are
+    not batched but go through the writer too, so a shard worker's RemoteWriter can forward them.
+    """
+
+    def __init__(self, flush_interval_ms: int = 200, max_batch: int = 500, max_backoff_seconds: float = 30.0) -> None:
+        self.flush_interval = max(1, flush_interval_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.max_backoff = max(self.flush_interval, max_backoff_seconds)
+
+        self._signals: list[PersistedSignal] = []
+        self._channels: dict[int, ChannelUpsert] = {}
+        self._cache_rows: dict[str, dict] = {}
+        self._rejections: list[dict] = []
+        self._failures = 0
+
+        self._pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._runner(), name="signal-writer")
+        log.info("signal writer started (flush=%sms, max_batch=%s)", int(self.flush_interval * 1000), self.max_batch)
+
+    async def stop(self) -> None:
+        if self._task:
+            # Let the runner finish the flush it may be in (cancelling it mid-transaction would
+            # lose the batch and leave the connection holding the SQLite write lock)
+            self._stopping.set()
+            self._pending.set()
+            self._full.set()
+            try:
+                await self._task
+            except Exception:
+                pass
+            self._task = None
+        # Final flush so nothing buffered is lost on shutdown
+        await self.flush()
+
+    def add_signal(self, rec: PersistedSignal, channel: Optional[ChannelUpsert] = None) -> None:
+        if channel is not None:
+            self.add_channel(channel)
+        self._signals.append(rec)
+        self._pending.set()
+        if len(self._signals) >= self.max_batch:
+            self._full.set()
+
+    def add_channel(self, upd: ChannelUpsert) -> None:
+        existing = self._channels.get(upd.channel_id)
+        if existing is None:
+            self._channels[upd.channel_id] = ChannelUpsert(upd.channel_id, upd.title, upd.username, upd.last_message_id)
+        else:
+            existing.merge(upd)
+        self._pending.set()
+
+    def add_cache_entry(self, row: dict) -> None:
+        """Queue an `llm_cache` upsert; repeated rows for one fingerprint are merged (hits summed)."""
+        existing = self._cache_rows.get(row["fingerprint"])
+        if existing is not None:
+            row = {**row, "hits": existing["hits"] + row["hits"]}
+        self._cache_rows[row["fingerprint"]] = row
+        self._pending.set()
+
+    def add_rejection(self, row: dict) -> None:
+        """Queue a `rejected_messages` row (channel_id, message_id, message_date, text, source)."""
+        self._rejections.append(row)
+        self._pending.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._signals) + len(self._channels) + len(self._cache_rows) + len(self._rejections)
+
+    async def record_changes(
+        self,
+        now: datetime,
+        checked_ids: Iterable[int] = (),
+        deleted_ids: Iterable[int] = (),
+        edits: Iterable[changes.Edit] = (),
+        next_check: Optional[Mapping[int, datetime]] = None,
+    ) -> None:
+        """Commit deletions/editions and check times right away (see changes.record_changes)."""
+        await changes.record_changes(now, checked_ids, deleted_ids, edits, next_check)
+
+    async def plan_backfill(self, rows: list[dict]) -> None:
+        """Upsert `backfill_state` rows, (re)starting each channel's gap from `next_message_id`."""
+        if not rows:
+            return
+        stmt = dialect_insert(BackfillState)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BackfillState.channel_id],
+            set_={
+                "next_message_id": stmt.excluded.next_message_id,
+                "target_message_id": None,
+                "started_at": stmt.excluded.started_at,
+                "updated_at": stmt.excluded.updated_at,
+                "completed_at": None,
+            },
+        )
+        async with AsyncSessionLocal() as session:
+            await session.execute(stmt, rows)
+            await session.commit()
+
+    async def checkpoint_backfill(
+        self, channel_id: int, next_message_id: int, target_message_id: Optional[int], done: bool = False
+    ) -> None:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(BackfillState)
+                .where(BackfillState.channel_id == channel_id)
+                .values(
+                    next_message_id=next_message_id,
+                    target_message_id=target_message_id,
+                    updated_at=now,
+                    completed_at=now if done else None,
+                )
+            )
+            await session.commit()
+
+    async def trim_cache(self, cutoff: datetime) -> None:
+        """Delete `llm_cache` rows last used before `cutoff`."""
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.last_used_at < cutoff))
+            await session.commit()
+
+    async def _runner(self) -> None:
+        while not self._stopping.is_set():
+            await self._pending.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                delay = min(self.max_backoff, self.flush_interval * 2 ** min(self._failures, 30))
+                log.exception("signal writer flush failed (%s in a row), retrying in %.1fs", self._failures, delay)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            items: list[tuple[str, object]] = [
+                *(("channel", c) for c in self._channels.values()),
+                *(("signal", rec) for rec in self._signals),
+                *(("cache", row) for row in self._cache_rows.values()),
+                *(("rejection", row) for row in self._rejections),
+            ]
+            self._signals, self._channels, self._cache_rows, self._rejections = [], {}, {}, []
+            self._pending.clear()
+            self._full.clear()
+            if not items:
+                return
+
+            inserted: list[PersistedSignal] = []
+            try:
+                await self._write_isolating(items, inserted)
+            except Exception:
+                # A cancelled flush is not a failure; either way its rows are buffered again
+                self._failures += 1
+                raise
+            self._failures = 0
+
+        for rec in inserted:
+            log.info(
+                "stored signal: ch=%s msg=%s %s %s tp=%s sl=%s lev=%s",
+                rec.channel_id,
+                rec.message_id,
+                rec.symbol,
+                rec.side,
+                rec.take_profits,
+                rec.stop_loss,
+                rec.leverage,
+            )
+
+    async def _write_isolating(self, items: list[tuple[str, object]], inserted: list[PersistedSignal]) -> None:
+        """
+        Write `items` in order, appending the inserted signals to `inserted`. A part the database
+        rejects is split in halves and each half is written on its own; a single rejected row is
+        dropped. On a transient failure or cancellation whatever is not committed yet is put back
+        in front of the buffers and the error propagates.
+        """
+        parts = [items]
+        while parts:
+            part = parts.pop()
+            try:
+                inserted.extend(await self._write(*_by_kind(part)))
+            except Exception as e:
+                if isinstance(e, _TRANSIENT):
+                    self._requeue([row for p in [part, *reversed(parts)] for row in p])
+                    raise
+                if len(part) == 1:
+                    kind, row = part[0]
+                    _DROPPED.inc(kind)
+                    log.error("signal writer: dropping %s row the database rejects (%s): %.300r", kind, e, row)
+                    continue
+                mid = len(part) // 2
+                parts += [part[mid:], part[:mid]]
+            except BaseException:
+                self._requeue([row for p in [part, *reversed(parts)] for row in p])
+                raise
+
+    def _requeue(self, items: list[tuple[str, object]]) -> None:
+        """Put unwritten rows back in front of anything that was buffered meanwhile."""
+        channels, signals, cache_rows, rejections = _by_kind(items)
+        newer_channels, newer_cache = self._channels, self._cache_rows
+        self._signals = signals + self._signals
+        self._rejections = rejections + self._rejections
+        self._channels = {c.channel_id: c for c in channels}
+        self._cache_rows = {row["fingerprint"]: row for row in cache_rows}
+        for upd in newer_channels.values():
+            self.add_channel(upd)
+        for row in newer_cache.values():
+            self.add_cache_entry(row)
+        self._pending.set()
+        if len(self._signals) >= self.max_batch:
+            self._full.set()
+
+    async def _write(
+        self,
+        channels: list[ChannelUpsert],
+        signals: list[PersistedSignal],
+        cache_rows: list[dict],
+        rejections: list[dict],
+    ) -> list[PersistedSignal]:
+        """Write one batch in a single transaction; return the signals that were actually inserted."""
+        now = datetime.now(timezone.utc)
+        inserted: list[PersistedSignal] = []
+        inserted_ids: list[int] = []
+
+        async with AsyncSessionLocal() as session:
+            try:
+                if channels:
+                    await session.execute(_channel_upsert_stmt(), [
+                        {
+                            "id": c.channel_id,
+                            "title": c.title,
+                            "username": c.username,
+                            "last_message_id": c.last_message_id,
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for c in channels
+                    ])
+
+                if signals:
+                    stmt = (
+                        dialect_insert(Signal)
+                        .on_conflict_do_nothing(index_elements=[Signal.channel_id, Signal.message_id])
+                        .returning(Signal.id, Signal.channel_id, Signal.message_id)
+                    )
+                    result = await session.execute(stmt, [_signal_row(rec, now) for rec in signals])
+                    ids = {(r.channel_id, r.message_id): r.id for r in result.all()}
+                    # The first of any in-batch duplicates is the row that was inserted
+                    for rec in signals:
+                        sid = ids.pop((rec.channel_id, rec.message_id), None)
+                        if sid is not None:
+                            inserted.append(rec)
+                            inserted_ids.append(sid)
+                    await rollups.apply_inserted(session, inserted)
+
+                if cache_rows:
+                    await session.execute(_cache_upsert_stmt(), [{**r, "created_at": now} for r in cache_rows])
+
+                if rejections:
+                    await session.execute(
+                        dialect_insert(RejectedMessage).on_conflict_do_nothing(
+                            index_elements=[RejectedMessage.channel_id, RejectedMessage.message_id]
+                        ),
+                        [{**r, "created_at": now} for r in rejections],
+                    )
+
+                t0 = time.perf_counter()
+                await session.commit()
+                _DB_COMMIT.observe(time.perf_counter() - t0, "writer")
+            except Exception:
+                await session.rollback()
+                raise
+
+        if inserted or channels:
+            GENERATION.bump()
+        for sid, rec in zip(inserted_ids, inserted):
+            BROKER.publish("signal", rec.channel_id, rec.symbol, _signal_event(sid, rec))
+        if signals:
+            _BATCH_ROWS.observe(len(signals))
+        log.debug(
+            "writer flushed: channels=%s signals=%s inserted=%s cache=%s rejected=%s",
+            len(channels), len(signals), len(inserted), len(cache_rows), len(rejections),
+        )
+        return inserted
+
+
+def _by_kind(
+    items: list[tuple[str, object]],
+) -> tuple[list[ChannelUpsert], list[PersistedSignal], list[dict], list[dict]]:
+    """Split flattened batch rows back into the argument lists of SignalWriter._write."""
+    groups: dict[str, list] = {"channel": [], "signal": [], "cache": [], "rejection": []}
+    for kind, row in items:
+        groups[kind].append(row)
+    return groups["channel"], groups["signal"], groups["cache"], groups["rejection"]
+
+
+def _channel_upsert_stmt():
+    stmt = dialect_insert(Channel)
+    ex = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[Channel.id],
+        set_={
+            "title": case((ex.title.is_not(None), ex.title), else_=Channel.title),
+            "username": case((ex.username.is_not(None), ex.username), else_=Channel.username),
+            "last_message_id": case(
+                (
+                    or_(Channel.last_message_id.is_(None), ex.last_message_id > Channel.last_message_id),
+                    ex.last_message_id,
+                ),
+                else_=Channel.last_message_id,
+            ),
+            "updated_at": ex.updated_at,
+        },
+        # Skip the row rewrite when nothing would change
+        where=or_(
+            ex.title.is_not(None) & ex.title.is_distinct_from(Channel.title),
+            ex.username.is_not(None) & ex.username.is_distinct_from(Channel.username),
+            ex.last_message_id.is_not(None)
+            & or_(Channel.last_message_id.is_(None), ex.last_message_id > Channel.last_message_id),
+        ),
+    )
+
+
+def _cache_upsert_stmt():
+    stmt = dialect_insert(LLMCacheEntry)
+    ex = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[LLMCacheEntry.fingerprint],
+        set_={
+            "is_signal": ex.is_signal,
+            "fields": ex.fields,
+            "hits": LLMCacheEntry.hits + ex.hits,
+            "last_used_at": ex.last_used_at,
+        },
+    )
+
+
+def _signal_row(rec: PersistedSignal, now: datetime) -> dict:
+    return {
+        "channel_id": rec.channel_id,
+        "message_id": rec.message_id,
+        "message_date": rec.message_date,
+        "symbol": rec.symbol,
+        "side": TradeSide(rec.side),
+        "leverage": rec.leverage,
+        "stop_loss": rec.stop_loss,
+        "take_profits": rec.take_profits,
+        "original_text": rec.original_text,
+        "deleted": False,
+        "edited": False,
+        # Due for the checker from posting on; its scores decide when the RPC budget gets to it
+        "next_check_at": rec.message_date,
+        "created_at": now,
+    }
+
+
+def _signal_event(signal_id: int, rec: PersistedSignal) -> dict:
+    return {
+        "id": signal_id,
+        "channel_id": rec.channel_id,
+        "message_id": rec.message_id,
+        "message_date": rec.message_date.isoformat(),
+        "symbol": rec.symbol,
+        "side": rec.side,
+        "leverage": rec.leverage,
+        "stop_loss": rec.stop_loss,
+        "take_profits": rec.take_profits,
+        "original_text": rec.original_text,
+    }
@@ -0,0 +1,328 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional
+
+from app.metrics import REGISTRY
+from app.schemas import PersistedSignal
+from app.service.changes import Edit
+from app.writer import ChannelUpsert, SignalWriter
+
+log = logging.getLogger("sc.writer_ipc")
+
+# Shard workers and the supervisor's single SQLite writer talk newline-delimited JSON over a Unix
+# socket. Workers send the same calls they would make on a local SignalWriter (add_signal,
+# add_channel, add_cache_entry, add_rejection); `flush` is acknowledged once the supervisor's
+# writer has committed everything sent before it on that connection. The unbatched writes
+# (record_changes, plan_backfill, checkpoint_backfill, trim_cache) are `call`s, run by the
+# supervisor in order with the rest and acknowledged once committed, so the SQLite file has a
+# single writing process.
+
+_LINE_LIMIT = 4 * 1024 * 1024
+
+_SENT = REGISTRY.counter("sc_writer_ipc_messages_total", "Rows forwarded to the shared writer", labels=("op",))
+_RECONNECTS = REGISTRY.counter("sc_writer_ipc_reconnects_total", "Connections (re)established to the shared writer")
+_DROPPED = REGISTRY.counter("sc_writer_ipc_dropped_total", "Rows dropped because the shared writer was unreachable")
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, datetime):
+        return {"$dt": o.isoformat()}
+    raise TypeError(f"cannot encode {type(o).__name__}")
+
+
+def _hook(d: dict) -> Any:
+    if len(d) == 1 and "$dt" in d:
+        return datetime.fromisoformat(d["$dt"])
+    return d
+
+
+def _encode(msg: dict) -> bytes:
+    return json.dumps(msg, default=_default, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def _decode(line: bytes) -> dict:
+    return json.loads(line, object_hook=_hook)
+
+
+def _upsert_dict(upd: Optional[ChannelUpsert]) -> Optional[dict]:
+    if upd is None:
+        return None
+    return {k: getattr(upd, k) for k in ChannelUpsert.__slots__}
+
+
+def _upsert(d: Optional[dict]) -> Optional[ChannelUpsert]:
+    return ChannelUpsert(**d) if d else None
+
+
+class WriterServer:
+    """Accept rows from shard workers on `path` and feed them into the local SignalWriter."""
+
+    def __init__(self, writer: SignalWriter, path: str) -> None:
+        self.writer = writer
+        self.path = path
+        self._server: asyncio.AbstractServer | None = None
+        self._conns: set[asyncio.StreamWriter] = set()
+        self._handlers: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket of a previous run
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=_LINE_LIMIT)
+        os.chmod(self.path, 0o600)
+        log.info("shared writer listening on %s", self.path)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            for w in list(self._conns):
+                w.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, w: asyncio.StreamWriter) -> None:
+        self._conns.add(w)
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while line := await reader.readline():
+                msg = _decode(line)
+                op = msg.get("op")
+                if op == "signal":
+                    self.writer.add_signal(PersistedSignal(**msg["rec"]), _upsert(msg.get("channel")))
+                elif op == "channel":
+                    self.writer.add_channel(_upsert(msg["channel"]))
+                elif op == "cache":
+                    self.writer.add_cache_entry(msg["row"])
+                elif op == "rejection":
+                    self.writer.add_rejection(msg["row"])
+                elif op == "flush":
+                    ok = True
+                    try:
+                        await self.writer.flush()
+                    except Exception:
+                        log.exception("shared writer: flush requested by a worker failed")
+                        ok = False
+                    w.write(_encode({"op": "flushed", "id": msg["id"], "ok": ok}))
+                    await w.drain()
+                elif op == "call":
+                    ok = True
+                    try:
+                        await self._call(msg["name"], msg["args"])
+                    except Exception:
+                        log.exception("shared writer: %s requested by a worker failed", msg.get("name"))
+                        ok = False
+                    w.write(_encode({"op": "done", "id": msg["id"], "ok": ok}))
+                    await w.drain()
+                else:
+                    log.warning("shared writer: unknown op %r", op)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            log.exception("shared writer: dropping worker connection")
+        finally:
+            self._conns.discard(w)
+            self._handlers.discard(task)
+            w.close()
+
+    async def _call(self, name: str, args: dict) -> None:
+        if name == "record_changes":
+            next_check = args.get("next_check")
+            await self.writer.record_changes(
+                args["now"],
+                checked_ids=args["checked_ids"],
+                deleted_ids=args["deleted_ids"],
+                edits=[Edit(*e) for e in args["edits"]],
+                next_check={sid: at for sid, at in next_check} if next_check is not None else None,
+            )
+        elif name == "plan_backfill":
+            await self.writer.plan_backfill(args["rows"])
+        elif name == "checkpoint_backfill":
+            await self.writer.checkpoint_backfill(
+                args["channel_id"], args["next_message_id"], args["target_message_id"], args["done"]
+            )
+        elif name == "trim_cache":
+            await self.writer.trim_cache(args["cutoff"])
+        else:
+            raise ValueError(f"unknown call {name!r}")
+
+
+class RemoteWriter:
+    """
+    SignalWriter stand-in for shard workers: every row is forwarded to the supervisor's writer.
+
+    Rows are buffered while the socket is down (up to `max_buffer`, oldest dropped) and resent after
+    reconnecting; a chunk interrupted mid-send is resent whole, which the writer's upserts absorb.
+    `flush()` and the unbatched writes wait for the supervisor to commit; they raise ConnectionError
+    if the link drops first and RuntimeError if the supervisor reports a failure.
+    """
+
+    def __init__(self, path: str, reconnect_seconds: float = 1.0, max_buffer: int = 100_000) -> None:
+        self.path = path
+        self.reconnect_seconds = reconnect_seconds
+        self.max_buffer = max(1, max_buffer)
+        self._buf: list[bytes] = []
+        self._pending = asyncio.Event()
+        self._connected = asyncio.Event()
+        self._acks: dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._task: asyncio.Task | None = None
+        self._conn: asyncio.StreamWriter | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buf)
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._runner(), name="remote-writer")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        if self._task:
+            try:
+                await asyncio.wait_for(self.flush(), timeout=timeout)
+            except (asyncio.TimeoutError, ConnectionError, RuntimeError) as e:
+                log.error("remote writer: %s rows not delivered on shutdown (%r)", len(self._buf), e)
+            finally:
+                self._task.cancel()
+                try:
+                    await self._task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                self._task = None
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+    def add_signal(self, rec: PersistedSignal, channel: Optional[ChannelUpsert] = None) -> None:
+        self._send({"op": "signal", "rec": rec.model_dump(), "channel": _upsert_dict(channel)})
+
+    def add_channel(self, upd: ChannelUpsert) -> None:
+        self._send({"op": "channel", "channel": _upsert_dict(upd)})
+
+    def add_cache_entry(self, row: dict) -> None:
+        self._send({"op": "cache", "row": row})
+
+    def add_rejection(self, row: dict) -> None:
+        self._send({"op": "rejection", "row": row})
+
+    async def flush(self) -> None:
+        if not await self._request({"op": "flush"}):
+            raise RuntimeError("shared writer failed to commit the batch")
+
+    async def record_changes(
+        self,
+        now: datetime,
+        checked_ids: Iterable[int] = (),
+        deleted_ids: Iterable[int] = (),
+        edits: Iterable[Edit] = (),
+        next_check: Optional[Mapping[int, datetime]] = None,
+    ) -> None:
+        await self._call("record_changes", {
+            "now": now,
+            "checked_ids": list(checked_ids),
+            "deleted_ids": list(deleted_ids),
+            "edits": [list(e) for e in edits],
+            "next_check": list(next_check.items()) if next_check is not None else None,
+        })
+
+    async def plan_backfill(self, rows: list[dict]) -> None:
+        if rows:
+            await self._call("plan_backfill", {"rows": rows})
+
+    async def checkpoint_backfill(
+        self, channel_id: int, next_message_id: int, target_message_id: Optional[int], done: bool = False
+    ) -> None:
+        await self._call("checkpoint_backfill", {
+            "channel_id": channel_id,
+            "next_message_id": next_message_id,
+            "target_message_id": target_message_id,
+            "done": done,
+        })
+
+    async def trim_cache(self, cutoff: datetime) -> None:
+        await self._call("trim_cache", {"cutoff": cutoff})
+
+    async def _call(self, name: str, args: dict) -> None:
+        _SENT.inc(name)
+        if not await self._request({"op": "call", "name": name, "args": args}):
+            raise RuntimeError(f"shared writer failed to run {name}")
+
+    async def _request(self, msg: dict) -> bool:
+        """Queue `msg` with a fresh id and wait for the supervisor's acknowledgement."""
+        self._next_id += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._acks[self._next_id] = fut
+        self._buf.append(_encode({**msg, "id": self._next_id}))
+        self._pending.set()
+        return await fut
+
+    def _send(self, msg: dict) -> None:
+        if len(self._buf) >= self.max_buffer:
+            dropped = _decode(self._buf.pop(0))
+            _DROPPED.inc()
+            fut = self._acks.pop(dropped.get("id"), None) if dropped.get("op") in ("flush", "call") else None
+            if fut is not None and not fut.done():
+                fut.set_exception(ConnectionError("shared writer unreachable, buffer overflowed"))
+        self._buf.append(_encode(msg))
+        _SENT.inc(msg["op"])
+        self._pending.set()
+
+    async def _runner(self) -> None:
+        while True:
+            try:
+                reader, w = await asyncio.open_unix_connection(self.path, limit=_LINE_LIMIT)
+            except OSError as e:
+                log.warning("remote writer: cannot reach %s (%s), retrying", self.path, e)
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+            _RECONNECTS.inc()
+            self._conn = w
+            pump = asyncio.create_task(self._pump(w))
+            acks = asyncio.create_task(self._read_acks(reader))
+            try:
+                await asyncio.wait({pump, acks}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for t in (pump, acks):
+                    t.cancel()
+                    try:
+                        await t
+                    except (asyncio.CancelledError, Exception):
+                        pass
+                w.close()
+                self._conn = None
+            log.warning("remote writer: connection to %s lost", self.path)
+            # Flushes sent on the dead connection never get an answer; their callers retry
+            for fut in self._acks.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError("shared writer connection lost"))
+            self._acks.clear()
+            await asyncio.sleep(self.reconnect_seconds)
+
+    async def _pump(self, w: asyncio.StreamWriter) -> None:
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            chunk, self._buf = self._buf, []
+            try:
+                w.writelines(chunk)
+                await w.drain()
+            except BaseException:
+                self._buf = chunk + self._buf
+                raise
+
+    async def _read_acks(self, reader: asyncio.StreamReader) -> None:
+        while line := await reader.readline():
+            msg = _decode(line)
+            fut = self._acks.pop(msg.get("id"), None)
+            if fut is not None and not fut.done():
+                fut.set_result(bool(msg.get("ok")))
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# app.config reads the environment on import: give the tests credentials that are never used and a
+# throwaway database, so nothing touches a real .env setup
+os.environ.setdefault("API_ID", "1")
+os.environ.setdefault("API_HASH", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='sc-tests-')}/signals.db"
+
+
+class RecordingWriter:
+    """
+    Stands in for SignalWriter: keeps every batched row (`rows`) and unbatched write (`calls`) it
+    is handed, in order. Methods named in `fail` raise instead.
+    """
+
+    def __init__(self):
+        self.fail = set()
+        self.rows = []
+        self.calls = []
+        self.flushes = 0
+
+    def add_signal(self, rec, channel=None):
+        self.rows.append(("signal", rec, channel))
+
+    def add_channel(self, upd):
+        self.rows.append(("channel", upd))
+
+    def add_cache_entry(self, row):
+        self.rows.append(("cache", row))
+
+    def add_rejection(self, row):
+        self.rows.append(("rejection", row))
+
+    async def flush(self):
+        self._maybe_fail("flush")
+        self.flushes += 1
+
+    async def record_changes(self, now, checked_ids=(), deleted_ids=(), edits=(), next_check=None):
+        self._maybe_fail("record_changes")
+        self.calls.append(("record_changes", now, list(checked_ids), list(deleted_ids), list(edits), next_check))
+
+    async def plan_backfill(self, rows):
+        self.calls.append(("plan_backfill", rows))
+
+    async def checkpoint_backfill(self, channel_id, next_message_id, target_message_id, done=False):
+        self.calls.append(("checkpoint_backfill", channel_id, next_message_id, target_message_id, done))
+
+    async def trim_cache(self, cutoff):
+        self.calls.append(("trim_cache", cutoff))
+
+    def _maybe_fail(self, name):
+        if name in self.fail:
+            raise OSError(f"{name} failed")
+
+
+@pytest.fixture
+def writer():
+    return RecordingWriter()
+
+
+@pytest.fixture
+def db():
+    """Fresh tables in the throwaway database; returns a runner for coroutines that use them."""
+    from app import models  # noqa: F401  (registers the tables)
+    from app.db import Base, engine
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                # Pooled connections must not outlive the event loop of this run
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    run(reset())
+    return run
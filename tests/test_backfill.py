@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.backfill import Backfiller
+
+T0 = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+CHANNEL = SimpleNamespace(id=-100, title="Chan", username=None, type=SimpleNamespace(name="CHANNEL"))
+
+
+class FakeClient:
+    def __init__(self, newest):
+        self.newest = newest
+
+    async def get_chat_history(self, chat_id, limit):
+        yield SimpleNamespace(id=self.newest)
+
+    async def get_messages(self, chat_id, message_ids):
+        return [
+            SimpleNamespace(id=i, chat=CHANNEL, date=T0, text=f"post {i}", caption=None, empty=False)
+            for i in message_ids
+        ]
+
+
+class FakeProcessor:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.seen = []
+
+    async def process(self, env):
+        if env.message_id in self.failing:
+            raise RuntimeError("LLM unavailable")
+        self.seen.append(env.message_id)
+
+
+def _checkpoints(writer):
+    return [c[2:] for c in writer.calls if c[0] == "checkpoint_backfill"]
+
+
+def test_chunks_are_checkpointed_after_the_flush(writer):
+    processor = FakeProcessor()
+    backfill = Backfiller(FakeClient(newest=25), processor, writer, chunk_size=10)
+    asyncio.run(backfill._channel(-100, 1))
+    assert sorted(processor.seen) == list(range(1, 26))
+    assert _checkpoints(writer) == [(1, 25, False), (11, 25, False), (21, 25, False), (26, 25, True)]
+    assert writer.flushes == 3
+    assert backfill.channels_done == 1
+
+
+def test_a_failed_message_stops_the_channel_at_its_chunk(writer):
+    processor = FakeProcessor(failing={14})
+    backfill = Backfiller(FakeClient(newest=25), processor, writer, chunk_size=10)
+    with pytest.raises(RuntimeError, match="1 of 10 messages"):
+        asyncio.run(backfill._channel(-100, 1))
+    # The rest of the failed chunk is still flushed, but the checkpoint stays before it
+    assert sorted(processor.seen) == [i for i in range(1, 21) if i != 14]
+    assert writer.flushes == 2
+    assert _checkpoints(writer) == [(1, 25, False), (11, 25, False)]
+    assert (backfill.failed, backfill.channels_done) == (1, 0)
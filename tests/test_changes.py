@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.db import AsyncSessionLocal
+from app.models import Channel, Signal, SignalEdition, TradeSide
+from app.service.changes import Edit, SignalRef, detect_edit, find_signals, record_changes
+
+T0 = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+
+async def _seed():
+    async with AsyncSessionLocal() as session:
+        session.add(Channel(id=-100, title="Chan"))
+        for mid in (1, 2, 3):
+            session.add(
+                Signal(
+                    id=mid, channel_id=-100, message_id=mid, message_date=T0, next_check_at=T0,
+                    symbol="BTC", side=TradeSide.long, take_profits=[110.0], original_text=f"BTC long {mid}",
+                )
+            )
+        await session.commit()
+
+
+async def _signals():
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(select(Signal).order_by(Signal.id))).scalars().all()
+        editions = (await session.execute(select(SignalEdition.signal_id, SignalEdition.text))).all()
+    return {s.id: (s.deleted, s.edited, s.last_checked_time is not None) for s in rows}, editions
+
+
+def test_detect_edit_needs_a_real_change():
+    ref = SignalRef(1, -100, 1, "BTC long 1")
+    assert detect_edit(ref, "BTC long 1  ", T0) is None
+    assert detect_edit(ref, "BTC long 2", None) is None  # no edit date: not an edit
+    assert detect_edit(ref, "", T0) is None
+    assert detect_edit(ref, "BTC long 2", T0) == Edit(1, "BTC long 2", T0)
+
+
+def test_changes_are_recorded_in_one_pass(db):
+    async def main():
+        await _seed()
+        await record_changes(T0, checked_ids=[1, 2, 3], deleted_ids=[2], edits=[Edit(3, "BTC long 3 moved", T0)])
+        return await _signals()
+
+    flags, editions = db(main())
+    assert flags == {1: (False, False, True), 2: (True, False, True), 3: (False, True, True)}
+    assert editions == [(3, "BTC long 3 moved")]
+
+
+def test_the_same_edition_is_stored_once(db):
+    async def main():
+        await _seed()
+        edit = Edit(1, "BTC long 1 moved", T0)
+        await record_changes(T0, edits=[edit])
+        await record_changes(T0 + timedelta(hours=1), edits=[edit])
+        return await _signals()
+
+    _, editions = db(main())
+    assert editions == [(1, "BTC long 1 moved")]
+
+
+def test_deleted_signals_are_no_longer_found(db):
+    async def main():
+        await _seed()
+        await record_changes(T0, deleted_ids=[2])
+        return await find_signals(-100, [1, 2, 9])
+
+    assert [ref.message_id for ref in db(main())] == [1]
@@ -0,0 +1,39 @@
+from app.channel_cache import ChannelCache
+
+
+def _cache(writer):
+    cache = ChannelCache(writer)
+    cache.observe(-100, "Chan", "chan", 10)
+    return cache
+
+
+def test_new_channel_is_written_at_once(writer):
+    cache = ChannelCache(writer)
+    upd = cache.observe(-100, "Chan", "chan", 10)
+    assert (upd.channel_id, upd.title, upd.username, upd.last_message_id) == (-100, "Chan", "chan", 10)
+    assert cache.get(-100).last_message_id == 10
+
+
+def test_message_id_advances_wait_for_the_flush(writer):
+    cache = _cache(writer)
+    assert cache.observe(-100, "Chan", "chan", 11) is None
+    assert cache.observe(-100, "Chan", "chan", 12) is None
+    assert cache.observe(-100, "Chan", "chan", 5) is None  # late message, no step back
+    assert cache.flush() == 1
+    assert [(kind, upd.channel_id, upd.last_message_id) for kind, upd in writer.rows] == [("channel", -100, 12)]
+    assert cache.flush() == 0
+
+
+def test_rename_is_written_with_the_pending_bump(writer):
+    cache = _cache(writer)
+    cache.observe(-100, "Chan", "chan", 11)
+    upd = cache.observe(-100, "Renamed", "chan", None)
+    assert (upd.title, upd.username, upd.last_message_id) == ("Renamed", "chan", 11)
+    assert cache.flush() == 0
+
+
+def test_write_now_carries_only_what_changed(writer):
+    cache = _cache(writer)
+    upd = cache.observe(-100, "Chan", "chan", 11, write_now=True)
+    assert (upd.title, upd.username, upd.last_message_id) == (None, None, 11)
+    assert cache.flush() == 0
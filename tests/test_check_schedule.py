@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+from app.check_schedule import Candidate, ChangeRates, CheckPolicy, change_rates, fill, plan
+
+NOW = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def _cand(sid, channel_id, age_hours, checked_hours_ago=None, due_hours_ago=0.0):
+    posted = NOW - timedelta(hours=age_hours)
+    checked = NOW - timedelta(hours=checked_hours_ago) if checked_hours_ago is not None else None
+    return Candidate(sid, channel_id, sid, posted, checked, NOW - timedelta(hours=due_hours_ago), "")
+
+
+def _ids(chunks):
+    return [[c.id for c in part] for _, part in chunks]
+
+
+def test_next_check_uses_the_interval_of_the_signal_age():
+    policy = CheckPolicy(recent_days=7, recent_recheck_hours=12, old_recheck_hours=168)
+    assert policy.next_check(NOW, NOW - timedelta(days=1)) == NOW + timedelta(hours=12)
+    assert policy.next_check(NOW, NOW - timedelta(days=30)) == NOW + timedelta(hours=168)
+    # Channels that change often are checked more often
+    assert policy.next_check(NOW, NOW - timedelta(days=1), weight=4.0) == NOW + timedelta(hours=3)
+
+
+def test_next_check_accepts_naive_sqlite_datetimes():
+    policy = CheckPolicy()
+    assert policy.next_check(NOW, (NOW - timedelta(days=1)).replace(tzinfo=None)) == NOW + timedelta(hours=12)
+
+
+def test_change_rates_shrink_small_channels_toward_the_global_rate():
+    rates = change_rates([(1, 1000, 500), (2, 1000, 0), (3, 2, 2)])
+    assert rates.overall == 502 / 2002
+    assert rates.get(1) > rates.get(3) > rates.overall > rates.get(2)
+    assert rates.get(99) == rates.overall  # unknown channel
+
+
+def test_weight_is_clamped():
+    rates = ChangeRates({1: 1.0, 2: 0.0001}, overall=0.05)
+    assert rates.weight(1) == 4.0
+    assert rates.weight(2) == 0.5
+    assert rates.weight(3) == 1.0
+
+
+def test_plan_spends_at_most_the_budget():
+    rates = ChangeRates({}, overall=0.1)
+    cands = [_cand(ch * 10 + i, ch, age_hours=5) for ch in range(1, 11) for i in range(3)]
+    chunks = plan(NOW, cands, rates, CheckPolicy(), chunk_size=100, budget=4)
+    assert len(chunks) == 4
+    assert all(len(part) == 3 for _, part in chunks)
+
+
+def test_plan_splits_a_channel_into_chunks():
+    rates = ChangeRates({}, overall=0.1)
+    cands = [_cand(i, 1, age_hours=5) for i in range(1, 251)]
+    chunks = plan(NOW, cands, rates, CheckPolicy(), chunk_size=100, budget=10)
+    assert sorted(len(part) for _, part in chunks) == [50, 100, 100]
+    assert {c.id for _, part in chunks for c in part} == set(range(1, 251))
+
+
+def test_plan_prefers_channels_that_change():
+    rates = ChangeRates({1: 0.01, 2: 0.5}, overall=0.1)
+    cands = [_cand(1, 1, age_hours=5), _cand(2, 2, age_hours=5)]
+    assert _ids(plan(NOW, cands, rates, CheckPolicy(), chunk_size=100, budget=1)) == [[2]]
+
+
+def test_plan_prefers_signals_not_seen_for_longer():
+    rates = ChangeRates({}, overall=0.1)
+    cands = [
+        _cand(1, 1, age_hours=48, checked_hours_ago=1),
+        _cand(2, 2, age_hours=48),  # never checked: every change since posting is still unseen
+    ]
+    assert _ids(plan(NOW, cands, rates, CheckPolicy(), chunk_size=100, budget=1)) == [[2]]
+
+
+def test_overdue_signals_gain_priority():
+    rates = ChangeRates({}, overall=0.1)
+    cands = [
+        _cand(1, 1, age_hours=48, checked_hours_ago=12, due_hours_ago=0),
+        _cand(2, 2, age_hours=48, checked_hours_ago=12, due_hours_ago=12),
+    ]
+    assert _ids(plan(NOW, cands, rates, CheckPolicy(), chunk_size=100, budget=1)) == [[2]]
+
+
+def test_fill_tops_up_chunks_of_the_same_channel_only():
+    chunks = [(1, [_cand(1, 1, 5)]), (2, [_cand(2, 2, 5), _cand(3, 2, 5)])]
+    upcoming = [_cand(4, 1, 5), _cand(1, 1, 5), _cand(5, 3, 5), _cand(6, 2, 5), _cand(7, 1, 5)]
+    added = fill(chunks, upcoming, chunk_size=3)
+    assert added == 3
+    assert _ids(chunks) == [[1, 4, 7], [2, 3, 6]]
+
+
+def test_fill_leaves_full_chunks_alone():
+    chunks = [(1, [_cand(1, 1, 5), _cand(2, 1, 5)])]
+    assert fill(chunks, [_cand(3, 1, 5)], chunk_size=2) == 0
+    assert _ids(chunks) == [[1, 2]]
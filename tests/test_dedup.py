@@ -0,0 +1,84 @@
+from app.dedup import DedupCache, fingerprint, normalize_text
+from app.schemas import SignalFields
+
+POST = "BTC/USDT LONG entry 100 targets 110 120 130 stop 90 leverage 10x good luck everyone trade safe"
+BTC = SignalFields(symbol="BTC", side="long", leverage=10, stop_loss=[90.0], take_profits=[110.0, 120.0, 130.0])
+
+
+def _cache(writer, **kw):
+    cache = DedupCache(writer, **kw)
+    cache.store(POST, True, BTC)
+    return cache
+
+
+def test_exact_repost_hits(writer):
+    cache = _cache(writer)
+    hit = cache.lookup("🚀 " + POST + " https://t.me/somechannel @somechannel")
+    assert hit is not None and hit.fields == BTC
+    assert (cache.hits, cache.near_hits, cache.misses) == (1, 0, 0)
+
+
+def test_near_duplicate_hits(writer):
+    cache = _cache(writer)
+    hit = cache.lookup(POST.replace("everyone", "guys"))
+    assert hit is not None and hit.fields == BTC
+    assert cache.near_hits == 1
+
+
+def test_near_duplicates_are_optional(writer):
+    cache = _cache(writer, near_duplicates=False)
+    assert cache.lookup(POST.replace("everyone", "guys")) is None
+
+
+def test_hashtags_keep_their_ticker(writer):
+    assert normalize_text("#BTC long") != normalize_text("#ETH long")
+    cache = DedupCache(writer)
+    cache.store("#BTC long entry 100 stop 90", True, BTC)
+    assert cache.lookup("#ETH long entry 100 stop 90") is None
+
+
+def test_other_ticker_never_matches(writer):
+    cache = _cache(writer)
+    assert cache.lookup(POST.replace("BTC", "ETH")) is None
+    assert cache.lookup(POST.replace("BTC", "ETH").replace("everyone", "guys")) is None
+
+
+def test_other_numbers_or_side_never_match(writer):
+    cache = _cache(writer)
+    assert cache.lookup(POST.replace("120", "125")) is None
+    assert cache.lookup(POST.replace("LONG", "SHORT")) is None
+
+
+def test_exact_fingerprint_with_a_different_anchor_misses(writer):
+    # Normalization lowercases, so both texts share a fingerprint; only the first names a ticker
+    cache = _cache(writer)
+    lower = POST.replace("BTC", "btc")
+    assert fingerprint(normalize_text(lower)) == fingerprint(normalize_text(POST))
+    assert cache.lookup(lower) is None
+    assert cache.misses == 1
+
+
+def test_text_without_numbers_or_tickers_only_matches_exactly(writer):
+    cache = DedupCache(writer)
+    cache.store("good morning everyone, new signals soon", False, None)
+    assert cache.lookup("Good morning everyone, new signals soon!") is not None
+    assert cache.lookup("good morning everyone, new signals later") is None
+
+
+def test_lru_evicts_the_least_recently_used(writer):
+    cache = DedupCache(writer, max_entries=2)
+    cache.store("BTC long 1", True, None)
+    cache.store("ETH long 2", True, None)
+    cache.lookup("BTC long 1")
+    cache.store("SOL long 3", True, None)
+    assert cache.lookup("ETH long 2") is None
+    assert cache.lookup("BTC long 1") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_hits_are_persisted_through_the_writer(writer):
+    cache = _cache(writer)
+    cache.lookup(POST)
+    rows = [row for kind, row in writer.rows if kind == "cache"]
+    assert [r["hits"] for r in rows] == [0, 1]
+    assert rows[0]["fields"] == BTC.model_dump()
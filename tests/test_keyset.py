@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db import AsyncSessionLocal
+from app.models import Channel, Signal, TradeSide
+from app.service.query import (
+    decode_cursor,
+    encode_cursor,
+    get_signals_by_channel,
+    get_signals_by_symbol,
+    next_cursor,
+)
+
+T0 = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def _signal(sid, channel_id, symbol, minutes):
+    posted = T0 + timedelta(minutes=minutes)
+    return Signal(
+        id=sid, channel_id=channel_id, message_id=sid, message_date=posted, next_check_at=posted,
+        symbol=symbol, side=TradeSide.long, take_profits=[1.0], original_text=f"{symbol} long",
+    )
+
+
+async def _seed():
+    async with AsyncSessionLocal() as session:
+        session.add_all([Channel(id=-100, title="A"), Channel(id=-200, title="B")])
+        # Pairs of signals share a timestamp, so the id has to break ties
+        session.add_all(
+            _signal(sid, -100 if sid % 3 else -200, "BTC" if sid % 2 else "ETH", sid // 2) for sid in range(1, 31)
+        )
+        await session.commit()
+
+
+async def _walk(fetch, limit):
+    pages, cursor = [], None
+    while True:
+        async with AsyncSessionLocal() as session:
+            rows = await fetch(session, limit=limit, cursor=cursor)
+        signals = [r if isinstance(r, Signal) else r[0] for r in rows]
+        pages.append([s.id for s in signals])
+        token = next_cursor(signals, limit)
+        if token is None:
+            return pages
+        cursor = decode_cursor(token)
+
+
+def _expected(ids):
+    return sorted(ids, key=lambda sid: (sid // 2, sid), reverse=True)
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(T0, 42)) == (T0, 42)
+    for bad in ("", "not a cursor", encode_cursor(T0, 1)[:-3]):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_channel_pages_cover_every_signal_once_in_order(db):
+    async def main():
+        await _seed()
+        return await _walk(lambda session, **kw: get_signals_by_channel(session, -100, **kw), limit=7)
+
+    pages = db(main())
+    assert [len(p) for p in pages] == [7, 7, 6]
+    assert sum(pages, []) == _expected(sid for sid in range(1, 31) if sid % 3)
+
+
+def test_symbol_pages_cover_every_signal_once_in_order(db):
+    async def main():
+        await _seed()
+        return await _walk(lambda session, **kw: get_signals_by_symbol(session, "btc", **kw), limit=5)
+
+    pages = db(main())
+    assert [len(p) for p in pages] == [5, 5, 5, 0]  # a full last page needs one more, empty request
+    assert sum(pages, []) == _expected(range(1, 31, 2))
+
+
+def test_new_signals_do_not_shift_later_pages(db):
+    async def main():
+        await _seed()
+        async with AsyncSessionLocal() as session:
+            first = await get_signals_by_channel(session, -100, limit=5)
+            session.add(_signal(99, -100, "BTC", 60))
+            await session.commit()
+            rest = await get_signals_by_channel(session, -100, limit=50, cursor=decode_cursor(next_cursor(first, 5)))
+        return [s.id for s in first], [s.id for s in rest]
+
+    first, rest = db(main())
+    assert first + rest == _expected(sid for sid in range(1, 31) if sid % 3)
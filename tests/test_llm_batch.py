@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.llm_batch import ClassifyBatcher
+
+
+class FakeLLM:
+    """`classify_batch` answers None for texts containing "?"; `is_signal` says yes to "long"."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.singles = []
+
+    async def is_signal(self, text):
+        self.singles.append(text)
+        return "long" in text
+
+    async def classify_batch(self, texts):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [None if "?" in t else "long" in t for t in texts]
+
+
+def _classify(batcher, texts):
+    async def main():
+        return await asyncio.gather(*(batcher.is_signal(t) for t in texts), return_exceptions=True)
+
+    return asyncio.run(main())
+
+
+def test_concurrent_calls_share_one_request():
+    llm = FakeLLM()
+    batcher = ClassifyBatcher(llm, window_ms=20, max_batch=16)
+    assert _classify(batcher, ["BTC long", "hello", "ETH long"]) == [True, False, True]
+    assert llm.batches == [["BTC long", "hello", "ETH long"]]
+    assert batcher.stats()["avg_batch_size"] == 3.0
+
+
+def test_a_full_batch_goes_out_without_waiting_for_the_window():
+    llm = FakeLLM()
+    batcher = ClassifyBatcher(llm, window_ms=60_000, max_batch=2)
+    assert _classify(batcher, ["a long", "b", "c long", "d"]) == [True, False, True, False]
+    assert llm.batches == [["a long", "b"], ["c long", "d"]]
+
+
+def test_a_lone_message_uses_the_single_call():
+    llm = FakeLLM()
+    assert _classify(ClassifyBatcher(llm, window_ms=1), ["BTC long"]) == [True]
+    assert (llm.batches, llm.singles) == ([], ["BTC long"])
+
+
+def test_unanswered_items_fall_back_to_single_calls():
+    llm = FakeLLM()
+    batcher = ClassifyBatcher(llm, window_ms=20)
+    assert _classify(batcher, ["BTC long", "ETH long?"]) == [True, True]
+    assert llm.singles == ["ETH long?"]
+    assert batcher.fallbacks == 1
+
+
+def test_a_failed_batch_fails_every_caller():
+    results = _classify(ClassifyBatcher(FakeLLM(fail=True), window_ms=20), ["BTC long", "hello"])
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_a_cancelled_caller_keeps_its_neighbours_verdicts():
+    async def main():
+        batcher = ClassifyBatcher(FakeLLM(), window_ms=20)
+        first = asyncio.create_task(batcher.is_signal("BTC long"))
+        second = asyncio.create_task(batcher.is_signal("ETH long"))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) is True
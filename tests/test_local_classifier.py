@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.db import AsyncSessionLocal
+from app.local_classifier import (
+    FORMAT_VERSION,
+    LocalClassifier,
+    _split,
+    evaluate,
+    features,
+    load_dataset,
+    rows_outside,
+    train_rows_meta,
+)
+from app.models import RejectedMessage, Signal, TradeSide
+
+T0 = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+SIGNALS = [
+    "BTC/USDT LONG entry 100 targets 110 120 stop 90 leverage 10x",
+    "#ETH SHORT entry 3500 tp 3400 3300 sl 3600",
+    "SOL/USDT long entry 150 tp 160 170 sl 140 lev 5x",
+    "XRP short entry 0.55 targets 0.5 0.45 stop 0.6",
+]
+NOISE = [
+    "good morning everyone, new signals soon",
+    "join our vip group for more profits",
+    "market update: bitcoin is calm today",
+    "thanks for the support, see you tomorrow",
+]
+
+
+def _data(copies=8):
+    texts = (SIGNALS + NOISE) * copies
+    labels = np.array(([1] * len(SIGNALS) + [0] * len(NOISE)) * copies)
+    return texts, labels
+
+
+def test_features_keep_number_shape_not_value():
+    assert features("entry 100 sl 90") == features("entry 200 sl 80")
+    assert features("entry 100") != features("entry 1.5")
+    assert features("see https://t.me/abc") == features("see https://example.com/x")
+
+
+def test_features_are_stable_and_bounded():
+    ids = features("BTC/USDT LONG x10", bits=10)
+    assert ids == sorted(set(ids))
+    assert all(0 <= i < 1 << 10 for i in ids)
+    assert features("") == []
+
+
+def test_training_separates_signals_from_noise():
+    texts, labels = _data()
+    model = LocalClassifier.train(texts, labels, bits=12, epochs=20)
+    scores = model.score_batch(SIGNALS + NOISE)
+    assert scores[: len(SIGNALS)].min() > 0.5 > scores[len(SIGNALS):].max()
+
+
+def test_evaluate_reports_precision_recall_and_band():
+    texts, labels = _data(copies=1)
+    model = LocalClassifier(np.zeros(1 << 12), bias=5.0, bits=12)  # calls everything a signal
+    report = evaluate(model, texts, labels)
+    assert (report["samples"], report["positives"]) == (8, 4)
+    assert (report["precision"], report["recall"]) == (0.5, 1.0)
+    assert report["band"]["auto_accepted"] == 1.0
+    assert report["band"]["to_llm"] == 0.0
+
+
+def test_save_and_load_round_trip(tmp_path):
+    texts, labels = _data()
+    model = LocalClassifier.train(texts, labels, bits=12, epochs=4)
+    model.meta = {"train_samples": len(texts)}
+    path = str(tmp_path / "models" / "clf.npz")
+    model.save(path)
+    loaded = LocalClassifier.load(path, reject_below=0.1, accept_above=0.9)
+    assert loaded.bits == 12 and loaded.meta == model.meta
+    assert (loaded.reject_below, loaded.accept_above) == (0.1, 0.9)
+    assert np.allclose(loaded.score_batch(texts), model.score_batch(texts))
+
+
+def test_load_rejects_other_formats(tmp_path):
+    path = str(tmp_path / "clf.npz")
+    LocalClassifier(np.zeros(16), 0.0, bits=4).save(path)
+    with np.load(path) as data:
+        arrays = dict(data)
+    arrays["version"] = np.int32(FORMAT_VERSION + 1)
+    np.savez(path, **arrays)
+    with pytest.raises(ValueError):
+        LocalClassifier.load(path)
+
+
+def test_eval_rows_exclude_the_recorded_training_rows(tmp_path, db):
+    async def seed():
+        async with AsyncSessionLocal() as session:
+            session.add_all(
+                Signal(
+                    id=i, channel_id=-100, message_id=i, message_date=T0, next_check_at=T0, symbol="BTC",
+                    side=TradeSide.long, take_profits=[1.0], original_text=text,
+                )
+                for i, text in enumerate(SIGNALS, 1)
+            )
+            session.add_all(
+                RejectedMessage(id=i, channel_id=-100, message_id=100 + i, message_date=T0, text=text, source=source)
+                for i, (text, source) in enumerate(zip(NOISE, ["two_step", "local", "single_call", "two_step"]), 1)
+            )
+            await session.commit()
+        return await load_dataset()
+
+    texts, labels, rows = db(seed())
+    assert len(texts) == 7  # the local tier's own rejection is not a label
+    assert rows[:4] == [("signals", i) for i in range(1, 5)]
+    assert rows[4:] == [("rejected", 1), ("rejected", 3), ("rejected", 4)]
+
+    train_idx, test_idx = _split(len(texts), 0.3, seed=0)
+    model = LocalClassifier.train([texts[i] for i in train_idx], labels[train_idx], bits=10, epochs=2)
+    model.meta = {"train_rows": train_rows_meta(rows, train_idx)}
+    path = str(tmp_path / "clf.npz")
+    model.save(path)
+    loaded = LocalClassifier.load(path)
+    assert sorted(rows_outside(rows, loaded.meta["train_rows"])) == sorted(test_idx)
+    # Rows stored after training are evaluated too
+    assert rows_outside(rows + [("signals", 99)], loaded.meta["train_rows"])[-1] == len(rows)
@@ -0,0 +1,68 @@
+import asyncio
+
+from app.ratelimit import PRIORITY_CLASSIFY, PRIORITY_PARSE, AdaptiveLimiter, TokenBucket
+
+
+def test_token_bucket_waits_for_the_missing_tokens():
+    bucket = TokenBucket(per_minute=60)  # one token per second, 60 in the bucket
+    now = bucket._ts
+    bucket.take(59)
+    assert bucket.wait_time(1, now) == 0.0
+    bucket.take(1)
+    assert bucket.wait_time(2, now) == 2.0
+    assert bucket.wait_time(1000, now) == 60.0  # oversized requests wait for a full bucket, not forever
+    assert TokenBucket(per_minute=0).wait_time(10**6, now) == 0.0
+
+
+def test_parses_are_served_before_classifications():
+    async def main():
+        limiter = AdaptiveLimiter(max_concurrency=1, initial_concurrency=1)
+        first = await limiter.acquire()
+        order = []
+
+        async def call(name, priority):
+            lease = await limiter.acquire(priority)
+            order.append(name)
+            limiter.release(lease)
+
+        tasks = [
+            asyncio.create_task(call("classify-1", PRIORITY_CLASSIFY)),
+            asyncio.create_task(call("classify-2", PRIORITY_CLASSIFY)),
+            asyncio.create_task(call("parse", PRIORITY_PARSE)),
+        ]
+        await asyncio.sleep(0)
+        limiter.release(first)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == ["parse", "classify-1", "classify-2"]
+
+
+def test_throttling_halves_the_cap_and_success_grows_it_back():
+    async def main():
+        limiter = AdaptiveLimiter(max_concurrency=8, initial_concurrency=8, decrease_cooldown=0)
+        limiter.release(await limiter.acquire(), throttled=True)
+        halved = limiter.limit
+        for _ in range(8):
+            limiter.release(await limiter.acquire())
+        return halved, limiter.limit, limiter.throttled
+
+    halved, grown, throttled = asyncio.run(main())
+    assert halved == 4.0
+    assert 5.0 < grown <= 8.0
+    assert throttled == 1
+
+
+def test_a_cancelled_waiter_does_not_hold_a_slot():
+    async def main():
+        limiter = AdaptiveLimiter(max_concurrency=1, initial_concurrency=1)
+        first = await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        limiter.release(first)
+        lease = await asyncio.wait_for(limiter.acquire(), timeout=1)
+        return limiter.in_flight, lease
+
+    in_flight, lease = asyncio.run(main())
+    assert in_flight == 1 and not lease.released
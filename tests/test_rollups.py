@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.db import AsyncSessionLocal
+from app.models import ChannelStat, ChannelWeekStat, Signal, SymbolStat, SymbolWeekStat
+from app.schemas import PersistedSignal
+from app.service import rollups
+from app.service.changes import Edit, record_changes
+from app.writer import ChannelUpsert, SignalWriter
+
+# Spans the week that straddles New Year, which strftime('%Y-%W') used to split in two
+T0 = datetime(2024, 12, 28, 9, tzinfo=timezone.utc)
+
+
+def _rec(channel_id, message_id, symbol, side="long", leverage=None, days=0):
+    return PersistedSignal(
+        channel_id=channel_id, message_id=message_id, message_date=T0 + timedelta(days=days, minutes=message_id),
+        symbol=symbol, side=side, leverage=leverage, stop_loss=None, take_profits=[1.0],
+        original_text=f"{symbol} {side}",
+    )
+
+
+async def _snapshot():
+    async with AsyncSessionLocal() as session:
+        out = {}
+        for model in (ChannelStat, SymbolStat, ChannelWeekStat, SymbolWeekStat):
+            rows = (await session.execute(select(model.__table__))).mappings().all()
+            out[model.__tablename__] = sorted(
+                (tuple((k, round(v, 6) if isinstance(v, float) else v) for k, v in sorted(r.items())) for r in rows),
+                key=repr,
+            )
+        return out
+
+
+async def _rebuilt():
+    async with AsyncSessionLocal() as session:
+        await rollups.rebuild(session)
+        await session.commit()
+    return await _snapshot()
+
+
+async def _ingest():
+    writer = SignalWriter()
+    for mid in range(1, 13):
+        writer.add_signal(
+            _rec(-100 if mid % 2 else -200, mid, "BTC" if mid % 3 else "ETH",
+                 side="short" if mid % 4 == 0 else "long", leverage=mid if mid % 5 else None, days=mid % 7),
+            ChannelUpsert(-100 if mid % 2 else -200, title="Chan"),
+        )
+    writer.add_signal(_rec(-100, 1, "BTC"))  # duplicate inside the batch
+    await writer.flush()
+    writer.add_signal(_rec(-200, 2, "BTC"))  # duplicate of an earlier batch
+    writer.add_signal(_rec(-200, 14, "SOL", leverage=3, days=9))
+    await writer.flush()
+
+
+def test_incremental_inserts_match_a_rebuild(db):
+    async def main():
+        await _ingest()
+        return await _snapshot(), await _rebuilt()
+
+    incremental, rebuilt = db(main())
+    assert incremental["channel_stats"] and incremental["symbol_week_stats"]
+    assert incremental == rebuilt
+
+
+def test_flags_and_hard_deletes_match_a_rebuild(db):
+    async def main():
+        await _ingest()
+        now = T0 + timedelta(days=30)
+        await record_changes(now, deleted_ids=[1, 2], edits=[Edit(3, "BTC long moved", now)])
+        await record_changes(now, deleted_ids=[2], edits=[Edit(3, "BTC long moved again", now)])  # no double counts
+        async with AsyncSessionLocal() as session:
+            for sid in (4, 13):  # same steps as DELETE /api/signals/{id}
+                s = await session.get(Signal, sid)
+                await session.delete(s)
+                await session.flush()
+                await rollups.apply_removed(session, [s])
+            await session.commit()
+        return await _snapshot(), await _rebuilt()
+
+    incremental, rebuilt = db(main())
+    assert incremental == rebuilt
@@ -0,0 +1,65 @@
+import pytest
+
+from app.rule_parser import MIN_CONFIDENCE_DEFAULT, parse_signal_rules
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "BTC/USDT LONG x10  TP: 1,2,3  SL: 0.9",
+        "#ETH SHORT\nEntry: 3500\nTargets:\n1) 3400\n2) 3300\nStop loss 3600\nLeverage 20x",
+    ],
+)
+def test_well_formed_posts_skip_the_llm(text):
+    rule = parse_signal_rules(text)
+    assert rule is not None
+    assert rule.confidence >= MIN_CONFIDENCE_DEFAULT
+
+
+def test_fields_of_a_well_formed_post():
+    rule = parse_signal_rules("#ETH SHORT\nEntry: 3500\nTargets:\n1) 3400\n2) 3300\nStop loss 3600\nLeverage 20x")
+    assert rule.fields.symbol == "ETH"
+    assert rule.fields.side == "short"
+    assert rule.fields.take_profits == [3400.0, 3300.0]  # list labels "1)" are not prices
+    assert rule.fields.stop_loss == [3600.0]
+    assert rule.fields.leverage == 20
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "BTC/USDT LONG TP: 100 110 SL: 120",  # stop above the targets of a long
+        "ETH/USDT SHORT TP: 3400 SL: 3300",  # stop below the target of a short
+        "BTC/USDT LONG TP: 0,95 SL: 0,9",  # decimal commas read as lists
+        "BTC/USDT LONG",  # no levels at all
+        "SOL LONG TP 150 SL 120",  # bare ticker without a pair or tag
+    ],
+)
+def test_doubtful_posts_fall_back_to_the_llm(text):
+    rule = parse_signal_rules(text)
+    assert rule is not None
+    assert rule.confidence < MIN_CONFIDENCE_DEFAULT
+
+
+def test_ordered_targets_score_higher_than_unordered():
+    ordered = parse_signal_rules("BTC/USDT LONG TP: 100 110 SL: 90")
+    unordered = parse_signal_rules("BTC/USDT LONG TP: 110 100 SL: 90")
+    assert ordered.confidence > unordered.confidence
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "hello world",
+        "BTC/USDT ETH/USDT LONG TP 1 SL 0.5",  # several instruments
+        "BTC/USDT long and short",  # contradicting sides
+    ],
+)
+def test_ambiguous_posts_are_not_parsed(text):
+    assert parse_signal_rules(text) is None
+
+
+def test_confidence_is_clamped():
+    rule = parse_signal_rules("BTC/USDT LONG x10  TP: 1,2,3  SL: 0.9")
+    assert 0.0 <= rule.confidence <= 1.0
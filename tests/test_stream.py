@@ -0,0 +1,21 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import router
+from app.config import settings
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_stream_needs_the_change_feed(monkeypatch):
+    monkeypatch.setattr(settings, "notify_dir", "")
+    assert _client().get("/api/stream").status_code == 503
+
+
+def test_stream_rejects_unknown_event_types(monkeypatch):
+    monkeypatch.setattr(settings, "notify_dir", "run/notify")
+    assert _client().get("/api/stream", params={"type": "nope"}).status_code == 400
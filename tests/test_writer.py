@@ -0,0 +1,162 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app.db import AsyncSessionLocal
+from app.models import Channel, RejectedMessage, Signal
+from app.schemas import PersistedSignal
+from app.writer import ChannelUpsert, SignalWriter
+
+T0 = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def _rec(message_id, channel_id=-100):
+    return PersistedSignal(
+        channel_id=channel_id, message_id=message_id, message_date=T0 + timedelta(minutes=message_id),
+        symbol="BTC", side="long", leverage=None, stop_loss=None, take_profits=[1.0],
+        original_text=f"BTC long {message_id}",
+    )
+
+
+def _rejection(message_id, text="hello"):
+    return {"channel_id": -100, "message_id": message_id, "message_date": T0, "text": text, "source": "local"}
+
+
+def _failing(writer, times):
+    """Make the next `times` writes of `writer` fail as if the database were locked."""
+    write, calls = writer._write, []
+
+    async def flaky(*args):
+        calls.append(args)
+        if len(calls) <= times:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return await write(*args)
+
+    writer._write = flaky
+    return calls
+
+
+async def _stored():
+    async with AsyncSessionLocal() as session:
+        signals = (await session.execute(select(Signal.message_id).order_by(Signal.id))).scalars().all()
+        rejected = (await session.execute(select(RejectedMessage.message_id))).scalars().all()
+        titles = dict((await session.execute(select(Channel.id, Channel.title))).all())
+    return signals, sorted(rejected), titles
+
+
+def test_a_locked_database_keeps_the_batch_and_backs_off(db):
+    async def main():
+        writer = SignalWriter(flush_interval_ms=10, max_backoff_seconds=0.05)
+        calls = _failing(writer, times=4)
+        await writer.start()
+        for mid in range(1, 6):
+            writer.add_signal(_rec(mid), ChannelUpsert(-100, title="Chan"))
+        for _ in range(200):
+            if not writer.pending and len(calls) > 4:
+                break
+            await asyncio.sleep(0.01)
+        await writer.stop()
+        assert len(calls) == 5
+        assert writer._failures == 0
+        return await _stored()
+
+    signals, _, titles = db(main())
+    assert signals == [1, 2, 3, 4, 5]
+    assert titles == {-100: "Chan"}
+
+
+def test_requeued_rows_go_before_newer_ones(db):
+    async def main():
+        writer = SignalWriter()
+        _failing(writer, times=1)
+        writer.add_signal(_rec(1), ChannelUpsert(-100, title="Old", last_message_id=1))
+        writer.add_signal(_rec(2))
+        try:
+            await writer.flush()
+        except OperationalError:
+            pass
+        assert writer.pending == 3
+        writer.add_signal(_rec(3), ChannelUpsert(-100, title="New", last_message_id=3))
+        await writer.flush()
+        return await _stored()
+
+    signals, _, titles = db(main())
+    assert signals == [1, 2, 3]
+    assert titles == {-100: "New"}  # the newer update still wins the merge
+
+
+def test_only_the_rows_the_database_rejects_are_dropped(db):
+    async def main():
+        writer = SignalWriter()
+        for mid in range(1, 9):
+            writer.add_signal(_rec(mid))
+            writer.add_rejection(_rejection(100 + mid, text=None if mid == 5 else "hello"))
+        await writer.flush()
+        assert writer.pending == 0
+        return await _stored()
+
+    signals, rejected, _ = db(main())
+    assert signals == list(range(1, 9))
+    assert rejected == [101, 102, 103, 104, 106, 107, 108]
+
+
+def test_a_transient_failure_while_isolating_keeps_the_rest(db):
+    async def main():
+        writer = SignalWriter()
+        # Whole batch rejected, first half written, then the database locks up
+        write, calls = writer._write, []
+
+        async def flaky(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise OperationalError("INSERT", {}, Exception("database is locked"))
+            return await write(*args)
+
+        writer._write = flaky
+        for mid in range(1, 5):
+            writer.add_signal(_rec(mid))
+        writer.add_rejection(_rejection(200, text=None))
+        try:
+            await writer.flush()
+        except OperationalError:
+            pass
+        first = await _stored()
+        await writer.flush()
+        return first, await _stored()
+
+    (signals, _, _), (after, rejected, _) = db(main())
+    assert signals == [1, 2]
+    assert after == [1, 2, 3, 4]
+    assert rejected == []
+
+
+def test_a_cancelled_flush_keeps_its_rows(db):
+    async def main():
+        writer = SignalWriter()
+        write, started, release = writer._write, asyncio.Event(), asyncio.Event()
+
+        async def stuck(*args):
+            started.set()
+            await release.wait()
+            return await write(*args)
+
+        writer._write = stuck
+        writer.add_signal(_rec(1))
+        task = asyncio.create_task(writer.flush())
+        await started.wait()
+        writer.add_signal(_rec(2))
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        assert writer.pending == 2
+        assert writer._failures == 0
+        writer._write = write
+        await writer.flush()
+        return await _stored()
+
+    signals, _, _ = db(main())
+    assert signals == [1, 2]
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.schemas import PersistedSignal
+from app.service.changes import Edit
+from app.writer import ChannelUpsert
+from app.writer_ipc import RemoteWriter, WriterServer
+
+T0 = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def _run(test, writer):
+    async def main():
+        path = os.path.join(tempfile.mkdtemp(prefix="sc-ipc-"), "w.sock")
+        server = WriterServer(writer, path)
+        await server.start()
+        remote = RemoteWriter(path, reconnect_seconds=0.05)
+        await remote.start()
+        try:
+            await asyncio.wait_for(test(server, remote), timeout=10)
+        finally:
+            await remote.stop(timeout=2)
+            await server.stop()
+
+    asyncio.run(main())
+
+
+def test_rows_arrive_decoded_and_flush_is_acknowledged(writer):
+    rec = PersistedSignal(
+        channel_id=-100, message_id=7, message_date=T0, symbol="BTC", side="long",
+        leverage=10, stop_loss=[90.0], take_profits=[110.0, 120.0], original_text="BTC long",
+    )
+
+    async def test(server, remote):
+        remote.add_signal(rec, ChannelUpsert(-100, title="Chan", last_message_id=7))
+        remote.add_channel(ChannelUpsert(-200, username="other"))
+        remote.add_cache_entry({"fingerprint": "fp", "hits": 1, "last_used_at": T0})
+        remote.add_rejection({"channel_id": -100, "message_id": 8, "message_date": T0, "text": "hi", "source": "gate"})
+        await remote.flush()
+
+    _run(test, writer)
+    assert writer.flushes >= 1
+    kinds = [r[0] for r in writer.rows]
+    assert kinds == ["signal", "channel", "cache", "rejection"]
+    _, got, channel = writer.rows[0]
+    assert got == rec
+    assert (channel.channel_id, channel.title, channel.last_message_id) == (-100, "Chan", 7)
+    assert writer.rows[1][1].username == "other"
+    assert writer.rows[2][1]["last_used_at"] == T0  # datetimes survive the JSON round trip
+
+
+def test_unbatched_writes_round_trip(writer):
+    edit = Edit(2, "new text", T0)
+    due = {3: T0 + timedelta(hours=12)}
+
+    async def test(server, remote):
+        await remote.record_changes(T0, checked_ids=[1, 2, 3], deleted_ids={1}, edits=[edit], next_check=due)
+        await remote.plan_backfill([{"channel_id": -100, "next_message_id": 5, "started_at": T0}])
+        await remote.plan_backfill([])  # nothing to send
+        await remote.checkpoint_backfill(-100, 50, 60, done=True)
+        await remote.trim_cache(T0)
+
+    _run(test, writer)
+    assert writer.calls == [
+        ("record_changes", T0, [1, 2, 3], [1], [edit], due),
+        ("plan_backfill", [{"channel_id": -100, "next_message_id": 5, "started_at": T0}]),
+        ("checkpoint_backfill", -100, 50, 60, True),
+        ("trim_cache", T0),
+    ]
+    assert isinstance(writer.calls[0][4][0], Edit)
+
+
+def test_failed_flush_is_reported_to_the_worker(writer):
+    writer.fail = {"flush"}
+
+    async def test(server, remote):
+        with pytest.raises(RuntimeError):
+            await remote.flush()
+        # The connection stays usable
+        writer.fail.clear()
+        await remote.flush()
+        assert writer.flushes == 1
+
+    _run(test, writer)
+
+
+def test_failed_call_is_reported_to_the_worker(writer):
+    writer.fail = {"record_changes"}
+
+    async def test(server, remote):
+        with pytest.raises(RuntimeError):
+            await remote.record_changes(T0, checked_ids=[1])
+        with pytest.raises(RuntimeError):
+            await remote._call("no_such_call", {})
+        await remote.trim_cache(T0)
+
+    _run(test, writer)
+    assert writer.calls == [("trim_cache", T0)]
+
+
+def test_stop_survives_a_failed_final_flush(writer):
+    writer.fail = {"flush"}
+
+    async def test(server, remote):
+        remote.add_channel(ChannelUpsert(-100, title="Chan"))
+        await remote.stop(timeout=2)
+        assert remote._conn is None
+
+    _run(test, writer)
+    assert [r[0] for r in writer.rows] == ["channel"]
+
+
+def test_rows_buffered_while_the_server_is_down_are_resent(writer):
+
+    async def test(server, remote):
+        await remote.flush()
+        await server.stop()
+        remote.add_channel(ChannelUpsert(-100, title="late"))
+        await asyncio.sleep(0.2)
+        await server.start()
+        for _ in range(50):
+            try:
+                await remote.flush()
+                break
+            except ConnectionError:
+                await asyncio.sleep(0.05)
+
+    _run(test, writer)
+    assert [(r[0], r[1].title) for r in writer.rows] == [("channel", "late")]
@@ -3,7 +3,7 @@ import Header from './components/Header'
 import Sidebar from './components/Sidebar'
 import SignalList from './components/SignalList'
 import StatsPage from './components/StatsPage'
-import { api, ChannelItem, SymbolItem, SignalItem } from './api'
+import { api, streamUrl, ChannelItem, SymbolItem, SignalItem } from './api'
 
 export default function App() {
   const [mode, setMode] = useState<'channels' | 'symbols'>('channels')
@@ -11,6 +11,7 @@ export default function App() {
   const [items, setItems] = useState<(ChannelItem | SymbolItem)[]>([])
   const [selected, setSelected] = useState<string | number | null>(null)
   const [signals, setSignals] = useState<SignalItem[]>([])
+  const [next, setNext] = useState<string | null>(null)
 
   const loadItems = async () => {
     const data = mode === 'channels' ? await api.channels() : await api.symbols()
@@ -21,17 +22,50 @@ export default function App() {
     }
   }
 
+  const fetchPage = (cursor?: string | null) => mode === 'channels'
+    ? api.channelSignals(selected as number, 100, cursor)
+    : api.symbolSignals(String(selected), 100, cursor)
+
   const loadSignals = async () => {
     if (selected == null) return
-    const rows = mode === 'channels'
-      ? await api.channelSignals(selected as number)
-      : await api.symbolSignals(String(selected))
-    setSignals(rows)
+    const p = await fetchPage()
+    setSignals(p.rows)
+    setNext(p.next)
+  }
+
+  const loadMore = async () => {
+    if (selected == null || !next) return
+    const p = await fetchPage(next)
+    setSignals(prev => [...prev, ...p.rows])
+    setNext(p.next)
   }
 
   useEffect(() => { loadItems() }, [mode])
   useEffect(() => { loadSignals() }, [selected, mode])
 
+  // Follow the selected channel/symbol live instead of re-polling
+  useEffect(() => {
+    if (selected == null) return
+    const es = new EventSource(streamUrl(mode === 'channels' ? { channel: selected as number } : { symbol: String(selected) }))
+    es.addEventListener('signal', (e) => {
+      const s = JSON.parse((e as MessageEvent).data)
+      setSignals(prev => prev.some(x => x.id === s.id) ? prev : [{ deleted: false, edited: false, ...s }, ...prev])
+    })
+    es.addEventListener('edition', (e) => {
+      const { signal_id } = JSON.parse((e as MessageEvent).data)
+      setSignals(prev => prev.map(x => x.id === signal_id ? { ...x, edited: true } : x))
+    })
+    es.addEventListener('deletion', (e) => {
+      const { signal_id, removed } = JSON.parse((e as MessageEvent).data)
+      setSignals(prev => removed
+        ? prev.filter(x => x.id !== signal_id)
+        : prev.map(x => x.id === signal_id ? { ...x, deleted: true } : x))
+    })
+    // Missed events: the list is stale, start over from the first page
+    es.addEventListener('gap', () => { loadSignals() })
+    return () => es.close()
+  }, [selected, mode])
+
   return (
     <div className="h-dvh flex flex-col">
       <Header mode={mode} setMode={(m)=>{setSelected(null); setMode(m)}} page={page} setPage={setPage} />
@@ -43,7 +77,7 @@ export default function App() {
         <main className="flex-1 grid md:grid-cols-[320px,1fr]">
           <Sidebar mode={mode} items={items} selected={selected} onSelect={setSelected} />
           <section className="h-full overflow-y-auto">
-            <SignalList rows={signals} showChannel={mode === 'symbols'} />
+            <SignalList rows={signals} showChannel={mode === 'symbols'} onLoadMore={next ? loadMore : undefined} />
           </section>
         </main>
       )}
@@ -25,23 +25,39 @@ export type SymbolStats = {
   mean_leverage?: number | null; mean_per_day?: number | null; mean_per_week?: number | null;
 }
 export type EditionItem = { text: string; edited_at: string }
+export type SignalPage = { rows: SignalItem[]; next: string | null }
 
 const get = async <T>(url: string): Promise<T> => {
   const r = await fetch(url)
   if (!r.ok) throw new Error(`HTTP ${r.status}`)
   return await r.json()
 }
+// Signal listings are keyset-paginated: pass back the X-Next-Cursor of the previous page
+const page = async (url: string, limit: number, cursor?: string | null): Promise<SignalPage> => {
+  const qs = `limit=${limit}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '')
+  const r = await fetch(`${url}?${qs}`)
+  if (!r.ok) throw new Error(`HTTP ${r.status}`)
+  return { rows: await r.json(), next: r.headers.get('X-Next-Cursor') }
+}
 const del = async (url: string) => {
   const r = await fetch(url, { method: 'DELETE' })
   if (!r.ok) throw new Error(`HTTP ${r.status}`)
   return await r.json()
 }
 
+// Live stream of committed changes (server-sent events); EventSource resumes via Last-Event-ID
+export const streamUrl = (filter: { channel?: number; symbol?: string }) => {
+  const qs = new URLSearchParams()
+  if (filter.channel != null) qs.set('channel', String(filter.channel))
+  if (filter.symbol) qs.set('symbol', filter.symbol)
+  return `/api/stream?${qs}`
+}
+
 export const api = {
   channels: () => get<ChannelItem[]>('/api/channels'),
   symbols: () => get<SymbolItem[]>('/api/symbols'),
-  channelSignals: (id: number, limit = 100, offset = 0) => get<SignalItem[]>(`/api/channels/${id}/signals?limit=${limit}&offset=${offset}`),
-  symbolSignals: (sym: string, limit = 100, offset = 0) => get<SignalItem[]>(`/api/symbols/${encodeURIComponent(sym)}/signals?limit=${limit}&offset=${offset}`),
+  channelSignals: (id: number, limit = 100, cursor?: string | null) => page(`/api/channels/${id}/signals`, limit, cursor),
+  symbolSignals: (sym: string, limit = 100, cursor?: string | null) => page(`/api/symbols/${encodeURIComponent(sym)}/signals`, limit, cursor),
   channelStats: () => get<ChannelStats[]>('/api/stats/channels'),
   symbolStats: () => get<SymbolStats[]>('/api/stats/symbols'),
   signalEditions: (id: number) => get<EditionItem[]>(`/api/signals/${id}/editions`),
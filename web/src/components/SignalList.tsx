@@ -123,18 +123,36 @@ function Row({ s, showChannel, onDeleted }: RowProps) {
   )
 }
 
-export default function SignalList({ rows, showChannel = false }: { rows: SignalItem[]; showChannel?: boolean }) {
+type ListProps = { rows: SignalItem[]; showChannel?: boolean; onLoadMore?: () => Promise<void> }
+
+export default function SignalList({ rows, showChannel = false, onLoadMore }: ListProps) {
   const [list, setList] = useState(rows)
+  const [loadingMore, setLoadingMore] = useState(false)
   React.useEffect(() => setList(rows), [rows])
 
   const onDeleted = (id: number) => {
     setList(prev => prev.filter(x => x.id !== id))
   }
 
+  const more = async () => {
+    if (!onLoadMore) return
+    setLoadingMore(true)
+    try { await onLoadMore() } finally { setLoadingMore(false) }
+  }
+
   if (!list.length) return <div className="p-3 text-sm text-neutral-600">No signals.</div>
   return (
     <div className="p-3 space-y-3">
       {list.map(s => <Row key={s.id} s={s} showChannel={showChannel} onDeleted={onDeleted} />)}
+      {onLoadMore && (
+        <button
+          onClick={more}
+          disabled={loadingMore}
+          className="w-full text-sm px-3 py-2 rounded border bg-neutral-50 hover:bg-neutral-100"
+        >
+          {loadingMore ? 'Loading…' : 'Load more'}
+        </button>
+      )}
     </div>
   )
 }